@@ -0,0 +1,189 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, List, AsyncIterator, Optional
+
+import fastjson
+from schemas import TopicRequest
+from map_service import build_topic_map, with_layout
+from rate_limiter import RateLimitExceeded
+from usage import QuotaExceeded
+from shared_state import get_shared_state
+
+logger = logging.getLogger(__name__)
+
+
+def error_status(e: Exception) -> int:
+    """HTTP status the single-map endpoint would have returned for this error."""
+    if isinstance(e, QuotaExceeded):
+        return 429
+    if isinstance(e, RateLimitExceeded):
+        return 503
+    if isinstance(e, ValueError):
+        return 422
+    return 500
+
+
+async def _run_item(index: int, item: TopicRequest, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+    topic = (item.topic or "").strip()
+    if not topic:
+        return {"index": index, "topic": item.topic, "status": "error", "status_code": 400, "error": "Topic cannot be empty"}
+    async with semaphore:
+        try:
+            result = await build_topic_map(topic, item.complexity or "intermediate", bool(item.bypass_cache), item.generation)
+            return {"index": index, "topic": topic, "status": "ok", "result": await with_layout(result) if item.layout else result.model_dump()}
+        except Exception as e:
+            logger.warning(f"Batch item {index} ({topic}) failed: {str(e)}")
+            return {"index": index, "topic": topic, "status": "error", "status_code": error_status(e), "error": str(e)}
+
+
+async def run_batch(items: List[TopicRequest], parallelism: int) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Generate maps for every item with at most `parallelism` running at once.
+    Yields per-item results in completion order; failures are reported, not raised.
+    Remaining work is cancelled if the consumer stops early (e.g. client disconnect).
+    """
+    semaphore = asyncio.Semaphore(parallelism)
+    tasks = [asyncio.ensure_future(_run_item(i, item, semaphore)) for i, item in enumerate(items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+class BatchJob:
+    """
+    A batch running in the background; results accumulate in completion order.
+    With a shared state backend every result and status change is also published
+    there, so any worker process can answer polls for the job.
+    """
+
+    def __init__(self, total: int, state=None, retention: float = 3600):
+        self.id = uuid.uuid4().hex
+        self.state = state
+        self.retention = retention
+        self.total = total
+        self.status = "running"
+        self.results: List[Dict[str, Any]] = []
+        self.failed = 0
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    async def run(self, items: List[TopicRequest], parallelism: int) -> None:
+        try:
+            async for result in run_batch(items, parallelism):
+                if result["status"] != "ok":
+                    self.failed += 1
+                await asyncio.to_thread(self._publish, len(self.results), result)
+                self.results.append(result)
+            self.status = "completed"
+        except asyncio.CancelledError:
+            self.status = "cancelled"
+            raise
+        except Exception as e:
+            logger.error(f"Batch job {self.id} failed: {str(e)}", exc_info=True)
+            self.status = "failed"
+        finally:
+            self.finished_at = time.time()
+            await asyncio.to_thread(self._publish)
+
+    def _publish(self, index: Optional[int] = None, result: Optional[Dict[str, Any]] = None) -> None:
+        """Write a result (before it counts as completed) and the job header to the shared state."""
+        if self.state is None:
+            return
+        try:
+            if result is not None:
+                self.state.set(f"batch:{self.id}:{index}", fastjson.dumps(result), self.retention)
+            completed = len(self.results) + (1 if result is not None else 0)
+            self.state.set(f"batch:{self.id}", fastjson.dumps({
+                "status": self.status, "total": self.total, "completed": completed, "failed": self.failed
+            }), self.retention)
+        except Exception as e:
+            logger.warning(f"Could not publish batch job {self.id} to shared state: {str(e)}")
+
+    def snapshot(self, offset: int = 0) -> Dict[str, Any]:
+        """Job status plus results from `offset` on, so pollers can fetch only new items."""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "total": self.total,
+            "completed": len(self.results),
+            "failed": self.failed,
+            "results": self.results[offset:]
+        }
+
+
+class BatchJobRegistry:
+    """
+    Registry of batch jobs run by this process; the oldest finished jobs are
+    dropped past `max_jobs`. Jobs run by other workers are read from the shared
+    state when there is one.
+    """
+
+    def __init__(self, max_jobs: int = 100, state=None, retention: float = 3600):
+        self.max_jobs = max_jobs
+        self.state = state
+        self.retention = retention
+        self._jobs: "OrderedDict[str, BatchJob]" = OrderedDict()
+
+    async def submit(self, items: List[TopicRequest], parallelism: int) -> BatchJob:
+        job = BatchJob(len(items), self.state, self.retention)
+        await asyncio.to_thread(job._publish)
+        job.task = asyncio.ensure_future(job.run(items, parallelism))
+        self._jobs[job.id] = job
+        self._evict()
+        return job
+
+    def get(self, job_id: str) -> Optional[BatchJob]:
+        return self._jobs.get(job_id)
+
+    def snapshot(self, job_id: str, offset: int = 0) -> Optional[Dict[str, Any]]:
+        """The job's snapshot from this process, else from the shared state; None if unknown."""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.snapshot(offset)
+        if self.state is None:
+            return None
+        try:
+            header = self.state.get(f"batch:{job_id}")
+            if header is None:
+                return None
+            header = fastjson.loads(header)
+            results = []
+            for index in range(offset, header["completed"]):
+                result = self.state.get(f"batch:{job_id}:{index}")
+                if result is None:
+                    break
+                results.append(fastjson.loads(result))
+        except Exception as e:
+            logger.warning(f"Could not read batch job {job_id} from shared state: {str(e)}")
+            return None
+        return {"job_id": job_id, **header, "results": results}
+
+    def _evict(self) -> None:
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self.max_jobs:
+                break
+            if self._jobs[job_id].status != "running":
+                del self._jobs[job_id]
+
+
+# Global instance - will be initialized lazily
+batch_registry = None
+
+def get_batch_registry():
+    """Get or create the global batch job registry."""
+    global batch_registry
+    if batch_registry is None:
+        batch_registry = BatchJobRegistry(
+            max_jobs=int(os.getenv("BATCH_MAX_JOBS", "100")),
+            state=get_shared_state(),
+            retention=float(os.getenv("BATCH_RETENTION_SECONDS", "3600"))
+        )
+    return batch_registry
@@ -0,0 +1,109 @@
+"""
+Benchmark map export: render latency per format and how much each approach
+blocks the event loop.
+
+"inline" renders on the event loop, as a naive async endpoint would; "pool" goes
+through exporter.Exporter (bounded process pool). While `--concurrency` exports
+run, a heartbeat task wakes every 5 ms and records how late it was. Its worst
+and p99 lag is the time other requests would have been stalled.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_export --nodes 40 200 1000 --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from benchmarks.bench_json import make_raw
+from exporter import Exporter, render, RENDERERS
+
+TICK = 0.005
+
+
+def make_map(n_nodes: int) -> dict:
+    return json.loads(make_raw(n_nodes))
+
+
+def render_latency(data: dict, fmt: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        render(fmt, data)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+async def heartbeat(lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(max(0.0, time.perf_counter() - start - TICK))
+
+
+async def run_exports(mode: str, exporter: Exporter, maps: list, fmt: str):
+    """Export every map concurrently; returns (wall seconds, heartbeat lags)."""
+    lags, stop = [], asyncio.Event()
+    beat = asyncio.create_task(heartbeat(lags, stop))
+    await asyncio.sleep(TICK * 2)
+
+    async def inline(data):
+        return render(fmt, data)
+
+    start = time.perf_counter()
+    if mode == "inline":
+        await asyncio.gather(*(inline(data) for data in maps))
+    else:
+        await asyncio.gather(*(exporter.export(fmt, data) for data in maps))
+    wall = time.perf_counter() - start
+    stop.set()
+    await beat
+    return wall, lags
+
+
+async def main_async(args):
+    print("render latency (best of %d, one process):" % args.repeat)
+    for n_nodes in args.nodes:
+        data = make_map(n_nodes)
+        timings = "  ".join(f"{fmt} {render_latency(data, fmt, args.repeat) * 1000:7.1f} ms" for fmt in RENDERERS)
+        print(f"  {n_nodes:>5} nodes: {timings}")
+
+    exporter = Exporter(workers=args.workers, max_pending=max(16, args.concurrency))
+    # Start the worker processes before timing
+    await exporter.export("svg", make_map(5))
+    print(f"\nevent loop lag with {args.concurrency} concurrent exports ({args.workers} pool workers):")
+    for n_nodes in args.nodes:
+        for fmt in args.formats:
+            for mode in ("inline", "pool"):
+                # Distinct topics so the pool's file cache never answers
+                maps = []
+                for i in range(args.concurrency):
+                    data = make_map(n_nodes)
+                    data["topic"] = f"{mode} {fmt} {n_nodes} {i} {time.time()}"
+                    maps.append(data)
+                wall, lags = await run_exports(mode, exporter, maps, fmt)
+                p99 = statistics.quantiles(lags, n=100, method="inclusive")[98] if len(lags) >= 2 else (lags[0] if lags else 0.0)
+                print(f"  {n_nodes:>5} nodes {fmt} {mode:>6}: wall {wall * 1000:8.1f} ms  "
+                      f"max lag {max(lags, default=0.0) * 1000:7.1f} ms  p99 lag {p99 * 1000:6.1f} ms")
+
+    data = make_map(args.nodes[-1])
+    await exporter.export("png", data)
+    start = time.perf_counter()
+    await exporter.export("png", data)
+    print(f"\ncached export ({args.nodes[-1]} nodes, png): {(time.perf_counter() - start) * 1000:.2f} ms")
+    exporter.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, nargs="+", default=[40, 200, 1000])
+    parser.add_argument("--formats", nargs="+", default=["svg", "pdf", "png"], choices=list(RENDERERS))
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=3)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark single-call versus parallel (fan-out) map generation.
+
+Spawns the mock LLM server with --simulate-decode, so every completion takes a
+time-to-first-token plus its length at --tokens-per-second, then generates the
+same topics through map_service.build_topic_map in both modes (cache and map
+store disabled) and reports wall time, provider calls and completion tokens.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_fanout --tokens-per-second 60 --latency-mean 0.5 --repeat 1
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+
+from benchmarks.load_driver import _spawn, _wait_ready
+
+TOPICS = ["Photosynthesis", "Game theory", "Immunology", "Cryptography", "Urban planning"]
+
+
+async def run(args):
+    # Configure the app before its modules read the environment
+    os.environ.update({
+        "LLM_BASE_URL": f"http://127.0.0.1:{args.mock_port}/v1",
+        "LLM_API_KEY": "mock",
+        "LLM_MODEL": "mock-model",
+        "CACHE_ENABLED": "false",
+        "SEMANTIC_CACHE_ENABLED": "false",
+        "MAP_STORE_ENABLED": "false",
+    })
+    from map_service import build_topic_map
+
+    print(f"mock: {args.latency_mean}s to first token, {args.tokens_per_second:.0f} tokens/s")
+    print(f"{'mode':>9} {'p50 s':>7} {'max s':>7} {'calls':>6} {'completion tok':>15} {'nodes':>6}")
+    for mode in ("single", "parallel"):
+        walls, calls, tokens, nodes = [], [], [], []
+        for _ in range(args.repeat):
+            for topic in TOPICS[:args.topics]:
+                start = time.perf_counter()
+                result = await build_topic_map(topic, args.complexity, bypass_cache=True, generation=mode)
+                walls.append(time.perf_counter() - start)
+                metadata = result.metadata or {}
+                calls.append((metadata.get("generation") or {}).get("calls", 1))
+                tokens.append((metadata.get("usage") or {}).get("completion_tokens") or 0)
+                nodes.append(len(result.graph_nodes))
+        print(f"{mode:>9} {statistics.median(walls):>7.2f} {max(walls):>7.2f} {statistics.median(calls):>6.0f} "
+              f"{statistics.median(tokens):>15.0f} {statistics.median(nodes):>6.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--complexity", default="expert", choices=["beginner", "intermediate", "expert"])
+    parser.add_argument("--topics", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--latency-mean", type=float, default=0.5, help="Mock time to first token in seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=150)
+    parser.add_argument("--mock-port", type=int, default=9131)
+    args = parser.parse_args()
+
+    mock = _spawn([
+        sys.executable, "-m", "benchmarks.mock_llm_server", "--port", str(args.mock_port),
+        "--latency-mean", str(args.latency_mean), "--tokens-per-second", str(args.tokens_per_second),
+        "--simulate-decode", "--seed", "0",
+    ], dict(os.environ))
+    try:
+        asyncio.run(_wait_ready(f"http://127.0.0.1:{args.mock_port}/v1/models"))
+        asyncio.run(run(args))
+    finally:
+        mock.terminate()
+        mock.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark direct fusion maps against fusions composed from single-topic maps.
+
+Spawns the mock LLM server with --simulate-decode (completion time grows with
+length), then fuses one popular topic with several partners through
+map_service.build_fusion_map in three ways:
+
+  direct         one fusion prompt per pair
+  compose cold   neither topic map cached: both are generated, then bridged
+  compose warm   both topic maps already cached: only the bridge is generated
+
+The response cache is on (composition relies on it) but fusion results are
+bypassed so every pair is generated. Reports wall time and completion tokens.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_fusion --partners 4 --tokens-per-second 150
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+
+from benchmarks.load_driver import _spawn, _wait_ready
+
+POPULAR = "Machine learning"
+PARTNERS = ["Photosynthesis", "Game theory", "Immunology", "Cryptography", "Urban planning", "Jazz improvisation"]
+
+
+async def run(args):
+    # Configure the app before its modules read the environment
+    os.environ.update({
+        "LLM_BASE_URL": f"http://127.0.0.1:{args.mock_port}/v1",
+        "LLM_API_KEY": "mock",
+        "LLM_MODEL": "mock-model",
+        "SEMANTIC_CACHE_ENABLED": "false",
+        "MAP_STORE_ENABLED": "false",
+        "CACHE_DB_PATH": "",
+    })
+    from cache import get_response_cache
+    from map_service import build_fusion_map, build_topic_map
+
+    partners = PARTNERS[:args.partners]
+    print(f"mock: {args.latency_mean}s to first token, {args.tokens_per_second:.0f} tokens/s; "
+          f"{POPULAR} fused with {len(partners)} partners ({args.complexity})")
+    print(f"{'mode':>13} {'p50 s':>7} {'max s':>7} {'completion tok':>15} {'nodes':>6}")
+    for label, mode, warm in (("direct", "direct", False), ("compose cold", "compose", False), ("compose warm", "compose", True)):
+        get_response_cache().clear()
+        if warm:
+            for topic in [POPULAR] + partners:
+                await build_topic_map(topic, args.complexity)
+        walls, tokens, nodes = [], [], []
+        for partner in partners:
+            start = time.perf_counter()
+            result = await build_fusion_map(POPULAR, partner, args.complexity, bypass_cache=True, fusion=mode)
+            walls.append(time.perf_counter() - start)
+            tokens.append(((result.metadata or {}).get("usage") or {}).get("completion_tokens") or 0)
+            nodes.append(len(result.graph_nodes))
+        print(f"{label:>13} {statistics.median(walls):>7.2f} {max(walls):>7.2f} {statistics.median(tokens):>15.0f} "
+              f"{statistics.median(nodes):>6.0f}")
+    print("(compose cold tokens count the bridge only; the topic maps it generated are cached for later fusions)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--complexity", default="intermediate", choices=["beginner", "intermediate", "expert"])
+    parser.add_argument("--partners", type=int, default=4)
+    parser.add_argument("--latency-mean", type=float, default=0.5, help="Mock time to first token in seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=150)
+    parser.add_argument("--mock-port", type=int, default=9132)
+    args = parser.parse_args()
+
+    mock = _spawn([
+        sys.executable, "-m", "benchmarks.mock_llm_server", "--port", str(args.mock_port),
+        "--latency-mean", str(args.latency_mean), "--tokens-per-second", str(args.tokens_per_second),
+        "--simulate-decode", "--seed", "0",
+    ], dict(os.environ))
+    try:
+        asyncio.run(_wait_ready(f"http://127.0.0.1:{args.mock_port}/v1/models"))
+        asyncio.run(run(args))
+    finally:
+        mock.terminate()
+        mock.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark the response serialization path on large map payloads.
+
+"legacy" is the previous path: stdlib json.loads, CognitiveMapResponse(**data),
+then FastAPI's response_model handling (a second validation, jsonable_encoder
+and json.dumps). "fast" is the current path: fastjson.loads (orjson when
+installed), one model_validate and model_dump_json.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_json --nodes 40 200 --repeat 200
+"""
+import argparse
+import json
+import time
+
+from fastapi.encoders import jsonable_encoder
+
+import fastjson
+from schemas import CognitiveMapResponse
+
+
+def make_raw(n_nodes: int) -> str:
+    """An LLM reply with `n_nodes` nodes and long descriptions, as raw JSON text."""
+    types = ["sub", "contradiction", "adjacent", "example"]
+    nodes = [{"id": "core", "type": "core", "label": "Core idea", "description": "The central idea. " * 6}]
+    for i in range(1, n_nodes):
+        nodes.append({
+            "id": f"n{i}",
+            "type": types[i % len(types)],
+            "label": f"Concept number {i}",
+            "description": f"Concept {i} explains one facet of the topic in two or three full sentences. " * 3
+        })
+    links = [{"source": "core", "target": f"n{i}"} for i in range(1, n_nodes)]
+    labels = [node["label"] for node in nodes[1:]]
+    return json.dumps({
+        "topic": "Synthetic expert topic",
+        "core_idea": "Core idea",
+        "sub_ideas": labels[0::4],
+        "contradictions": labels[1::4],
+        "adjacent_fields": labels[2::4],
+        "real_world_examples": labels[3::4],
+        "graph_nodes": nodes,
+        "graph_links": links,
+        "reasoning_trail": "How the map is organised. " * 10,
+        "metadata": {"model": "bench", "attempts": [{"model": "bench", "outcome": "ok"}]}
+    })
+
+
+def legacy_path(raw: str) -> bytes:
+    result = CognitiveMapResponse(**json.loads(raw))
+    # FastAPI response_model: validate again, dump, encode with the stdlib
+    validated = CognitiveMapResponse.model_validate(result.model_dump())
+    return json.dumps(jsonable_encoder(validated.model_dump())).encode("utf-8")
+
+
+def fast_path(raw: str) -> bytes:
+    result = CognitiveMapResponse.model_validate(fastjson.loads(raw))
+    return result.model_dump_json().encode("utf-8")
+
+
+def timeit(fn, raw: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(raw)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, nargs="+", default=[40, 200])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"orjson available: {fastjson.orjson is not None}")
+    for n_nodes in args.nodes:
+        raw = make_raw(n_nodes)
+        assert json.loads(legacy_path(raw)) == json.loads(fast_path(raw))
+        legacy = timeit(legacy_path, raw, args.repeat)
+        fast = timeit(fast_path, raw, args.repeat)
+        print(f"{n_nodes:>5} nodes ({len(raw) / 1024:.0f} KB): legacy {legacy * 1000:7.3f} ms  "
+              f"fast {fast * 1000:7.3f} ms  ({legacy / fast:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
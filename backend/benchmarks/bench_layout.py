@@ -0,0 +1,81 @@
+"""
+Benchmark the server-side graph layout on synthetic maps from 20 to 5,000 nodes.
+
+Graphs are random trees rooted at a core node (the shape generated maps and
+expanded maps have). For each size the report shows the best wall time, the
+median and 90th percentile link length and the closest pair of nodes (overlap
+check), plus the time of a cached layout lookup through the response cache.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_layout --nodes 20 100 500 1000 5000 --repeat 3
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from cache import ResponseCache, MemoryCacheTier
+from layout import compute_layout, default_iterations, EXACT_REPULSION_LIMIT
+from map_service import layout_cache_key
+
+
+def make_graph(n_nodes: int, seed: int = 0):
+    rng = random.Random(seed)
+    types = ["sub", "contradiction", "adjacent", "example"]
+    nodes = [{"id": "core", "type": "core", "label": "Core"}]
+    links = []
+    for i in range(1, n_nodes):
+        # Attach to an early node so the tree has a few levels, like expanded maps
+        parent = nodes[rng.randrange(max(1, i // 3))]
+        nodes.append({"id": f"n{i}", "type": types[i % len(types)], "label": f"Node {i}"})
+        links.append({"source": parent["id"], "target": f"n{i}"})
+    return nodes, links
+
+
+def closest_pair(points: np.ndarray) -> float:
+    best = float("inf")
+    for start in range(0, len(points), 512):
+        block = points[start:start + 512]
+        dist = np.sqrt(((block[:, None, :] - points[None, :, :]) ** 2).sum(-1))
+        dist[np.arange(len(block)), np.arange(start, start + len(block))] = np.inf
+        best = min(best, float(dist.min()))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, nargs="+", default=[20, 40, 100, 200, 500, 1000, 2000, 5000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    cache = ResponseCache(MemoryCacheTier(max_entries=64, max_bytes=256 * 1024 * 1024))
+    print(f"exact repulsion up to {EXACT_REPULSION_LIMIT} nodes, grid approximation above")
+    print(f"{'nodes':>6} {'iters':>6} {'layout ms':>10} {'link p50':>9} {'link p90':>9} {'closest':>8} {'cached ms':>10}")
+    for n_nodes in args.nodes:
+        nodes, links = make_graph(n_nodes)
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            positions = compute_layout(nodes, links)
+            best = min(best, time.perf_counter() - start)
+
+        points = np.array([positions[node["id"]] for node in nodes])
+        index = {node["id"]: i for i, node in enumerate(nodes)}
+        lengths = [float(np.linalg.norm(points[index[l["source"]]] - points[index[l["target"]]])) for l in links]
+
+        data = {"graph_nodes": nodes, "graph_links": links}
+        cache.set(layout_cache_key(data), positions)
+        lookup = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            cached = cache.get(layout_cache_key(data))
+            lookup = min(lookup, time.perf_counter() - start)
+        assert len(cached) == n_nodes
+
+        print(f"{n_nodes:>6} {default_iterations(n_nodes):>6} {best * 1000:>10.1f} {np.median(lengths):>9.0f} "
+              f"{np.percentile(lengths, 90):>9.0f} {closest_pair(points):>8.1f} {lookup * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
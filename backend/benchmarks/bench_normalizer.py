@@ -0,0 +1,82 @@
+"""
+Benchmark GraphNormalizer on synthetic LLM payloads.
+
+Compares the single-pass normalizer with the previous per-node repair loop
+(which called list.index() for every node missing an id).
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_normalizer --nodes 10000
+"""
+import argparse
+import copy
+import json
+import random
+import time
+
+from graph_normalizer import GraphNormalizer
+
+
+def make_payload(n_nodes: int, seed: int = 0) -> dict:
+    """Build a messy payload: missing ids/descriptions, duplicates and dangling links."""
+    rng = random.Random(seed)
+    types = ["sub", "contradiction", "adjacent", "example"]
+    nodes = [{"id": "core", "type": "core", "label": "Core", "description": "The core idea."}]
+    for i in range(1, n_nodes):
+        node = {"type": rng.choice(types), "label": f"Concept {i}"}
+        if rng.random() > 0.2:
+            node["id"] = f"n{i}"
+        if rng.random() > 0.3:
+            node["description"] = f"Description of concept {i}. " * 3
+        nodes.append(node)
+    # Duplicates of existing nodes
+    nodes.extend(copy.deepcopy(rng.sample(nodes[1:], max(1, n_nodes // 100))))
+    links = [{"source": "core", "target": f"n{rng.randrange(1, n_nodes * 2)}"} for _ in range(n_nodes)]
+    return {"topic": "Synthetic", "core_idea": "Core", "graph_nodes": nodes, "graph_links": links}
+
+
+def legacy_repair(response_data: dict) -> dict:
+    """The per-node loop that GraphNormalizer replaced."""
+    for node in response_data['graph_nodes']:
+        if 'description' not in node or not node.get('description'):
+            node['description'] = f"This {node.get('type', 'node')} represents: {node.get('label', '')}"
+        if 'id' not in node:
+            node['id'] = f"node_{response_data['graph_nodes'].index(node)}"
+        if 'type' not in node:
+            node['type'] = 'sub'
+        if 'label' not in node:
+            node['label'] = 'Unnamed Node'
+    return response_data
+
+
+def timeit(fn, payload: dict, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        data = copy.deepcopy(payload)
+        start = time.perf_counter()
+        fn(data)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip-legacy", action="store_true", help="Skip the quadratic legacy loop")
+    args = parser.parse_args()
+
+    normalizer = GraphNormalizer()
+    results = []
+    for n in args.nodes:
+        payload = make_payload(n)
+        row = {"nodes": n, "normalizer_ms": round(timeit(lambda d: normalizer.normalize(d, "Synthetic"), payload, args.repeat) * 1000, 3)}
+        if not args.skip_legacy:
+            row["legacy_ms"] = round(timeit(legacy_repair, payload, args.repeat) * 1000, 3)
+        results.append(row)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    import logging
+    logging.disable(logging.WARNING)
+    main()
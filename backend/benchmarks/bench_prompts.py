@@ -0,0 +1,77 @@
+"""
+Measure prompt and completion token sizes for each prompt template.
+
+Prompt tokens are counted on the rendered templates. Completion savings of the
+graph-only mode are measured on a recorded full-mode response by dropping the
+flat lists the server now derives from graph_nodes. The expansion report compares
+drilling into one node with regenerating a whole map on that node's label.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_prompts
+"""
+import json
+from pathlib import Path
+
+from prompt import COMPLEXITY_SETTINGS, get_prompt, get_fusion_prompt, get_expand_prompt, expected_completion_tokens
+from graph_normalizer import LIST_FIELDS
+from tokens import estimate_tokens
+
+FIXTURES = Path(__file__).parent / "fixtures" / "recorded_responses.json"
+
+
+def prompt_report() -> list:
+    rows = []
+    for complexity in COMPLEXITY_SETTINGS:
+        full = estimate_tokens(get_prompt("Photosynthesis", complexity, "full"))
+        graph = estimate_tokens(get_prompt("Photosynthesis", complexity, "graph"))
+        fusion_full = estimate_tokens(get_fusion_prompt("Chess", "Warfare", complexity, "full"))
+        fusion_graph = estimate_tokens(get_fusion_prompt("Chess", "Warfare", complexity, "graph"))
+        rows.append({
+            "complexity": complexity,
+            "map_prompt_tokens": {"full": full, "graph": graph, "saved_pct": round(100 * (full - graph) / full, 1)},
+            "fusion_prompt_tokens": {"full": fusion_full, "graph": fusion_graph, "saved_pct": round(100 * (fusion_full - fusion_graph) / fusion_full, 1)},
+            "expected_completion_tokens": {
+                "full": expected_completion_tokens(complexity, "full"),
+                "graph": expected_completion_tokens(complexity, "graph")
+            }
+        })
+    return rows
+
+
+def completion_report() -> dict:
+    recorded = json.loads(FIXTURES.read_text())["map"]
+    graph_only = {k: v for k, v in recorded.items() if k not in LIST_FIELDS}
+    full = estimate_tokens(json.dumps(recorded))
+    graph = estimate_tokens(json.dumps(graph_only))
+    return {
+        "recorded_topic": recorded["topic"],
+        "nodes": len(recorded["graph_nodes"]),
+        "completion_tokens": {"full": full, "graph": graph, "saved_pct": round(100 * (full - graph) / full, 1)}
+    }
+
+
+def expand_report() -> dict:
+    recorded = json.loads(FIXTURES.read_text())
+    nodes = recorded["map"]["graph_nodes"]
+    node = nodes[1]
+    expand_prompt = estimate_tokens(get_expand_prompt(recorded["map"]["topic"], node, [nodes[0]["label"], node["label"]], []))
+    regenerate_prompt = estimate_tokens(get_prompt(node["label"], "intermediate", "graph"))
+    expand_completion = estimate_tokens(json.dumps(recorded["expand"]))
+    regenerate_completion = estimate_tokens(json.dumps({k: v for k, v in recorded["map"].items() if k not in LIST_FIELDS}))
+    return {
+        "node": node["label"],
+        "prompt_tokens": {"regenerate": regenerate_prompt, "expand": expand_prompt},
+        "completion_tokens": {
+            "regenerate": regenerate_completion,
+            "expand": expand_completion,
+            "ratio": round(regenerate_completion / expand_completion, 1)
+        }
+    }
+
+
+def main():
+    print(json.dumps({"prompts": prompt_report(), "completion": completion_report(), "expand": expand_report()}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
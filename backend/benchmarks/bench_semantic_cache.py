@@ -0,0 +1,101 @@
+"""
+Benchmark the semantic near-duplicate cache on a stream of topic variants.
+
+Each base topic is requested in several phrasings ("machine learning",
+"Machine Learning basics", "intro to ML", ...). The report compares the hit rate
+of the exact key cache alone with exact + semantic, counts wrong matches (a
+variant served another topic's map) and times a lookup against a large index.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_semantic_cache --threshold 0.9 --index-size 5000
+"""
+import argparse
+import random
+import time
+
+from cache import normalize_topic
+from semantic_cache import SemanticCache, np
+
+# base topic -> phrasings users send for it
+TOPICS = {
+    "machine learning": ["Machine Learning", "machine learning basics", "intro to ML", "ML", "Machine-learning explained"],
+    "natural language processing": ["NLP", "Natural Language Processing", "intro to natural language processing"],
+    "artificial intelligence": ["AI", "Artificial Intelligence", "artificial intelligence overview"],
+    "neural networks": ["neural network", "Neural Networks explained", "introduction to neural networks"],
+    "photosynthesis": ["Photosynthesis", "photosynthesis basics", "what is photosynthesis"],
+    "french revolution": ["The French Revolution", "french revolution overview", "French Revolution"],
+    "game theory": ["Game Theory", "game theory for beginners", "intro to game theory"],
+    "climate change": ["Climate Change", "climate change explained", "understanding climate change"],
+    "quantum computing": ["Quantum Computing", "quantum computing basics", "intro to quantum computing"],
+    "black holes": ["black hole", "Black Holes", "black holes explained"],
+    # Related but different maps: these must not be served each other's entries
+    "machine learning ethics": ["Machine Learning Ethics", "ethics of machine learning"],
+    "quantum mechanics": ["Quantum Mechanics", "quantum mechanics basics"],
+    "french revolution causes": ["causes of the French Revolution", "French Revolution causes"],
+    "graph theory": ["Graph Theory", "graph theory basics"],
+}
+
+
+def simulate(threshold: float, rounds: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    requests = [(base, variant) for base, variants in TOPICS.items() for variant in [base] + variants] * rounds
+    rng.shuffle(requests)
+
+    partition = ("map", "intermediate", "bench", "prompt")
+    semantic = SemanticCache(threshold=threshold)
+    exact = {}
+    counts = {"exact_hit": 0, "semantic_hit": 0, "miss": 0, "wrong": 0}
+    for base, variant in requests:
+        key = normalize_topic(variant)
+        if key in exact:
+            counts["exact_hit"] += 1
+            continue
+        match = semantic.lookup(partition, variant)
+        if match is not None:
+            counts["semantic_hit"] += 1
+            if exact[match[1]] != base:
+                counts["wrong"] += 1
+            continue
+        counts["miss"] += 1
+        exact[key] = base
+        semantic.add(partition, variant, key)
+    counts["requests"] = len(requests)
+    return counts
+
+
+def lookup_latency(index_size: int, repeat: int) -> float:
+    partition = ("map", "intermediate", "bench", "prompt")
+    semantic = SemanticCache(max_entries=index_size)
+    for i in range(index_size):
+        semantic.add(partition, f"synthetic topic number {i} about field {i % 97}", str(i))
+    start = time.perf_counter()
+    for i in range(repeat):
+        semantic.lookup(partition, f"intro to synthetic topic {i}")
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threshold", type=float, default=0.9)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--index-size", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    counts = simulate(args.threshold, args.rounds, args.seed)
+    total = counts["requests"]
+    exact_only = counts["exact_hit"] / total
+    combined = (counts["exact_hit"] + counts["semantic_hit"]) / total
+    print(f"{total} requests, threshold {args.threshold}")
+    print(f"  exact hit rate:             {exact_only:6.1%}")
+    print(f"  exact + semantic hit rate:  {combined:6.1%}")
+    print(f"  provider calls:             {counts['miss']}")
+    print(f"  wrong matches:              {counts['wrong']}")
+
+    latency = lookup_latency(args.index_size, args.repeat)
+    print(f"lookup over {args.index_size} topics ({'numpy' if np is not None else 'python'}): {latency * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
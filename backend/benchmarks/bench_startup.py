@@ -0,0 +1,152 @@
+"""
+Benchmark cold start: import time of the app and time until a new server is live
+and ready.
+
+1. Runs `python -X importtime -c "import main"` and reports the cumulative import
+   time of main and of its largest direct imports, failing (exit status 1) when
+   main exceeds --budget-ms. The modules the warm-up loads afterwards
+   (readiness.HEAVY_MODULES) are timed separately, after main.
+2. Spawns the mock LLM server, then starts uvicorn with the app `--runs` times
+   and polls /livez and /readyz every 50 ms, reporting the seconds from spawn to
+   each, plus the latency of the first map request once ready.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_startup --budget-ms 1000 --runs 3
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+import httpx
+
+from benchmarks.load_driver import _spawn, _wait_ready, BACKEND_DIR
+
+
+def importtime(code: str) -> list:
+    """(cumulative microseconds, depth, module) for every import made by `code`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BACKEND_DIR, env={**os.environ, "LLM_API_KEY": ""}, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), (len(name) - len(name.lstrip()) - 1) // 2, name.strip()))
+    return rows
+
+
+DEFERRED = """
+import time, importlib
+import main
+from readiness import HEAVY_MODULES
+for name in HEAVY_MODULES:
+    started = time.perf_counter()
+    importlib.import_module(name)
+    print(name, time.perf_counter() - started)
+"""
+
+
+def import_report(args) -> bool:
+    runs = [importtime("import main") for _ in range(args.repeat)]
+    best = min(runs, key=lambda rows: next(c for c, _, name in rows if name == "main"))
+    total = next(c for c, _, name in best if name == "main") / 1000
+    print(f"import main: {total:.0f} ms (best of {args.repeat}, budget {args.budget_ms:.0f} ms)")
+    # Children are listed before their parent: main's direct imports are the depth-1 rows just above it
+    children = []
+    for row in best:
+        if row[1] == 0:
+            if row[2] == "main":
+                break
+            children = []
+        elif row[1] == 1:
+            children.append(row)
+    for cumulative, _, name in sorted(children, reverse=True)[:args.top]:
+        print(f"  {cumulative / 1000:>8.1f} ms  {name}")
+    loaded = {name for _, _, name in best}
+    deferred = subprocess.run(
+        [sys.executable, "-c", DEFERRED], cwd=BACKEND_DIR, env={**os.environ, "LLM_API_KEY": ""},
+        capture_output=True, text=True, check=True
+    ).stdout.split()
+    print("deferred to the warm-up:")
+    for name, seconds in zip(deferred[0::2], deferred[1::2]):
+        note = " (already loaded by main!)" if name in loaded else ""
+        print(f"  {float(seconds) * 1000:>8.1f} ms  {name}{note}")
+    return total <= args.budget_ms
+
+
+def poll(url: str, deadline: float) -> float:
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return time.monotonic()
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+    raise RuntimeError(f"{url} did not return 200 in time")
+
+
+def startup_run(args, run: int) -> tuple:
+    tmp = tempfile.mkdtemp()
+    port = args.port + run
+    env = {
+        **os.environ,
+        "LLM_BASE_URL": f"http://127.0.0.1:{args.mock_port}/v1",
+        "LLM_API_KEY": "mock",
+        "LLM_MODEL": "mock-model",
+        "MAP_STORE_PATH": os.path.join(tmp, "maps.db"),
+        "JOB_JOURNAL_PATH": os.path.join(tmp, "jobs.db"),
+        "CACHE_DB_PATH": "",
+    }
+    started = time.monotonic()
+    server = _spawn([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"], env)
+    try:
+        base = f"http://127.0.0.1:{port}"
+        live = poll(f"{base}/livez", started + 30)
+        ready = poll(f"{base}/readyz", started + 30)
+        first = time.monotonic()
+        httpx.post(f"{base}/generate-map", json={"topic": f"Startup {run}"}, timeout=30).raise_for_status()
+        return live - started, ready - started, time.monotonic() - first
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "1000")))
+    parser.add_argument("--repeat", type=int, default=3, help="Import timings to take the best of")
+    parser.add_argument("--top", type=int, default=8, help="Direct imports of main to list")
+    parser.add_argument("--runs", type=int, default=3, help="Server cold starts")
+    parser.add_argument("--port", type=int, default=8140)
+    parser.add_argument("--mock-port", type=int, default=9134)
+    args = parser.parse_args()
+
+    within_budget = import_report(args)
+
+    mock = _spawn([
+        sys.executable, "-m", "benchmarks.mock_llm_server", "--port", str(args.mock_port),
+        "--latency-mean", "0.05", "--seed", "0",
+    ], dict(os.environ))
+    try:
+        import asyncio
+        asyncio.run(_wait_ready(f"http://127.0.0.1:{args.mock_port}/v1/models"))
+        results = [startup_run(args, run) for run in range(args.runs)]
+    finally:
+        mock.terminate()
+        mock.wait()
+    print(f"cold starts ({args.runs}, median): live {statistics.median(r[0] for r in results):.2f}s, "
+          f"ready {statistics.median(r[1] for r in results):.2f}s, "
+          f"first /generate-map {statistics.median(r[2] for r in results) * 1000:.0f} ms")
+    if not within_budget:
+        print(f"FAIL: import main is over the {args.budget_ms:.0f} ms budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
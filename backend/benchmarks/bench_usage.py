@@ -0,0 +1,100 @@
+"""
+Benchmark the per-call overhead of usage accounting: UsageAccountant.check before
+and .record after every provider call, with quotas configured so the check does
+its full work.
+
+Calls rotate over `--clients` client ids (1, 100, 10k by default) and are timed
+in batches of `--batch`, reporting the p50/p99 nanoseconds per check+record pair.
+The flush loop runs alongside at `--flush-interval`, writing to a temporary
+SQLite file, so the timings include the counter swaps; how long each flush of
+the pending counters took is reported separately.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_usage --calls 200000
+"""
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+from usage import UsageStore, UsageAccountant, current_client
+
+
+async def run(clients: int, args) -> dict:
+    store = UsageStore(os.path.join(tempfile.mkdtemp(), "usage.db"))
+    # Quotas high enough to never reject
+    accountant = UsageAccountant(store, token_quota=10 ** 12, request_quota=10 ** 9, flush_interval=args.flush_interval)
+    flush_times = []
+    flush = accountant.flush
+
+    async def timed_flush():
+        started = time.perf_counter()
+        rows = await flush()
+        flush_times.append((time.perf_counter() - started, rows))
+        return rows
+
+    accountant.flush = timed_flush
+    await accountant.start()
+    names = [f"client-{i}" for i in range(clients)]
+    per_op = []
+    check, record = accountant.check, accountant.record
+    for start in range(0, args.calls, args.batch):
+        token = current_client.set(names[(start // args.batch) % clients])
+        batch_started = time.perf_counter_ns()
+        for i in range(start, start + args.batch):
+            if clients > 1:
+                current_client.set(names[i % clients])
+            check(1200)
+            record(250, 900, 0.8)
+        per_op.append((time.perf_counter_ns() - batch_started) / args.batch)
+        current_client.reset(token)
+        # Let the flush loop run between batches, as it would between requests
+        await asyncio.sleep(0)
+    await accountant.stop()
+    per_op.sort()
+    return {
+        "p50": statistics.median(per_op),
+        "p99": per_op[min(len(per_op) - 1, int(len(per_op) * 0.99))],
+        "flushes": len(flush_times),
+        "flush_ms": max((seconds for seconds, _ in flush_times), default=0) * 1000,
+        "rows": max((rows for _, rows in flush_times), default=0)
+    }
+
+
+async def baseline(args) -> float:
+    """ns per iteration of the same loop with no accounting, to subtract the loop itself."""
+    started = time.perf_counter_ns()
+    token = current_client.set("client-0")
+    for _ in range(args.calls):
+        current_client.set("client-0")
+    current_client.reset(token)
+    return (time.perf_counter_ns() - started) / args.calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 100, 10000])
+    parser.add_argument("--flush-interval", type=float, default=0.05)
+    parser.add_argument("--budget-ns", type=float, default=5000, help="Fail when p99 check+record exceeds this")
+    args = parser.parse_args()
+
+    loop_ns = asyncio.run(baseline(args))
+    print(f"loop + contextvar set: {loop_ns:.0f} ns/iteration (included below)")
+    print(f"{'clients':>8} {'p50 ns':>8} {'p99 ns':>8} {'flushes':>8} {'max flush ms':>13} {'rows':>7}")
+    within_budget = True
+    for clients in args.clients:
+        result = asyncio.run(run(clients, args))
+        print(f"{clients:>8} {result['p50']:>8.0f} {result['p99']:>8.0f} {result['flushes']:>8} "
+              f"{result['flush_ms']:>13.2f} {result['rows']:>7}")
+        within_budget = within_budget and result["p99"] <= args.budget_ns
+    if not within_budget:
+        print(f"FAIL: check+record p99 is over the {args.budget_ns:.0f} ns budget")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark the cache warmer on skewed (Zipf) topic traffic, time-compressed.
+
+Spawns the mock LLM server, shrinks the cache TTL to a few seconds and replays
+the same Zipf-distributed request stream through map_service.build_topic_map
+twice: with the warmer off and with it on. Reports the hit rate overall and for
+the top-K topics, plus p50/p99 request latency and the warmer's refresh count.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_warmer --duration 30 --rate 40 --ttl 6
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import statistics
+
+from benchmarks.load_driver import _spawn, _wait_ready
+
+
+def zipf_stream(n_topics: int, n_requests: int, s: float, seed: int = 0):
+    rng = random.Random(seed)
+    weights = [1 / (rank ** s) for rank in range(1, n_topics + 1)]
+    return rng.choices(range(n_topics), weights=weights, k=n_requests)
+
+
+async def replay(args, stream, warm: bool):
+    import warmer as warmer_module
+    from cache import get_response_cache
+    from map_service import build_topic_map
+
+    os.environ["WARM_ENABLED"] = "true" if warm else "false"
+    warmer_module.cache_warmer = None
+    get_response_cache().clear()
+    warmer = warmer_module.get_cache_warmer()
+    if warmer is not None:
+        await warmer.start()
+
+    results = []
+
+    async def one(rank: int):
+        start = time.perf_counter()
+        result = await build_topic_map(f"Topic {rank}", "intermediate")
+        results.append((rank, (result.metadata or {}).get("cache") == "hit", time.perf_counter() - start))
+
+    tasks = []
+    started = time.perf_counter()
+    for i, rank in enumerate(stream):
+        # Open-loop arrivals at a fixed rate
+        delay = started + i / args.rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(one(rank)))
+    await asyncio.gather(*tasks)
+    refreshed = warmer.refreshed if warmer is not None else 0
+    if warmer is not None:
+        await warmer.stop()
+
+    # Skip the first TTL: both runs start from an empty cache
+    steady = results[int(args.ttl * args.rate):]
+    top = [r for r in steady if r[0] < args.top_k]
+    latencies = [r[2] for r in steady]
+    return {
+        "hit": sum(r[1] for r in steady) / len(steady),
+        "top_hit": sum(r[1] for r in top) / len(top) if top else 0.0,
+        "p50": statistics.median(latencies),
+        "p99": statistics.quantiles(latencies, n=100, method="inclusive")[98],
+        "refreshed": refreshed
+    }
+
+
+async def run(args):
+    os.environ.update({
+        "LLM_BASE_URL": f"http://127.0.0.1:{args.mock_port}/v1",
+        "LLM_API_KEY": "mock",
+        "LLM_MODEL": "mock-model",
+        "SEMANTIC_CACHE_ENABLED": "false",
+        "MAP_STORE_ENABLED": "false",
+        "CACHE_DB_PATH": "",
+        "CACHE_TTL_SECONDS": str(args.ttl),
+        "WARM_TOP_K": str(args.top_k),
+        "WARM_INTERVAL_SECONDS": str(args.ttl / 6),
+        "WARM_REFRESH_MARGIN": "0.4",
+        "WARM_HALF_LIFE_SECONDS": str(args.duration),
+    })
+    stream = zipf_stream(args.topics, int(args.duration * args.rate), args.zipf)
+    print(f"{len(stream)} requests over {args.topics} topics (zipf s={args.zipf}) at {args.rate}/s, "
+          f"cache TTL {args.ttl}s, mock latency {args.latency_mean}s")
+    print(f"{'warmer':>7} {'hit rate':>9} {'top-' + str(args.top_k) + ' hit':>11} {'p50 ms':>8} {'p99 ms':>8} {'refreshes':>10}")
+    for warm in (False, True):
+        report = await replay(args, stream, warm)
+        print(f"{'on' if warm else 'off':>7} {report['hit']:>9.1%} {report['top_hit']:>11.1%} "
+              f"{report['p50'] * 1000:>8.0f} {report['p99'] * 1000:>8.0f} {report['refreshed']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of traffic per run")
+    parser.add_argument("--rate", type=float, default=40, help="Requests per second")
+    parser.add_argument("--topics", type=int, default=300)
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--ttl", type=float, default=6, help="Cache TTL in seconds")
+    parser.add_argument("--latency-mean", type=float, default=0.5)
+    parser.add_argument("--mock-port", type=int, default=9133)
+    args = parser.parse_args()
+
+    mock = _spawn([
+        sys.executable, "-m", "benchmarks.mock_llm_server", "--port", str(args.mock_port),
+        "--latency-mean", str(args.latency_mean), "--seed", "0",
+    ], dict(os.environ))
+    try:
+        asyncio.run(_wait_ready(f"http://127.0.0.1:{args.mock_port}/v1/models"))
+        asyncio.run(run(args))
+    finally:
+        mock.terminate()
+        mock.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark stored-map payloads for very large maps: the full CognitiveMapResponse
+JSON against the compact wire format and delta responses.
+
+Grows a map in a temporary map store by repeated expansions (five children per
+expansion, sentence-length descriptions) until it has `--nodes` nodes, then
+fetches it through GET /maps/{id} in each format with and without gzip. Parse
+time is json.loads; decode time adds, for the compact formats, resolving the
+string table back into node and link dicts, as a client would.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_wire --nodes 1000
+"""
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+
+WORDS = (
+    "signal memory network feedback theory model system pattern energy structure learning "
+    "evidence limit context scale process value tension method field history practice risk "
+    "measure agent market culture language policy design cell growth balance origin"
+).split()
+
+TYPES = ["sub", "contradiction", "adjacent", "example"]
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def grow(store, map_id: str, n_nodes: int, rng: random.Random, batch: int = 5) -> None:
+    """Expand random nodes of the stored map until it has `n_nodes` nodes."""
+    data = store.get(map_id)
+    while len(data["graph_nodes"]) < n_nodes:
+        parent = rng.choice(data["graph_nodes"])["id"]
+        for i in range(batch):
+            node_id = f"{parent}.x{len(data['graph_nodes'])}"
+            data["graph_nodes"].append({
+                "id": node_id,
+                "type": rng.choice(TYPES),
+                "label": sentence(rng, 3)[:-1],
+                "description": " ".join(sentence(rng, 14) for _ in range(3))
+            })
+            data["graph_links"].append({"source": parent, "target": node_id})
+        store.update(map_id, data)
+        data = store.get(map_id)
+
+
+def decode_compact(payload: dict) -> list:
+    strings = payload["strings"]
+    nodes = [{"id": strings[row[0]], "type": strings[row[1]], "label": strings[row[2]]} for row in payload["nodes"]]
+    links = [{"source": strings[s], "target": strings[t]} for s, t in payload["links"]]
+    return [nodes, links]
+
+
+def parse_time(body: bytes, compact: bool, repeat: int):
+    """Best (json.loads, json.loads + decode) seconds over `repeat` runs."""
+    parse = decode = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        payload = json.loads(body)
+        parsed = time.perf_counter()
+        if compact:
+            decode_compact(payload)
+        parse = min(parse, parsed - start)
+        decode = min(decode, time.perf_counter() - start)
+    return parse, decode
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ.update({"MAP_STORE_PATH": os.path.join(tmp, "maps.db"), "MAP_STORE_ENABLED": "true", "METRICS_ENABLED": "false"})
+    from fastapi.testclient import TestClient
+    from main import app
+    from map_store import get_map_store
+    from benchmarks.bench_json import make_raw
+
+    rng = random.Random(0)
+    store = get_map_store()
+    map_id = store.new_id()
+    store.save(map_id, json.loads(make_raw(40)), "expert", "bench", "bench")
+    grow(store, map_id, args.nodes, rng)
+    version = store.get_versioned(map_id)[1]
+    # One more expansion for the delta request
+    grow(store, map_id, args.nodes + 5, rng)
+
+    client = TestClient(app)
+    variants = [
+        ("full", f"/maps/{map_id}", False),
+        ("compact", f"/maps/{map_id}?format=compact", True),
+        ("compact+desc", f"/maps/{map_id}?format=compact&descriptions=true", True),
+        ("delta", f"/maps/{map_id}?since={version}", True),
+    ]
+    print(f"map of {args.nodes + 5} nodes after {version} versions")
+    print(f"{'format':>13} {'bytes':>9} {'gzip bytes':>11} {'vs full':>8} {'parse ms':>9} {'+decode ms':>11}")
+    baseline = None
+    for label, url, compact in variants:
+        plain = client.get(url, headers={"Accept-Encoding": "identity"})
+        gzipped = client.get(url, headers={"Accept-Encoding": "gzip"})
+        assert plain.status_code == 200 and gzipped.headers.get("content-encoding") in ("gzip", None)
+        parse, decode = parse_time(plain.content, compact, args.repeat)
+        baseline = baseline or len(plain.content)
+        print(f"{label:>13} {len(plain.content):>9} {gzipped.num_bytes_downloaded:>11} {baseline / len(plain.content):>7.1f}x "
+              f"{parse * 1000:>9.2f} {decode * 1000:>11.2f}")
+    etag = client.get(f"/maps/{map_id}?format=compact").headers["etag"]
+    revalidated = client.get(f"/maps/{map_id}?format=compact", headers={"If-None-Match": etag})
+    print(f"revalidation with If-None-Match: {revalidated.status_code}, {revalidated.num_bytes_downloaded} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""
+Load driver for the MindMesh API.
+
+By default it spawns the mock LLM server and the API (pointed at the mock via
+LLM_BASE_URL), then drives each endpoint at several concurrency levels and writes
+a JSON report with p50/p95/p99 latency, RPS, error counts and API memory (RSS).
+
+Usage (from the backend directory):
+    python -m benchmarks.load_driver --concurrency 1 8 32 --requests 200 --output report.json
+    python -m benchmarks.load_driver --compare baseline.json report.json --max-regression 10
+
+Pass --api-url to drive an already running API instead of spawning one.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import subprocess
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+TOPICS = [
+    "Photosynthesis", "Machine learning", "Stoicism", "Plate tectonics", "Game theory",
+    "Quantum computing", "Jazz improvisation", "Supply chains", "Immunology", "Urban planning",
+    "Cryptography", "Behavioral economics", "Volcanoes", "Renaissance art", "Neural networks",
+]
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return round(ordered[index], 2)
+
+
+def summarize(values: List[float]) -> Dict[str, Optional[float]]:
+    return {
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": round(max(values), 2) if values else None,
+        "mean": round(sum(values) / len(values), 2) if values else None,
+    }
+
+
+class RssSampler:
+    """Samples a process's resident memory from /proc (Linux only)."""
+
+    def __init__(self, pid: Optional[int]):
+        self.pid = pid
+        self.samples: List[float] = []
+        self._task = None
+
+    def read_mb(self) -> Optional[float]:
+        if self.pid is None:
+            return None
+        try:
+            with open(f"/proc/{self.pid}/status") as status:
+                for line in status:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            return None
+        return None
+
+    async def _run(self):
+        while True:
+            value = self.read_mb()
+            if value is not None:
+                self.samples.append(value)
+            await asyncio.sleep(0.1)
+
+    def start(self):
+        self.samples = []
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> Dict[str, Optional[float]]:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if not self.samples:
+            return {"start_mb": None, "peak_mb": None}
+        return {"start_mb": round(self.samples[0], 1), "peak_mb": round(max(self.samples), 1)}
+
+
+# --- Scenarios: each returns (status_code, ttfb_seconds or None) -------------------------
+
+async def _post_json(client: httpx.AsyncClient, path: str, body: dict):
+    response = await client.post(path, json=body)
+    return response.status_code, None
+
+
+async def scenario_generate_map(client, i, args):
+    body = {"topic": random.choice(TOPICS), "complexity": "intermediate", "bypass_cache": args.bypass_cache}
+    return await _post_json(client, "/generate-map", body)
+
+
+async def scenario_fusion_map(client, i, args):
+    topic_a, topic_b = random.sample(TOPICS, 2)
+    body = {"topic_a": topic_a, "topic_b": topic_b, "complexity": "intermediate", "bypass_cache": args.bypass_cache}
+    return await _post_json(client, "/fusion-map", body)
+
+
+async def scenario_stream(client, i, args):
+    body = {"topic": random.choice(TOPICS), "complexity": "intermediate", "bypass_cache": args.bypass_cache}
+    started = time.perf_counter()
+    ttfb = None
+    async with client.stream("POST", "/generate-map/stream", json=body) as response:
+        async for line in response.aiter_lines():
+            if ttfb is None and line.startswith("event: node"):
+                ttfb = time.perf_counter() - started
+    return response.status_code, ttfb
+
+
+async def scenario_batch(client, i, args):
+    items = [{"topic": t, "bypass_cache": args.bypass_cache} for t in random.sample(TOPICS, args.batch_size)]
+    started = time.perf_counter()
+    ttfb = None
+    async with client.stream("POST", "/generate-map/batch", json={"items": items, "mode": "stream"}) as response:
+        async for line in response.aiter_lines():
+            if ttfb is None and line.strip():
+                ttfb = time.perf_counter() - started
+    return response.status_code, ttfb
+
+
+SCENARIOS = {
+    "generate-map": scenario_generate_map,
+    "fusion-map": scenario_fusion_map,
+    "generate-map/stream": scenario_stream,
+    "generate-map/batch": scenario_batch,
+}
+
+
+async def run_level(api_url: str, name: str, concurrency: int, total: int, args, sampler: RssSampler) -> Dict[str, Any]:
+    scenario = SCENARIOS[name]
+    latencies: List[float] = []
+    ttfbs: List[float] = []
+    statuses: Dict[str, int] = {}
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(i)
+
+    async def worker(client):
+        while True:
+            try:
+                i = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            try:
+                status, ttfb = await scenario(client, i, args)
+            except httpx.HTTPError as e:
+                status, ttfb = type(e).__name__, None
+            latencies.append((time.perf_counter() - started) * 1000)
+            if ttfb is not None:
+                ttfbs.append(ttfb * 1000)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=api_url, timeout=args.timeout, limits=limits) as client:
+        sampler.start()
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        memory = await sampler.stop()
+
+    errors = sum(count for status, count in statuses.items() if status != "200")
+    result = {
+        "endpoint": name,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "status_counts": statuses,
+        "duration_s": round(elapsed, 3),
+        "rps": round(total / elapsed, 2) if elapsed else None,
+        "latency_ms": summarize(latencies),
+        "memory": memory,
+    }
+    if ttfbs:
+        result["ttfb_ms"] = summarize(ttfbs)
+    return result
+
+
+# --- Process management ------------------------------------------------------------------
+
+def _spawn(cmd: List[str], env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def _wait_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready within {timeout}s")
+
+
+def spawn_stack(args) -> List[subprocess.Popen]:
+    env = dict(os.environ)
+    mock = _spawn([
+        sys.executable, "-m", "benchmarks.mock_llm_server", "--port", str(args.mock_port),
+        "--latency", args.latency, "--latency-mean", str(args.latency_mean),
+        "--tokens-per-second", str(args.tokens_per_second), "--error-rate", str(args.error_rate), "--rate-limit-rate", str(args.rate_limit_rate),
+        "--malformed-rate", str(args.malformed_rate), "--seed", "0",
+    ], env)
+    api_env = dict(env)
+    api_env.update({
+        "LLM_BASE_URL": f"http://127.0.0.1:{args.mock_port}/v1",
+        "LLM_API_KEY": "mock",
+        "LLM_MODEL": "mock-model",
+        "MAP_STORE_PATH": str(Path(args.workdir) / "bench_maps.db"),
+    })
+    api = _spawn([
+        sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.api_port), "--log-level", "warning",
+    ], api_env)
+    return [mock, api]
+
+
+async def run(args) -> Dict[str, Any]:
+    processes = []
+    api_url = args.api_url
+    if api_url is None:
+        processes = spawn_stack(args)
+        api_url = f"http://127.0.0.1:{args.api_port}"
+    try:
+        if processes:
+            await _wait_ready(f"http://127.0.0.1:{args.mock_port}/v1/models")
+        await _wait_ready(f"{api_url}/health")
+        sampler = RssSampler(processes[1].pid if processes else None)
+        results = []
+        for name in args.endpoints:
+            for concurrency in args.concurrency:
+                total = max(args.requests, concurrency)
+                print(f"{name} @ concurrency {concurrency} ({total} requests)...", file=sys.stderr)
+                results.append(await run_level(api_url, name, concurrency, total, args, sampler))
+        return {
+            "meta": {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "api_url": api_url,
+                "mock": None if args.api_url else {
+                    "latency": args.latency, "latency_mean": args.latency_mean,
+                    "tokens_per_second": args.tokens_per_second, "error_rate": args.error_rate,
+                    "rate_limit_rate": args.rate_limit_rate, "malformed_rate": args.malformed_rate,
+                },
+                "bypass_cache": args.bypass_cache,
+            },
+            "results": results,
+        }
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+
+def compare(baseline_path: str, report_path: str, max_regression: float) -> int:
+    """Print p95/RPS deltas between two reports. Returns 1 if any p95 regressed past the threshold."""
+    def index(report):
+        return {(r["endpoint"], r["concurrency"]): r for r in report["results"]}
+    baseline = index(json.loads(Path(baseline_path).read_text()))
+    current = index(json.loads(Path(report_path).read_text()))
+    failed = False
+    for key in sorted(current):
+        if key not in baseline:
+            continue
+        old, new = baseline[key], current[key]
+        old_p95, new_p95 = old["latency_ms"]["p95"], new["latency_ms"]["p95"]
+        change = 100 * (new_p95 - old_p95) / old_p95 if old_p95 else 0.0
+        flag = "REGRESSION" if change > max_regression else "ok"
+        failed = failed or change > max_regression
+        print(f"{key[0]:<22} c={key[1]:<4} p95 {old_p95:>9} -> {new_p95:>9} ms ({change:+.1f}%)  "
+              f"rps {old['rps']} -> {new['rps']}  {flag}")
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--api-url", default=None, help="Drive an existing API instead of spawning one")
+    parser.add_argument("--endpoints", nargs="+", choices=list(SCENARIOS), default=["generate-map", "fusion-map"])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=100, help="Requests per endpoint and concurrency level")
+    parser.add_argument("--batch-size", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--no-bypass-cache", dest="bypass_cache", action="store_false",
+                        help="Let repeated topics hit the response cache")
+    parser.add_argument("--api-port", type=int, default=8765)
+    parser.add_argument("--mock-port", type=int, default=9100)
+    parser.add_argument("--latency", choices=["fixed", "uniform", "lognormal", "exponential"], default="lognormal")
+    parser.add_argument("--latency-mean", type=float, default=0.5)
+    parser.add_argument("--tokens-per-second", type=float, default=400)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--workdir", default="/tmp")
+    parser.add_argument("--output", default=None, help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "REPORT"), help="Diff two reports and exit")
+    parser.add_argument("--max-regression", type=float, default=10.0, help="Allowed p95 increase in percent")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(compare(args.compare[0], args.compare[1], args.max_regression))
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Local fake OpenAI-compatible LLM server for offline benchmarking.
+
+Replays recorded generate_cognitive_map responses from fixtures/recorded_responses.json
+with configurable latency, streaming token rate and error / 429 / malformed-JSON injection.
+Fan-out prompts (skeleton, section and description calls) get matching slices of the
+recorded map, and fusion bridge prompts get the recorded fusion's connecting nodes. With --simulate-decode non-streaming responses also take as long as
+their length at --tokens-per-second, so long completions are slower than short ones.
+
+Usage (from the backend directory):
+    python -m benchmarks.mock_llm_server --port 9100 --latency lognormal --latency-mean 2 --rate-limit-rate 0.05
+    LLM_BASE_URL=http://127.0.0.1:9100/v1 LLM_API_KEY=mock uvicorn main:app --port 8000
+"""
+import os
+import re
+import json
+import math
+import time
+import uuid
+import random
+import asyncio
+import argparse
+from pathlib import Path
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+FIXTURES = Path(__file__).parent / "fixtures" / "recorded_responses.json"
+
+
+class MockConfig:
+    """Behaviour knobs, read from MOCK_LLM_* environment variables (set by the CLI)."""
+
+    def __init__(self):
+        self.latency = os.getenv("MOCK_LLM_LATENCY", "fixed")  # fixed | uniform | lognormal | exponential
+        self.latency_mean = float(os.getenv("MOCK_LLM_LATENCY_MEAN", "1.0"))
+        self.latency_sigma = float(os.getenv("MOCK_LLM_LATENCY_SIGMA", "0.5"))
+        self.tokens_per_second = float(os.getenv("MOCK_LLM_TOKENS_PER_SECOND", "400"))
+        self.error_rate = float(os.getenv("MOCK_LLM_ERROR_RATE", "0"))
+        self.rate_limit_rate = float(os.getenv("MOCK_LLM_RATE_LIMIT_RATE", "0"))
+        self.malformed_rate = float(os.getenv("MOCK_LLM_MALFORMED_RATE", "0"))
+        self.seed = os.getenv("MOCK_LLM_SEED")
+        self.simulate_decode = os.getenv("MOCK_LLM_SIMULATE_DECODE", "false").lower() == "true"
+
+    def sample_latency(self, rng: random.Random) -> float:
+        mean = self.latency_mean
+        if self.latency == "uniform":
+            return rng.uniform(0, 2 * mean)
+        if self.latency == "exponential":
+            return rng.expovariate(1 / mean) if mean > 0 else 0.0
+        if self.latency == "lognormal":
+            # Parameterised so the distribution's mean equals latency_mean
+            sigma = self.latency_sigma
+            if mean <= 0:
+                return 0.0
+            return rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma)
+        return mean
+
+
+config = MockConfig()
+rng = random.Random(config.seed)
+recorded = json.loads(FIXTURES.read_text())
+stats = {"requests": 0, "streamed": 0, "errors": 0, "rate_limited": 0, "malformed": 0}
+
+app = FastAPI(title="Mock LLM server")
+
+
+def _fanout(prompt: str) -> dict:
+    """Skeleton, section or description response for a fan-out prompt, cut from the recorded map."""
+    data = recorded["map"]
+    nodes = {node["id"]: node for node in data["graph_nodes"]}
+    if '"core_label"' in prompt:
+        topic = next((line[len("Topic:"):].strip() for line in prompt.splitlines() if line.startswith("Topic:")), data["topic"])
+        return {
+            "topic": topic,
+            "core_label": nodes["core"]["label"],
+            "core_idea": data["core_idea"],
+            "sub_ideas": [node["label"] for node in data["graph_nodes"] if node["type"] == "sub"]
+        }
+    section = re.search(r'"section": "(\w+)"', prompt)
+    if section:
+        parents = {link["target"]: link["source"] for link in data["graph_links"]}
+        return {"section": section.group(1), "nodes": [
+            {"label": node["label"], "description": node["description"], "parent": parents.get(node["id"], "core")}
+            for node in data["graph_nodes"] if node["type"] == section.group(1)
+        ]}
+    ids = re.search(r"these nodes: ([\w, ]+)\.", prompt).group(1).split(", ")
+    result = {"descriptions": {
+        node_id: nodes[node_id]["description"] if node_id in nodes else f"Recorded description for {node_id}."
+        for node_id in ids
+    }}
+    if '"reasoning_trail"' in prompt:
+        result["reasoning_trail"] = data["reasoning_trail"]
+    return result
+
+
+def _bridge(prompt: str) -> dict:
+    """Bridge response for a composed fusion: the recorded fusion's sub and contradiction nodes, linked across both maps."""
+    data = recorded["fusion"]
+    ids_a = re.findall(r"^(a\.\w+):", prompt, re.M)
+    ids_b = re.findall(r"^(b\.\w+):", prompt, re.M)
+    bridges = []
+    for i, node in enumerate(n for n in data["graph_nodes"] if n["type"] in ("sub", "contradiction")):
+        bridges.append({
+            "type": "intersection" if node["type"] == "sub" else "tension",
+            "label": node["label"],
+            "description": node["description"],
+            "links": [ids_a[i % len(ids_a)], ids_b[i % len(ids_b)]] if ids_a and ids_b else []
+        })
+    core = next(node for node in data["graph_nodes"] if node["type"] == "core")
+    return {"core_label": core["label"], "core_idea": data["core_idea"], "bridges": bridges, "reasoning_trail": data["reasoning_trail"]}
+
+
+def _render(prompt: str) -> str:
+    """Pick the recorded response matching the prompt kind and personalise its topic."""
+    if '"bridges"' in prompt:
+        return json.dumps(_bridge(prompt))
+    if '"core_label"' in prompt or '"section"' in prompt or '"descriptions"' in prompt:
+        return json.dumps(_fanout(prompt))
+    if '"children"' in prompt and "expand" in recorded:
+        return json.dumps(recorded["expand"])
+    if "Topic A:" in prompt and "fusion" in recorded:
+        data = dict(recorded["fusion"])
+    else:
+        data = dict(recorded["map"])
+        for line in prompt.splitlines():
+            if line.startswith("Topic:"):
+                data["topic"] = line[len("Topic:"):].strip()
+    return json.dumps(data)
+
+
+def _usage(prompt: str, content: str) -> dict:
+    prompt_tokens = len(prompt) // 4
+    completion_tokens = len(content) // 4
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+
+@app.get("/v1/models")
+async def models():
+    return {"object": "list", "data": [{"id": "mock-model", "object": "model", "owned_by": "mock"}]}
+
+
+@app.get("/stats")
+async def server_stats():
+    return stats
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+    prompt = body["messages"][-1]["content"]
+    model = body.get("model", "mock-model")
+
+    roll = rng.random()
+    if roll < config.rate_limit_rate:
+        stats["rate_limited"] += 1
+        return JSONResponse(
+            {"error": {"message": "Rate limit reached (mock)", "type": "rate_limit_exceeded"}},
+            status_code=429,
+            headers={"retry-after": "1"}
+        )
+    if roll < config.rate_limit_rate + config.error_rate:
+        stats["errors"] += 1
+        await asyncio.sleep(config.sample_latency(rng) / 4)
+        return JSONResponse({"error": {"message": "Internal error (mock)", "type": "server_error"}}, status_code=500)
+
+    content = _render(prompt)
+    if rng.random() < config.malformed_rate:
+        stats["malformed"] += 1
+        content = content[: len(content) // 2]
+
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    created = int(time.time())
+
+    if body.get("stream"):
+        stats["streamed"] += 1
+
+        async def chunks():
+            # Time to first token, then content at tokens_per_second (~4 characters per token)
+            await asyncio.sleep(config.sample_latency(rng) / 4)
+            step = 16
+            delay = step / 4 / config.tokens_per_second if config.tokens_per_second > 0 else 0
+            for i in range(0, len(content), step):
+                chunk = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": {"content": content[i:i + step]}, "finish_reason": None}]
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(delay)
+            final = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    delay = config.sample_latency(rng)
+    if config.simulate_decode and config.tokens_per_second > 0:
+        delay += len(content) / 4 / config.tokens_per_second
+    await asyncio.sleep(delay)
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": _usage(prompt, content)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", choices=["fixed", "uniform", "lognormal", "exponential"], default="fixed")
+    parser.add_argument("--latency-mean", type=float, default=1.0, help="Mean completion latency in seconds")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Lognormal shape parameter")
+    parser.add_argument("--tokens-per-second", type=float, default=400, help="Streaming token rate")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Fraction of responses with truncated JSON")
+    parser.add_argument("--simulate-decode", action="store_true",
+                        help="Delay non-streaming responses by their length at --tokens-per-second")
+    parser.add_argument("--seed", default=None)
+    args = parser.parse_args()
+
+    os.environ.update({
+        "MOCK_LLM_LATENCY": args.latency,
+        "MOCK_LLM_LATENCY_MEAN": str(args.latency_mean),
+        "MOCK_LLM_LATENCY_SIGMA": str(args.latency_sigma),
+        "MOCK_LLM_TOKENS_PER_SECOND": str(args.tokens_per_second),
+        "MOCK_LLM_ERROR_RATE": str(args.error_rate),
+        "MOCK_LLM_RATE_LIMIT_RATE": str(args.rate_limit_rate),
+        "MOCK_LLM_MALFORMED_RATE": str(args.malformed_rate),
+        "MOCK_LLM_SIMULATE_DECODE": "true" if args.simulate_decode else "false",
+    })
+    if args.seed is not None:
+        os.environ["MOCK_LLM_SEED"] = args.seed
+
+    import uvicorn
+    uvicorn.run("benchmarks.mock_llm_server:app", host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple, Union
+
+import fastjson
+from shared_state import get_shared_state
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_topic(topic: str) -> str:
+    """Normalize a topic so trivially different spellings share a cache entry."""
+    return " ".join(topic.split()).casefold()
+
+
+def make_cache_key(kind: str, params: Dict[str, Any], model: str, prompt_hash: str) -> str:
+    """
+    Build a content-addressed cache key.
+    The key covers the normalized request, the model name and the prompt template hash,
+    so changing any of them naturally invalidates old entries.
+    """
+    payload = json.dumps(
+        {"kind": kind, "params": params, "model": model, "prompt": prompt_hash},
+        sort_keys=True,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryCacheTier:
+    """In-process LRU tier bounded by entry count, total bytes and TTL."""
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 32 * 1024 * 1024, ttl: float = 3600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Union[str, bytes]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at, _ = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Union[str, bytes], ttl: Optional[float] = None) -> None:
+        """Store `value` (text or, for exports, bytes) for `ttl` seconds (default: the tier's TTL)."""
+        # The budget is in bytes: maps in non-Latin scripts take 2-4 bytes per character
+        size = len(value) if isinstance(value, bytes) else len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl), size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        if key in self._entries:
+            self._remove(key)
+
+    def ttl_remaining(self, key: str) -> Optional[float]:
+        """Seconds until the entry expires, or None if absent. Does not touch LRU order."""
+        entry = self._entries.get(key)
+        if entry is None or entry[1] < time.monotonic():
+            return None
+        return entry[1] - time.monotonic()
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def _remove(self, key: str) -> None:
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+
+class SqliteCacheTier:
+    """
+    Optional on-disk tier so cached maps survive restarts. Expired rows are
+    deleted on open and every `purge_every` writes.
+    """
+
+    def __init__(self, path: str, ttl: float = 3600, purge_every: int = 1000):
+        self.path = path
+        self.ttl = ttl
+        self.purge_every = purge_every
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self.purge_expired()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self.get_with_ttl(key)
+        return entry[0] if entry is not None else None
+
+    def get_with_ttl(self, key: str) -> Optional[Tuple[str, Optional[float]]]:
+        """The value and the seconds it has left, or None if absent or expired."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            remaining = row[1] - time.time()
+            if remaining < 0:
+                self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            return row[0], remaining
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + self.ttl)
+            )
+            self._conn.commit()
+            self._writes += 1
+            purge = self._writes >= self.purge_every
+            if purge:
+                self._writes = 0
+        if purge:
+            self.purge_expired()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def ttl_remaining(self, key: str) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute("SELECT expires_at FROM response_cache WHERE key = ?", (key,)).fetchone()
+        if row is None or row[0] < time.time():
+            return None
+        return row[0] - time.time()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM response_cache")
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM response_cache WHERE expires_at < ?", (time.time(),))
+            self._conn.commit()
+            return cursor.rowcount
+
+
+class SharedCacheTier:
+    """Second tier kept in the cross-worker shared state, so every worker sees every entry."""
+
+    prefix = "cache:"
+
+    def __init__(self, state, ttl: float = 3600):
+        self.state = state
+        self.ttl = ttl
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self.get_with_ttl(key)
+        return entry[0] if entry is not None else None
+
+    def get_with_ttl(self, key: str) -> Optional[Tuple[str, Optional[float]]]:
+        """
+        The value and the seconds it has left, or None if absent. Values are stored
+        behind their expiry time, since the state backends cannot report TTLs.
+        """
+        try:
+            stored = self.state.get(self.prefix + key)
+        except Exception as e:
+            logger.warning(f"Could not read from shared cache: {str(e)}")
+            return None
+        if stored is None:
+            return None
+        expires_at, separator, value = stored.partition("\n")
+        if not separator or stored.startswith("{"):
+            # Written before expiry times were stored
+            return stored, None
+        return value, float(expires_at) - time.time()
+
+    def set(self, key: str, value: str) -> None:
+        try:
+            self.state.set(self.prefix + key, f"{time.time() + self.ttl}\n{value}", self.ttl)
+        except Exception as e:
+            logger.warning(f"Could not write to shared cache: {str(e)}")
+
+    def delete(self, key: str) -> None:
+        try:
+            self.state.delete(self.prefix + key)
+        except Exception as e:
+            logger.warning(f"Could not delete from shared cache: {str(e)}")
+
+    def ttl_remaining(self, key: str) -> Optional[float]:
+        entry = self.get_with_ttl(key)
+        return entry[1] if entry is not None else None
+
+    def clear(self) -> None:
+        try:
+            self.state.clear(self.prefix)
+        except Exception as e:
+            logger.warning(f"Could not clear shared cache: {str(e)}")
+
+
+class ResponseCache:
+    """
+    Two-tier response cache: a memory LRU in front of an optional SQLite or
+    shared (multi-worker) tier.
+    Values are stored as JSON text so every hit hands back a fresh copy.
+    """
+
+    def __init__(self, memory: MemoryCacheTier, disk=None, enabled: bool = True):
+        self.memory = memory
+        self.disk = disk
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            try:
+                entry = self.disk.get_with_ttl(key)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not read from disk cache: {str(e)}")
+                entry = None
+            if entry is not None:
+                value, remaining = entry
+                self.disk_hits += 1
+                # Keep the disk entry's expiry, or the copy would outlive CACHE_TTL
+                if remaining is None or remaining > 0:
+                    self.memory.set(key, value, remaining)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return fastjson.loads(value)
+
+    def set(self, key: str, data: Dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+        value = fastjson.dumps(data)
+        self.memory.set(key, value)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not write to disk cache: {str(e)}")
+
+    def delete(self, key: str) -> None:
+        self.memory.delete(key)
+        if self.disk is not None:
+            try:
+                self.disk.delete(key)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not delete from disk cache: {str(e)}")
+
+    def contains(self, key: str) -> bool:
+        """Whether `key` is cached, without parsing it or counting a hit or miss."""
+        return self.ttl_remaining(key) is not None
+
+    def ttl_remaining(self, key: str) -> Optional[float]:
+        """Seconds until the entry expires, or None if it is not cached."""
+        if not self.enabled:
+            return None
+        remaining = self.memory.ttl_remaining(key)
+        if remaining is None and self.disk is not None:
+            try:
+                remaining = self.disk.ttl_remaining(key)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not read from disk cache: {str(e)}")
+        return remaining
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            try:
+                self.disk.clear()
+            except sqlite3.Error as e:
+                logger.warning(f"Could not clear disk cache: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self.memory),
+            "bytes": self.memory.size_bytes,
+            "evictions": self.memory.evictions,
+            "disk_enabled": self.disk is not None
+        }
+
+
+# Global instance - will be initialized lazily
+response_cache = None
+
+def get_response_cache():
+    """Get or create the global response cache configured from the environment."""
+    global response_cache
+    if response_cache is None:
+        enabled = os.getenv("CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+        ttl = float(os.getenv("CACHE_TTL_SECONDS", "3600"))
+        memory = MemoryCacheTier(
+            max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "512")),
+            max_bytes=int(os.getenv("CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+            ttl=ttl
+        )
+        disk = None
+        db_path = os.getenv("CACHE_DB_PATH", "")
+        if enabled and db_path:
+            try:
+                disk = SqliteCacheTier(db_path, ttl=ttl)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not open disk cache at {db_path}: {str(e)}")
+        elif enabled and get_shared_state() is not None:
+            disk = SharedCacheTier(get_shared_state(), ttl=ttl)
+        response_cache = ResponseCache(memory, disk, enabled=enabled)
+    return response_cache
@@ -0,0 +1,318 @@
+import os
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import Dict, Any, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from schemas import CognitiveMapResponse
+from cache import MemoryCacheTier, make_cache_key
+from rate_limiter import RateLimitExceeded
+from metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# Bump when the rendering changes so cached files are re-rendered
+EXPORT_VERSION = "1"
+
+MEDIA_TYPES = {
+    "svg": "image/svg+xml",
+    "pdf": "application/pdf",
+    "png": "image/png",
+}
+
+# Same palette and sizes as frontend/src/components/Graph.jsx
+COLORS = {
+    "core": "#3b82f6",
+    "sub": "#22c55e",
+    "contradiction": "#ef4444",
+    "adjacent": "#f59e0b",
+    "example": "#a855f7",
+}
+DEFAULT_COLOR = "#777777"
+NODE_RADIUS = 16
+LABEL_SIZE = 14
+MARGIN = 40
+
+SECTIONS = [
+    ("Sub-ideas", "sub_ideas"),
+    ("Contradictions", "contradictions"),
+    ("Adjacent Fields", "adjacent_fields"),
+    ("Real-world Examples", "real_world_examples"),
+]
+
+
+def positioned_dump(result: CognitiveMapResponse) -> Dict[str, Any]:
+    """model_dump() plus the x/y positions the client sent, which dumps leave out."""
+    data = result.model_dump()
+    for node, dumped in zip(result.graph_nodes, data["graph_nodes"]):
+        if node.x is not None and node.y is not None:
+            dumped["x"], dumped["y"] = node.x, node.y
+    return data
+
+
+def _scene(data: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], List[Tuple[Dict, Dict]], float, float]:
+    """
+    Nodes shifted so the drawing starts at (MARGIN, MARGIN), the links between them,
+    and the canvas size. Maps without positions are laid out first.
+    """
+    nodes = data["graph_nodes"]
+    if not all("x" in node and "y" in node for node in nodes):
+        from layout import compute_layout
+        positions = compute_layout(nodes, data["graph_links"])
+        nodes = [{**node, "x": positions[node["id"]][0], "y": positions[node["id"]][1]} for node in nodes]
+    if not nodes:
+        return [], [], 2 * MARGIN, 2 * MARGIN
+
+    # Leave room for labels, which are drawn to the right of each node
+    min_x = min(node["x"] for node in nodes) - NODE_RADIUS
+    min_y = min(node["y"] for node in nodes) - NODE_RADIUS
+    max_x = max(node["x"] + NODE_RADIUS + 4 + LABEL_SIZE * 0.6 * len(node["label"]) for node in nodes)
+    max_y = max(node["y"] for node in nodes) + NODE_RADIUS
+    placed = [{**node, "x": node["x"] - min_x + MARGIN, "y": node["y"] - min_y + MARGIN} for node in nodes]
+    by_id = {node["id"]: node for node in placed}
+    links = [
+        (by_id[link["source"]], by_id[link["target"]])
+        for link in data["graph_links"]
+        if link["source"] in by_id and link["target"] in by_id
+    ]
+    return placed, links, max_x - min_x + 2 * MARGIN, max_y - min_y + 2 * MARGIN
+
+
+def render_svg(data: Dict[str, Any]) -> bytes:
+    nodes, links, width, height = _scene(data)
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.0f}" height="{height:.0f}" '
+        f'viewBox="0 0 {width:.0f} {height:.0f}" font-family="Helvetica, Arial, sans-serif">',
+        f'<title>{escape(data.get("topic", ""))}</title>',
+        '<rect width="100%" height="100%" fill="#ffffff"/>',
+        '<g stroke="#555555" stroke-opacity="0.7" stroke-width="1.5">',
+    ]
+    for source, target in links:
+        parts.append(f'<line x1="{source["x"]:.1f}" y1="{source["y"]:.1f}" x2="{target["x"]:.1f}" y2="{target["y"]:.1f}"/>')
+    parts.append('</g><g stroke="#ffffff" stroke-width="1.5">')
+    for node in nodes:
+        color = COLORS.get(node["type"], DEFAULT_COLOR)
+        parts.append(
+            f'<circle cx="{node["x"]:.1f}" cy="{node["y"]:.1f}" r="{NODE_RADIUS}" fill="{color}">'
+            f'<title>{escape(node.get("description") or "")}</title></circle>'
+        )
+    parts.append(f'</g><g font-size="{LABEL_SIZE}" font-weight="600" fill="#111111">')
+    for node in nodes:
+        parts.append(f'<text x="{node["x"] + 18:.1f}" y="{node["y"] + 4:.1f}">{escape(node["label"])}</text>')
+    parts.append("</g></svg>")
+    return "\n".join(parts).encode("utf-8")
+
+
+def render_png(data: Dict[str, Any], scale: float = 1.0) -> bytes:
+    from PIL import Image, ImageDraw, ImageFont
+
+    nodes, links, width, height = _scene(data)
+    image = Image.new("RGB", (max(1, int(width * scale)), max(1, int(height * scale))), "white")
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=LABEL_SIZE * scale)
+    for source, target in links:
+        draw.line(
+            [(source["x"] * scale, source["y"] * scale), (target["x"] * scale, target["y"] * scale)],
+            fill="#8c8c8c", width=max(1, round(1.5 * scale))
+        )
+    r = NODE_RADIUS * scale
+    for node in nodes:
+        x, y = node["x"] * scale, node["y"] * scale
+        draw.ellipse([x - r, y - r, x + r, y + r], fill=COLORS.get(node["type"], DEFAULT_COLOR), outline="white", width=max(1, round(1.5 * scale)))
+    for node in nodes:
+        draw.text((node["x"] * scale + 18 * scale, node["y"] * scale), node["label"], fill="#111111", font=font, anchor="lm")
+    out = BytesIO()
+    image.save(out, format="PNG", optimize=False)
+    return out.getvalue()
+
+
+def render_pdf(data: Dict[str, Any]) -> bytes:
+    """Page one is the graph scaled to fit; the following pages list every idea with its description."""
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.colors import HexColor
+    from reportlab.lib.utils import simpleSplit
+    from reportlab.pdfgen import canvas
+
+    nodes, links, width, height = _scene(data)
+    out = BytesIO()
+    page_w, page_h = landscape(A4)
+    pdf = canvas.Canvas(out, pagesize=(page_w, page_h), invariant=1)
+    pdf.setTitle(f"Cognitive Map: {data.get('topic', '')}")
+
+    pdf.setFont("Helvetica-Bold", 16)
+    pdf.drawString(MARGIN, page_h - MARGIN, f"Cognitive Map: {data.get('topic', '')}")
+    top = page_h - MARGIN - 16
+    scale = min((page_w - 2 * MARGIN) / width, (top - MARGIN) / height, 1.0)
+    pdf.saveState()
+    pdf.translate(MARGIN, top)
+    pdf.scale(scale, -scale)  # Graph coordinates grow downwards like SVG
+    pdf.setStrokeColor(HexColor("#8c8c8c"))
+    pdf.setLineWidth(1.5)
+    for source, target in links:
+        pdf.line(source["x"], source["y"], target["x"], target["y"])
+    pdf.setStrokeColor(HexColor("#ffffff"))
+    for node in nodes:
+        pdf.setFillColor(HexColor(COLORS.get(node["type"], DEFAULT_COLOR)))
+        pdf.circle(node["x"], node["y"], NODE_RADIUS, stroke=1, fill=1)
+    pdf.setFillColor(HexColor("#111111"))
+    pdf.setFont("Helvetica-Bold", LABEL_SIZE)
+    for node in nodes:
+        # Flip text back upright at its anchor
+        pdf.saveState()
+        pdf.translate(node["x"] + 18, node["y"] + 4)
+        pdf.scale(1, -1)
+        pdf.drawString(0, 0, node["label"])
+        pdf.restoreState()
+    pdf.restoreState()
+    pdf.showPage()
+
+    text_width = page_w - 2 * MARGIN
+    y = page_h - MARGIN
+
+    def write(text: str, font: str, size: int, gap: float = 4):
+        nonlocal y
+        for line in simpleSplit(text, font, size, text_width):
+            if y < MARGIN + size:
+                pdf.showPage()
+                y = page_h - MARGIN
+            pdf.setFont(font, size)
+            pdf.drawString(MARGIN, y - size, line)
+            y -= size * 1.3
+        y -= gap
+
+    write(f"Cognitive Map: {data.get('topic', '')}", "Helvetica-Bold", 18, 8)
+    if data.get("reasoning_trail"):
+        write("Reasoning Trail", "Helvetica-Bold", 13)
+        write(data["reasoning_trail"], "Helvetica", 10, 8)
+    write("Core Idea", "Helvetica-Bold", 13)
+    write(data.get("core_idea", ""), "Helvetica", 10, 8)
+    descriptions = {node["label"]: node.get("description") or "" for node in data["graph_nodes"]}
+    for title, key in SECTIONS:
+        if not data.get(key):
+            continue
+        write(title, "Helvetica-Bold", 13)
+        for item in data[key]:
+            write(f"- {item}", "Helvetica-Bold", 10, 1)
+            if descriptions.get(item):
+                write(descriptions[item], "Helvetica", 9, 4)
+        y -= 6
+    pdf.showPage()
+    pdf.save()
+    return out.getvalue()
+
+
+RENDERERS = {
+    "svg": render_svg,
+    "pdf": render_pdf,
+    "png": render_png,
+}
+
+
+def render(fmt: str, data: Dict[str, Any]) -> bytes:
+    """Render a map dict in one format. Runs in the export worker processes."""
+    return RENDERERS[fmt](data)
+
+
+class Exporter:
+    """
+    Renders maps in a bounded process pool so layout and rasterizing never block the
+    event loop, and caches the files by format and map content.
+    Raises RateLimitExceeded when more than `max_pending` renders are queued.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 16, cache: MemoryCacheTier = None):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.cache = cache or MemoryCacheTier(max_entries=256, max_bytes=64 * 1024 * 1024)
+        self._pool = None
+        self._pid = None
+        self.pending = 0
+        self.renders = 0
+        self.cache_hits = 0
+        self.rejected = 0
+
+    def _executor(self) -> ProcessPoolExecutor:
+        # Workers are started on first use in each server process, never inherited across a fork
+        if self._pool is None or self._pid != os.getpid():
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            self._pid = os.getpid()
+        return self._pool
+
+    @staticmethod
+    def cache_key(fmt: str, data: Dict[str, Any], source: Optional[str] = None) -> str:
+        if source is not None:
+            return make_cache_key("export", {"format": fmt, "source": source}, "renderer", EXPORT_VERSION)
+        return make_cache_key("export", {"format": fmt, "map": data}, "renderer", EXPORT_VERSION)
+
+    async def export(self, fmt: str, data: Dict[str, Any], source: Optional[str] = None) -> bytes:
+        """
+        Rendered file contents for a map dict (graph nodes may carry x/y).
+        `source` names immutable content, e.g. a stored map id and version, and is
+        used as the cache key instead of hashing the whole map.
+        """
+        if fmt not in RENDERERS:
+            raise ValueError(f"Unsupported export format '{fmt}' (expected svg, pdf or png)")
+        if source is not None:
+            key = self.cache_key(fmt, data, source)
+        else:
+            # Serializing and hashing a large map takes milliseconds; keep it off the loop
+            key = await asyncio.to_thread(self.cache_key, fmt, data)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.cache_hits += 1
+            return cached
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise RateLimitExceeded("Too many exports in progress, try again shortly", retry_after=1.0)
+        self.pending += 1
+        try:
+            with timed("export"):
+                content = await asyncio.get_running_loop().run_in_executor(self._executor(), render, fmt, data)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); start a fresh pool for the next export
+            self.shutdown()
+            raise RuntimeError("Export worker exited unexpectedly")
+        finally:
+            self.pending -= 1
+        self.renders += 1
+        self.cache.set(key, content)
+        return content
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "renders": self.renders,
+            "cache_hits": self.cache_hits,
+            "rejected": self.rejected,
+            "cache_entries": len(self.cache),
+            "cache_bytes": self.cache.size_bytes,
+        }
+
+    def shutdown(self) -> None:
+        pool, self._pool = self._pool, None
+        if pool is not None and self._pid == os.getpid():
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Global instance - will be initialized lazily
+exporter = None
+
+def get_exporter() -> Exporter:
+    """Get or create the global exporter"""
+    global exporter
+    if exporter is None:
+        exporter = Exporter(
+            workers=int(os.getenv("EXPORT_WORKERS", "2")),
+            max_pending=int(os.getenv("EXPORT_MAX_PENDING", "16")),
+            cache=MemoryCacheTier(
+                max_entries=int(os.getenv("EXPORT_CACHE_MAX_ENTRIES", "256")),
+                max_bytes=int(os.getenv("EXPORT_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+                ttl=float(os.getenv("CACHE_TTL_SECONDS", "3600"))
+            )
+        )
+    return exporter
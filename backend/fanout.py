@@ -0,0 +1,180 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional
+
+from prompt import (
+    get_skeleton_prompt, get_section_prompt, get_describe_prompt, expected_section_tokens,
+    get_output_mode, FANOUT_PROMPT_HASH
+)
+from tokens import estimate_tokens
+from llm_client import get_llm_client
+from graph_normalizer import SUB_LINKED_TYPES
+from metrics import timed
+
+logger = logging.getLogger(__name__)
+
+GENERATION_MODES = ("single", "parallel", "auto")
+
+# Sections generated concurrently once the skeleton is known, and their node id prefixes
+SECTION_TYPES = ("contradiction", "adjacent", "example")
+ID_PREFIXES = {"contradiction": "con", "adjacent": "adj", "example": "ex"}
+
+# Skeleton nodes (core and sub-ideas) described per call
+DESCRIBE_BATCH = 4
+
+
+def get_generation_mode(requested: Optional[str], complexity: str) -> str:
+    """
+    "single" or "parallel" for one map: the request's choice, else GENERATION_MODE.
+    "auto" (the default) uses parallel generation for expert maps only.
+    """
+    mode = (requested or os.getenv("GENERATION_MODE", "auto")).lower()
+    if mode not in GENERATION_MODES:
+        mode = "auto"
+    if mode == "auto":
+        return "parallel" if complexity == "expert" else "single"
+    return mode
+
+
+async def gather_or_cancel(coros) -> List[Any]:
+    """Run concurrently; on the first failure cancel the rest and raise it."""
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+def _labels(values: Any) -> List[str]:
+    """Distinct non-empty string labels, in order."""
+    labels, seen = [], set()
+    for value in values if isinstance(values, list) else []:
+        if isinstance(value, str) and value.strip() and value.strip().casefold() not in seen:
+            seen.add(value.strip().casefold())
+            labels.append(value.strip())
+    return labels
+
+
+def merge_sections(topic: str, core_label: str, core_idea: str, sub_ideas: List[str],
+                   sections: List[Dict[str, Any]], descriptions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Assemble the skeleton and the section responses into one graph-only map.
+    Ids follow the single-call convention (core, sub1, con1, adj1, ex1); nodes whose
+    parent is not a skeleton id hang off the first sub-idea or the core, like the
+    normalizer's fallback graph.
+    """
+    described: Dict[str, str] = {}
+    reasoning_trail = ""
+    for part in descriptions:
+        if isinstance(part.get("descriptions"), dict):
+            described.update({str(k): v for k, v in part["descriptions"].items() if isinstance(v, str)})
+        if isinstance(part.get("reasoning_trail"), str) and not reasoning_trail:
+            reasoning_trail = part["reasoning_trail"]
+
+    nodes = [{"id": "core", "type": "core", "label": core_label, "description": described.get("core") or core_idea}]
+    links = []
+    for i, label in enumerate(sub_ideas, 1):
+        nodes.append({"id": f"sub{i}", "type": "sub", "label": label, "description": described.get(f"sub{i}", "")})
+        links.append({"source": "core", "target": f"sub{i}"})
+
+    parents = {node["id"] for node in nodes}
+    for node_type, section in zip(SECTION_TYPES, sections):
+        default_parent = "sub1" if node_type in SUB_LINKED_TYPES else "core"
+        count = 0
+        for item in section.get("nodes") if isinstance(section.get("nodes"), list) else []:
+            if not isinstance(item, dict) or not isinstance(item.get("label"), str) or not item["label"].strip():
+                continue
+            count += 1
+            node_id = f"{ID_PREFIXES[node_type]}{count}"
+            parent = str(item.get("parent") or "")
+            nodes.append({
+                "id": node_id,
+                "type": node_type,
+                "label": item["label"].strip(),
+                "description": item.get("description") if isinstance(item.get("description"), str) else ""
+            })
+            links.append({"source": parent if parent in parents else default_parent, "target": node_id})
+
+    return {
+        "topic": topic,
+        "core_idea": core_idea,
+        "graph_nodes": nodes,
+        "graph_links": links,
+        "reasoning_trail": reasoning_trail
+    }
+
+
+def _usage(parts: List[Dict[str, Any]]) -> Optional[Dict[str, int]]:
+    usages = [(part.get("metadata") or {}).get("usage") for part in parts]
+    usages = [usage for usage in usages if usage]
+    if not usages:
+        return None
+    return {
+        "prompt_tokens": sum(usage.get("prompt_tokens") or 0 for usage in usages),
+        "completion_tokens": sum(usage.get("completion_tokens") or 0 for usage in usages)
+    }
+
+
+async def generate_parallel_map(topic: str, complexity: str = "intermediate") -> Dict[str, Any]:
+    """
+    Generate a raw map in two rounds: a short skeleton call (core idea and sub-idea
+    labels), then one concurrent call per section (contradictions, adjacent fields,
+    examples) and per batch of skeleton descriptions. Wall time is roughly the
+    skeleton plus the slowest section instead of one long completion.
+    Returns map JSON ready for the normalizer; raises like generate_cognitive_map.
+    """
+    llm_client = get_llm_client()
+    started = time.monotonic()
+    with timed("prompt_build"):
+        prompt = get_skeleton_prompt(topic, complexity)
+    skeleton = await llm_client.generate_cognitive_map(prompt, expected_section_tokens("skeleton", complexity))
+    sub_ideas = _labels(skeleton.get("sub_ideas"))
+    if not sub_ideas:
+        raise ValueError("The LLM returned no sub-ideas for the map skeleton")
+    core_idea = skeleton.get("core_idea") if isinstance(skeleton.get("core_idea"), str) and skeleton["core_idea"] else topic
+    core_label = skeleton.get("core_label") if isinstance(skeleton.get("core_label"), str) and skeleton["core_label"] else topic
+    skeleton_done = time.monotonic()
+
+    node_ids = ["core"] + [f"sub{i}" for i in range(1, len(sub_ideas) + 1)]
+    batches = [node_ids[i:i + DESCRIBE_BATCH] for i in range(0, len(node_ids), DESCRIBE_BATCH)]
+    with timed("prompt_build"):
+        calls = [
+            (get_section_prompt(topic, core_idea, sub_ideas, node_type, complexity), expected_section_tokens(node_type, complexity))
+            for node_type in SECTION_TYPES
+        ]
+        # The batch holding the core also writes the reasoning trail
+        calls += [
+            (
+                get_describe_prompt(topic, core_idea, sub_ideas, batch, complexity, reasoning_trail=position == 0),
+                expected_section_tokens("trail" if position == 0 else "describe", complexity, len(batch))
+            )
+            for position, batch in enumerate(batches)
+        ]
+    parts = await gather_or_cancel(llm_client.generate_cognitive_map(p, expected) for p, expected in calls)
+    finished = time.monotonic()
+    logger.info(f"Fan-out for {topic}: skeleton {skeleton_done - started:.2f}s, {len(calls)} sections {finished - skeleton_done:.2f}s")
+
+    with timed("merge"):
+        data = merge_sections(topic, core_label, core_idea, sub_ideas, parts[:len(SECTION_TYPES)], parts[len(SECTION_TYPES):])
+    data["metadata"] = {
+        "model": (skeleton.get("metadata") or {}).get("model", llm_client.model),
+        "usage": _usage([skeleton] + parts),
+        "generation": {
+            "mode": "parallel",
+            "calls": len(calls) + 1,
+            "prompt_hash": FANOUT_PROMPT_HASH,
+            "skeleton_ms": round((skeleton_done - started) * 1000, 1),
+            "sections_ms": round((finished - skeleton_done) * 1000, 1)
+        },
+        "tokens": {
+            "output_mode": get_output_mode(),
+            "prompt_estimate": estimate_tokens(prompt) + sum(estimate_tokens(p) for p, _ in calls),
+            "completion_estimate": expected_section_tokens("skeleton", complexity) + sum(expected for _, expected in calls)
+        }
+    }
+    return data
@@ -0,0 +1,51 @@
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+def loads(data) -> Any:
+    """
+    Parse JSON text or bytes. Uses orjson when installed.
+    Raises json.JSONDecodeError (orjson's error subclasses it) on invalid input.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps_bytes(data: Any) -> bytes:
+    """Compact UTF-8 JSON encoding."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def dumps(data: Any) -> str:
+    """Compact JSON encoding as text."""
+    if orjson is not None:
+        return orjson.dumps(data).decode("utf-8")
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response that skips FastAPI's response_model re-validation.
+    Pydantic models are serialized by pydantic-core, plain data by orjson, and
+    already encoded bytes or text are sent as-is.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        if isinstance(content, str):
+            return content.encode("utf-8")
+        if isinstance(content, BaseModel):
+            return content.model_dump_json().encode("utf-8")
+        return dumps_bytes(content)
@@ -0,0 +1,113 @@
+import os
+from typing import Dict, Any, List, Optional, Tuple
+
+from semantic_cache import HashedNgramEmbedder
+
+FUSION_MODES = ("direct", "compose", "auto")
+
+# Bridge node types and the graph node type each becomes
+BRIDGE_TYPES = {"intersection": "sub", "tension": "contradiction"}
+
+_embedder = HashedNgramEmbedder()
+
+
+def get_fusion_mode(requested: Optional[str]) -> str:
+    """
+    "direct" (one fusion prompt), "compose" (bridge two single-topic maps) or
+    "auto": the request's choice, else FUSION_MODE.
+    """
+    mode = (requested or os.getenv("FUSION_MODE", "auto")).lower()
+    return mode if mode in FUSION_MODES else "auto"
+
+
+def source_graph(prefix: str, data: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], List[Dict[str, str]]]:
+    """
+    A map's nodes and links with ids namespaced under `prefix` ("a" or "b").
+    Its core becomes a sub node: the fused map gets its own synthesized core.
+    """
+    nodes = [
+        {
+            "id": f"{prefix}.{node['id']}",
+            "type": "sub" if node["type"] == "core" else node["type"],
+            "label": node["label"],
+            "description": node.get("description") or ""
+        }
+        for node in data["graph_nodes"]
+    ]
+    links = [{"source": f"{prefix}.{link['source']}", "target": f"{prefix}.{link['target']}"} for link in data["graph_links"]]
+    return nodes, links
+
+
+def _similarity(u: Dict[int, float], v: Dict[int, float]) -> float:
+    if len(u) > len(v):
+        u, v = v, u
+    return sum(weight * v.get(i, 0.0) for i, weight in u.items())
+
+
+def align_nodes(nodes_a: List[Dict[str, Any]], nodes_b: List[Dict[str, Any]], threshold: float) -> Dict[str, str]:
+    """
+    Match nodes of B to the node of A with the most similar label (hashed n-gram
+    cosine, the semantic cache's embedding). Greedy one-to-one, best pairs first;
+    returns {b id: a id} for pairs at or above `threshold`.
+    """
+    vectors_a = [(node["id"], _embedder.embed(node["label"])) for node in nodes_a]
+    pairs = []
+    for node in nodes_b:
+        vector = _embedder.embed(node["label"])
+        for a_id, a_vector in vectors_a:
+            score = _similarity(vector, a_vector)
+            if score >= threshold:
+                pairs.append((score, node["id"], a_id))
+    aliases: Dict[str, str] = {}
+    taken = set()
+    for score, b_id, a_id in sorted(pairs, reverse=True):
+        if b_id not in aliases and a_id not in taken:
+            aliases[b_id] = a_id
+            taken.add(a_id)
+    return aliases
+
+
+def compose_graph(topic: str, nodes_a: List[Dict[str, Any]], links_a: List[Dict[str, str]],
+                  nodes_b: List[Dict[str, Any]], links_b: List[Dict[str, str]], aliases: Dict[str, str],
+                  bridge: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    One graph-only fusion map: a synthesized core linked to both topic cores, both
+    source graphs with B's aligned nodes folded into their A counterparts, and the
+    bridge nodes linked to the nodes they connect.
+    """
+    core_idea = bridge.get("core_idea") if isinstance(bridge.get("core_idea"), str) and bridge["core_idea"] else topic
+    core_label = bridge.get("core_label") if isinstance(bridge.get("core_label"), str) and bridge["core_label"] else topic
+    nodes = [{"id": "core", "type": "core", "label": core_label, "description": core_idea}]
+    nodes += nodes_a + [node for node in nodes_b if node["id"] not in aliases]
+    links = [{"source": "core", "target": "a.core"}, {"source": "core", "target": "b.core"}] + links_a + links_b
+    # Folding B into A turns some links into duplicates or self-loops; drop them here
+    pairs = dict.fromkeys((aliases.get(link["source"], link["source"]), aliases.get(link["target"], link["target"])) for link in links)
+    links = [{"source": source, "target": target} for source, target in pairs if source != target]
+
+    known = {node["id"] for node in nodes}
+    count = 0
+    for item in bridge.get("bridges") if isinstance(bridge.get("bridges"), list) else []:
+        if not isinstance(item, dict) or not isinstance(item.get("label"), str) or not item["label"].strip():
+            continue
+        count += 1
+        node_id = f"bridge{count}"
+        node_type = BRIDGE_TYPES.get(item.get("type"), "sub")
+        nodes.append({
+            "id": node_id,
+            "type": node_type,
+            "label": item["label"].strip(),
+            "description": item.get("description") if isinstance(item.get("description"), str) else ""
+        })
+        refs = [aliases.get(str(ref), str(ref)) for ref in item.get("links") or [] if isinstance(ref, str)]
+        refs = [ref for ref in dict.fromkeys(refs) if ref in known]
+        if node_type == "sub" or not refs:
+            links.append({"source": "core", "target": node_id})
+        links += [{"source": ref, "target": node_id} for ref in refs]
+
+    return {
+        "topic": topic,
+        "core_idea": core_idea,
+        "graph_nodes": nodes,
+        "graph_links": links,
+        "reasoning_trail": bridge.get("reasoning_trail") if isinstance(bridge.get("reasoning_trail"), str) else ""
+    }
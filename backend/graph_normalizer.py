@@ -0,0 +1,226 @@
+import os
+import logging
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Fallback node sections in the order they are synthesized: (list key, node type, label prefix, description)
+FALLBACK_SECTIONS = [
+    ("sub_ideas", "sub", "Sub-idea", "A sub-concept of {topic}"),
+    ("contradictions", "contradiction", "Contradiction", "A contradiction related to {topic}"),
+    ("adjacent_fields", "adjacent", "Adjacent field", "An adjacent field related to {topic}"),
+    ("real_world_examples", "example", "Example", "A real-world example of {topic}"),
+]
+
+# Node types whose fallback nodes hang off the first sub-idea rather than the core
+SUB_LINKED_TYPES = {"contradiction", "example"}
+
+LIST_FIELDS = ["sub_ideas", "contradictions", "adjacent_fields", "real_world_examples"]
+
+# Flat list each node type is derived into for graph-only responses
+TYPE_TO_LIST = {"sub": "sub_ideas", "contradiction": "contradictions", "adjacent": "adjacent_fields", "example": "real_world_examples"}
+
+DEFAULT_REASONING_TRAIL = "This cognitive map explores the relationships and connections within the topic, showing how different concepts relate to each other."
+
+
+class GraphNormalizer:
+    """
+    Repair raw LLM map JSON so it validates as a CognitiveMapResponse.
+
+    Works in a single pass over nodes and links using an id -> node index:
+    fills missing node fields, assigns deterministic ids, drops duplicate nodes
+    (remapping links that pointed at them), drops dangling, self and duplicate
+    links, and synthesizes a fallback graph from the flat lists when the model
+    returned no graph at all.
+    """
+
+    def __init__(self, max_sub_ideas: int = 10, max_per_type: int = 8, fallback_links: int = 5, label_length: int = 50):
+        self.max_sub_ideas = max_sub_ideas
+        self.max_per_type = max_per_type
+        self.fallback_links = fallback_links
+        self.label_length = label_length
+
+    def normalize(self, data: Dict[str, Any], topic: str, reasoning_trail: str = DEFAULT_REASONING_TRAIL) -> Dict[str, Any]:
+        """Normalize `data` in place and return it."""
+        for field in LIST_FIELDS:
+            values = data.get(field)
+            if not isinstance(values, list):
+                values = []
+            data[field] = [v for v in values if isinstance(v, str)]
+        if not isinstance(data.get("topic"), str) or not data.get("topic"):
+            data["topic"] = topic
+
+        raw_nodes = data.get("graph_nodes")
+        if not isinstance(raw_nodes, list) or not raw_nodes:
+            logger.warning("No graph_nodes in response, generating from lists")
+            nodes, links = self.fallback_graph(data, topic)
+            logger.info(f"Generated {len(nodes)} nodes and {len(links)} links")
+        else:
+            nodes, aliases = self._normalize_nodes(raw_nodes)
+            links = self._normalize_links(data.get("graph_links"), aliases)
+
+        if not links and len(nodes) > 1:
+            logger.warning("No graph_links in response, generating minimal links")
+            root = nodes[0]["id"]
+            links = [{"source": root, "target": node["id"]} for node in nodes[1:self.fallback_links + 1]]
+
+        data["graph_nodes"] = nodes
+        data["graph_links"] = links
+        self._derive_lists(data, nodes)
+
+        if not isinstance(data.get("core_idea"), str) or not data.get("core_idea"):
+            core = next((n for n in nodes if n["type"] == "core"), None)
+            data["core_idea"] = core["description"] if core else topic
+        if not data.get("reasoning_trail"):
+            data["reasoning_trail"] = reasoning_trail
+        return data
+
+    def _derive_lists(self, data: Dict[str, Any], nodes: List[Dict[str, Any]]) -> None:
+        """Fill empty flat lists from node labels by type (graph-only prompts omit them)."""
+        missing = {field for field in LIST_FIELDS if not data[field]}
+        if not missing:
+            return
+        for node in nodes:
+            field = TYPE_TO_LIST.get(node["type"])
+            if field in missing:
+                data[field].append(node["label"])
+
+    def _normalize_nodes(self, raw_nodes: List[Any]):
+        """Fill node fields and dedupe. Returns the nodes and an id alias map for links."""
+        nodes = []
+        index: Dict[str, Dict[str, Any]] = {}
+        by_label: Dict[tuple, str] = {}
+        aliases: Dict[str, Optional[str]] = {}
+        duplicates = 0
+
+        for position, node in enumerate(raw_nodes):
+            if not isinstance(node, dict):
+                continue
+            node_type = str(node.get("type") or "sub")
+            label = str(node.get("label") or "")
+            raw_id = node.get("id")
+            node_id = str(raw_id) if raw_id not in (None, "") else f"node_{position}"
+
+            # Nodes without a label are only deduped by id: a shared default label
+            # says nothing about them being the same concept
+            label_key = (node_type, label.casefold()) if label.strip() else None
+            if not label.strip():
+                label = "Unnamed Node"
+            if node_id in index or label_key in by_label:
+                # Same id or same concept twice: keep the first, point links at it
+                duplicates += 1
+                aliases.setdefault(node_id, index[node_id]["id"] if node_id in index else by_label[label_key])
+                continue
+
+            node["id"] = node_id
+            node["type"] = node_type
+            node["label"] = label
+            if not node.get("description"):
+                node["description"] = f"This {node_type} represents: {label}"
+            index[node_id] = node
+            if label_key is not None:
+                by_label[label_key] = node_id
+            aliases[node_id] = node_id
+            nodes.append(node)
+
+        if duplicates:
+            logger.warning(f"Dropped {duplicates} duplicate graph nodes")
+        return nodes, aliases
+
+    def _normalize_links(self, raw_links: Any, aliases: Dict[str, Optional[str]]) -> List[Dict[str, str]]:
+        """Remap links onto surviving node ids and drop dangling, self and duplicate links."""
+        if not isinstance(raw_links, list):
+            return []
+        links = []
+        seen = set()
+        dropped = 0
+        for link in raw_links:
+            if not isinstance(link, dict):
+                dropped += 1
+                continue
+            source = aliases.get(str(link.get("source")))
+            target = aliases.get(str(link.get("target")))
+            if source is None or target is None or source == target or (source, target) in seen:
+                dropped += 1
+                continue
+            seen.add((source, target))
+            links.append({"source": source, "target": target})
+        if dropped:
+            logger.warning(f"Dropped {dropped} dangling or duplicate graph links")
+        return links
+
+    def fallback_graph(self, data: Dict[str, Any], topic: str):
+        """Build a graph from the flat lists when the model returned no graph_nodes."""
+        core_idea = data.get("core_idea")
+        nodes = [{
+            "id": "core",
+            "type": "core",
+            "label": core_idea[:self.label_length] if isinstance(core_idea, str) and core_idea else topic,
+            "description": core_idea if isinstance(core_idea, str) and core_idea else f"The core concept of {topic}"
+        }]
+        links = []
+        has_sub = bool(data.get("sub_ideas"))
+
+        for key, node_type, label_prefix, description in FALLBACK_SECTIONS:
+            limit = self.max_sub_ideas if node_type == "sub" else self.max_per_type
+            parent = "sub_1" if node_type in SUB_LINKED_TYPES and has_sub else "core"
+            for i, item in enumerate(data.get(key, [])[:limit]):
+                node_id = f"{node_type}_{i+1}"
+                nodes.append({
+                    "id": node_id,
+                    "type": node_type,
+                    "label": item[:self.label_length] if item else f"{label_prefix} {i+1}",
+                    "description": item or description.format(topic=topic)
+                })
+                links.append({"source": parent, "target": node_id})
+        return nodes, links
+
+    def expansion(self, nodes: List[Dict[str, Any]], node_id: str, raw_children: Any):
+        """
+        Turn the children an expansion returned into nodes linked from `node_id`.
+        Ids are namespaced as "<node_id>.<n>", numbered after any earlier expansion,
+        so they merge into the existing graph without collisions. Children whose
+        label already appears in the graph are dropped. Returns (nodes, links).
+        """
+        if not isinstance(raw_children, list):
+            return [], []
+        prefix = f"{node_id}."
+        counter = max(
+            (int(n["id"][len(prefix):]) for n in nodes
+             if n["id"].startswith(prefix) and n["id"][len(prefix):].isdigit()),
+            default=0
+        )
+        seen_labels = {n["label"].casefold() for n in nodes}
+        children, links = [], []
+        for child in raw_children[:self.max_per_type]:
+            if not isinstance(child, dict):
+                continue
+            label = str(child.get("label") or "").strip()[:self.label_length]
+            if not label or label.casefold() in seen_labels:
+                continue
+            seen_labels.add(label.casefold())
+            node_type = child.get("type") if child.get("type") in TYPE_TO_LIST else "sub"
+            counter += 1
+            child_id = f"{prefix}{counter}"
+            children.append({
+                "id": child_id,
+                "type": node_type,
+                "label": label,
+                "description": child.get("description") or f"This {node_type} represents: {label}"
+            })
+            links.append({"source": node_id, "target": child_id})
+        return children, links
+
+
+# Global instance - will be initialized lazily
+graph_normalizer = None
+
+def get_graph_normalizer():
+    """Get or create the global graph normalizer with node caps from the environment."""
+    global graph_normalizer
+    if graph_normalizer is None:
+        graph_normalizer = GraphNormalizer(
+            max_sub_ideas=int(os.getenv("GRAPH_MAX_SUB_IDEAS", "10")),
+            max_per_type=int(os.getenv("GRAPH_MAX_PER_TYPE", "8"))
+        )
+    return graph_normalizer
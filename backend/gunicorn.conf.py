@@ -0,0 +1,39 @@
+"""
+Gunicorn settings for multi-worker deployments:
+
+    gunicorn -c gunicorn.conf.py main:app
+
+Every worker runs the FastAPI app under uvicorn. With more than one worker the
+response cache, single-flight coalescing and RPM/TPM budgets are shared through
+SHARED_STATE_BACKEND (SQLite by default, or Redis), so adding workers does not
+multiply upstream calls or 429s. Batch job state is published there too, so a
+poll can land on any worker. The semantic cache index stays per worker: near-
+duplicate topics are only found by the worker that cached the original.
+"""
+import os
+import multiprocessing
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Import the app once in the master so workers fork with modules already loaded.
+# Connections (SQLite, Redis, provider HTTP pools) are opened lazily in each worker.
+preload_app = os.getenv("PRELOAD_APP", "true").lower() not in ("0", "false", "no")
+
+# On SIGTERM workers stop accepting requests and get this long to finish the
+# ones in flight (the app's shutdown hook also waits up to LLM_DRAIN_TIMEOUT).
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "60"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+keepalive = int(os.getenv("KEEPALIVE", "5"))
+
+if workers > 1:
+    os.environ.setdefault("SHARED_STATE_BACKEND", "sqlite")
+
+
+def on_starting(server):
+    # With the app preloaded, import the modules the app otherwise loads in its
+    # startup warm-up, so every forked worker shares them instead of importing its own
+    if preload_app:
+        from readiness import preload_modules
+        preload_modules()
@@ -0,0 +1,576 @@
+import os
+import time
+import uuid
+import socket
+import sqlite3
+import asyncio
+import threading
+import logging
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import fastjson
+from batch import error_status
+from map_service import build_topic_map, build_fusion_map, with_layout
+from rate_limiter import RateLimitExceeded
+from usage import current_client, QuotaExceeded
+
+logger = logging.getLogger(__name__)
+
+# Lower number runs first
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+TERMINAL = ("completed", "failed", "cancelled")
+
+
+# Identifies this process run: containers restarted with the same hostname usually get
+# the same pid back, so host and pid alone cannot tell this run from the previous one
+BOOT_TOKEN = uuid.uuid4().hex[:12]
+
+
+def _owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{BOOT_TOKEN}"
+
+
+def _owner_dead(owner: Optional[str]) -> bool:
+    """
+    Whether the process that claimed a job is known to be gone without waiting
+    for its lease: it ran on this host and its pid is gone, or its pid is now
+    ours under a different boot token. Other hosts are only judged by the lease.
+    """
+    if not owner:
+        return True
+    host, _, rest = owner.partition(":")
+    pid = rest.partition(":")[0]
+    if host != socket.gethostname():
+        return False
+    if owner == _owner():
+        return False
+    if pid == str(os.getpid()):
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except (ValueError, ProcessLookupError):
+        return True
+    except PermissionError:
+        return False
+    return False
+
+
+class JobJournal:
+    """
+    Durable SQLite record of every job: the request, its status and its result.
+    Shared by all worker processes (and hosts, on a shared volume); the `owner`
+    column says which process run queued or is running a job, and `heartbeat`
+    when it last renewed its lease on them.
+    """
+
+    def __init__(self, path: str, lease: float = 60):
+        self.path = path
+        self.lease = lease
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                client TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                owner TEXT,
+                heartbeat REAL,
+                request TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                status_code INTEGER,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+            """
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")]
+        if "heartbeat" not in columns:
+            # Journals created before leases: their unfinished jobs count as expired
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN heartbeat REAL")
+        self._conn.commit()
+
+    def insert(self, job: "Job") -> None:
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO jobs (id, kind, client, priority, status, owner, heartbeat, request, created_at) "
+                    "VALUES (?, ?, ?, ?, 'queued', ?, ?, ?, ?)",
+                    (job.id, job.kind, job.client, job.priority, _owner(), time.time(), fastjson.dumps(job.request),
+                     job.created_at)
+                )
+
+    def claim(self, job_id: str) -> bool:
+        """Mark a queued job running. False if it was cancelled (possibly by another worker) meanwhile."""
+        with self._lock:
+            with self._conn:
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET status = 'running', owner = ?, heartbeat = ?, started_at = ? "
+                    "WHERE id = ? AND status = 'queued'",
+                    (_owner(), time.time(), time.time(), job_id)
+                )
+        return cursor.rowcount == 1
+
+    def finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None,
+               error: Optional[str] = None, status_code: Optional[int] = None) -> None:
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, result = ?, error = ?, status_code = ?, finished_at = ? WHERE id = ?",
+                    (status, fastjson.dumps(result) if result is not None else None, error, status_code, time.time(), job_id)
+                )
+
+    def cancel_queued(self, job_id: str) -> bool:
+        with self._lock:
+            with self._conn:
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'",
+                    (time.time(), job_id)
+                )
+        return cursor.rowcount == 1
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, kind, client, priority, status, owner, request, result, error, status_code, "
+                "created_at, started_at, finished_at FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("id", "kind", "client", "priority", "status", "owner", "request", "result", "error", "status_code",
+                "created_at", "started_at", "finished_at")
+        data = dict(zip(keys, row))
+        data["request"] = fastjson.loads(data["request"])
+        data["result"] = fastjson.loads(data["result"]) if data["result"] else None
+        return data
+
+    def renew(self) -> int:
+        """Extend this process's lease on its unfinished jobs."""
+        with self._lock:
+            with self._conn:
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET heartbeat = ? WHERE owner = ? AND status IN ('queued', 'running')",
+                    (time.time(), _owner())
+                )
+        return cursor.rowcount
+
+    def recover(self) -> List[Dict[str, Any]]:
+        """
+        Take over unfinished jobs whose process is gone (crash or restart) and return
+        them, oldest first. A process counts as gone when its lease has not been
+        renewed for `lease` seconds, or sooner when _owner_dead can tell. Jobs that
+        were running are queued again.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, owner, heartbeat FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        expired = time.time() - self.lease
+        recovered = []
+        for job_id, owner, heartbeat in rows:
+            if owner == _owner():
+                continue
+            if heartbeat is not None and heartbeat >= expired and not _owner_dead(owner):
+                continue
+            with self._lock:
+                with self._conn:
+                    # Conditional on the old owner and lease so two restarting workers never
+                    # both take a job, and a job whose owner just renewed is left alone
+                    cursor = self._conn.execute(
+                        "UPDATE jobs SET status = 'queued', owner = ?, heartbeat = ?, started_at = NULL "
+                        "WHERE id = ? AND owner IS ? AND heartbeat IS ? AND status IN ('queued', 'running')",
+                        (_owner(), time.time(), job_id, owner, heartbeat)
+                    )
+            if cursor.rowcount == 1:
+                recovered.append(self.get(job_id))
+        return recovered
+
+    def prune(self, older_than: float) -> int:
+        """Delete finished jobs older than `older_than` seconds."""
+        with self._lock:
+            with self._conn:
+                cursor = self._conn.execute(
+                    "DELETE FROM jobs WHERE status IN ('completed', 'failed', 'cancelled') AND finished_at < ?",
+                    (time.time() - older_than,)
+                )
+        return cursor.rowcount
+
+
+class Job:
+    """In-memory state of a job queued or running in this process."""
+
+    def __init__(self, kind: str, request: Dict[str, Any], client: str, priority: int,
+                 job_id: Optional[str] = None, created_at: Optional[float] = None):
+        self.id = job_id or uuid.uuid4().hex
+        self.kind = kind
+        self.request = request
+        self.client = client
+        self.priority = priority
+        self.status = "queued"
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.status_code: Optional[int] = None
+        self.created_at = created_at or time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def set_status(self, status: str) -> None:
+        self.status = status
+        if status == "running":
+            self.started_at = time.time()
+        elif status in TERMINAL:
+            self.finished_at = time.time()
+        # Wake everyone waiting for a change, then arm a fresh event for the next one
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def wait_change(self, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "priority": next(name for name, value in PRIORITIES.items() if value == self.priority),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+            "status_code": self.status_code
+        }
+
+    @classmethod
+    def from_journal(cls, row: Dict[str, Any]) -> "Job":
+        job = cls(row["kind"], row["request"], row["client"], row["priority"], row["id"], row["created_at"])
+        job.status = row["status"]
+        job.result, job.error, job.status_code = row["result"], row["error"], row["status_code"]
+        job.started_at, job.finished_at = row["started_at"], row["finished_at"]
+        return job
+
+
+class FairScheduler:
+    """
+    Picks the next job: strictly by priority, and round-robin between clients
+    within a priority so one client's burst cannot starve the others.
+    """
+
+    def __init__(self):
+        # priority -> client -> job ids in submission order; client order is the round-robin
+        self._levels: Dict[int, "OrderedDict[str, deque]"] = {}
+        self._size = 0
+
+    def push(self, job: Job) -> None:
+        level = self._levels.setdefault(job.priority, OrderedDict())
+        level.setdefault(job.client, deque()).append(job.id)
+        self._size += 1
+
+    def pop(self) -> Optional[str]:
+        for priority in sorted(self._levels):
+            level = self._levels[priority]
+            if not level:
+                continue
+            client, queue = next(iter(level.items()))
+            job_id = queue.popleft()
+            if queue:
+                level.move_to_end(client)
+            else:
+                del level[client]
+            self._size -= 1
+            return job_id
+        return None
+
+    def remove(self, job: Job) -> bool:
+        queue = self._levels.get(job.priority, {}).get(job.client)
+        if not queue or job.id not in queue:
+            return False
+        queue.remove(job.id)
+        if not queue:
+            del self._levels[job.priority][job.client]
+        self._size -= 1
+        return True
+
+    def queued_for(self, client: str) -> int:
+        return sum(len(level.get(client, ())) for level in self._levels.values())
+
+    def __len__(self) -> int:
+        return self._size
+
+
+class JobQueueFull(Exception):
+    """Raised when a client already has the maximum number of queued jobs."""
+
+
+class JobQueue:
+    """
+    In-process queue for long generations. `workers` jobs run at once (the provider
+    limiter still applies underneath), the rest wait in a FairScheduler, and every
+    transition is written to the JobJournal so queued and interrupted jobs resume
+    after a restart.
+    """
+
+    def __init__(self, journal: JobJournal, workers: int = 8, max_queued_per_client: int = 20,
+                 max_retries: int = 3, retention: float = 86400, max_cached_jobs: int = 1000,
+                 prune_interval: float = 3600):
+        self.journal = journal
+        self.workers = workers
+        self.max_queued_per_client = max_queued_per_client
+        self.max_retries = max_retries
+        self.retention = retention
+        self.max_cached_jobs = max_cached_jobs
+        self.prune_interval = prune_interval
+        self._pruned_at = 0.0
+        self.scheduler = FairScheduler()
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._ready: Optional[asyncio.Semaphore] = None
+        self._workers: List[asyncio.Task] = []
+        self._maintainer: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+
+    async def start(self) -> None:
+        """Start the workers and resume jobs left unfinished by a previous process."""
+        self._ready = asyncio.Semaphore(0)
+        self._stopping = False
+        pruned = await self._prune()
+        recovered = await self._recover()
+        if recovered or pruned:
+            logger.info(f"Job queue resumed {recovered} unfinished jobs, pruned {pruned} old ones")
+        self._workers = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+        self._maintainer = asyncio.ensure_future(self._maintain())
+
+    async def _recover(self) -> int:
+        recovered = await asyncio.to_thread(self.journal.recover)
+        for row in recovered:
+            self._enqueue(Job.from_journal({**row, "status": "queued"}))
+        return len(recovered)
+
+    async def _prune(self) -> int:
+        self._pruned_at = time.monotonic()
+        return await asyncio.to_thread(self.journal.prune, self.retention)
+
+    async def _maintain(self) -> None:
+        """
+        Renew this process's lease, pick up jobs whose owner's lease ran out and,
+        every `prune_interval` seconds, drop finished jobs past the retention.
+        """
+        while True:
+            await asyncio.sleep(self.journal.lease / 3)
+            try:
+                await self._maintain_once()
+            except Exception as e:
+                logger.warning(f"Job lease maintenance failed: {str(e)}")
+
+    async def _maintain_once(self) -> None:
+        await asyncio.to_thread(self.journal.renew)
+        recovered = await self._recover()
+        if recovered:
+            logger.info(f"Job queue took over {recovered} jobs from a process that stopped renewing its lease")
+        if time.monotonic() - self._pruned_at >= self.prune_interval:
+            pruned = await self._prune()
+            if pruned:
+                logger.info(f"Job queue pruned {pruned} finished jobs")
+
+    async def stop(self, timeout: float) -> None:
+        """Stop taking new jobs, give running ones `timeout` seconds, then cancel the workers."""
+        self._stopping = True
+        if self._maintainer is not None:
+            self._maintainer.cancel()
+            await asyncio.gather(self._maintainer, return_exceptions=True)
+            self._maintainer = None
+        deadline = time.monotonic() + timeout
+        while self.running and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        # Jobs still marked running in the journal are picked up again by journal.recover()
+        for job in self._jobs.values():
+            if job.status == "running" and job.task is not None:
+                job.task.cancel()
+
+    def _enqueue(self, job: Job) -> None:
+        self._jobs[job.id] = job
+        self.scheduler.push(job)
+        self._ready.release()
+
+    async def submit(self, kind: str, request: Dict[str, Any], client: str, priority: str = "normal") -> Job:
+        if self._ready is None:
+            raise RuntimeError("Job queue is not running")
+        if self.scheduler.queued_for(client) >= self.max_queued_per_client:
+            raise JobQueueFull(f"Client already has {self.max_queued_per_client} queued jobs")
+        job = Job(kind, request, client, PRIORITIES[priority])
+        await asyncio.to_thread(self.journal.insert, job)
+        self._enqueue(job)
+        self._evict()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        """The job from memory, or from the journal if another process or run handled it."""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        row = await asyncio.to_thread(self.journal.get, job_id)
+        return Job.from_journal(row) if row is not None else None
+
+    def is_local(self, job: Job) -> bool:
+        return self._jobs.get(job.id) is job
+
+    async def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        Cancel a queued or running job. Returns the job (status unchanged if it had
+        already finished), or None if unknown. Raises LookupError for a job running
+        in another worker process.
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            if await asyncio.to_thread(self.journal.cancel_queued, job_id):
+                self.cancelled += 1
+            job = await self.get(job_id)
+            if job is not None and job.status == "running":
+                raise LookupError("Job is running in another worker process")
+            return job
+        if job.status == "queued":
+            self.scheduler.remove(job)
+            await asyncio.to_thread(self.journal.cancel_queued, job.id)
+            job.set_status("cancelled")
+            self.cancelled += 1
+        elif job.status == "running" and job.task is not None:
+            job.task.cancel()
+        return job
+
+    async def wait(self, job: Job, status: str, timeout: float) -> Job:
+        """Wait up to `timeout` seconds for the job to leave `status`; returns its latest state."""
+        deadline = time.monotonic() + timeout
+        if self.is_local(job):
+            while job.status == status and time.monotonic() < deadline:
+                await job.wait_change(deadline - time.monotonic())
+            return job
+        # Another process owns it: poll the journal
+        while job.status == status and time.monotonic() < deadline:
+            await asyncio.sleep(min(1.0, max(0.0, deadline - time.monotonic())))
+            job = await self.get(job.id) or job
+        return job
+
+    async def _worker(self) -> None:
+        while True:
+            await self._ready.acquire()
+            if self._stopping:
+                return
+            job_id = self.scheduler.pop()
+            job = self._jobs.get(job_id) if job_id else None
+            if job is None or job.status != "queued":
+                continue
+            if not await asyncio.to_thread(self.journal.claim, job.id):
+                job.set_status("cancelled")
+                continue
+            self.running += 1
+            job.set_status("running")
+            job.task = asyncio.ensure_future(self._execute(job))
+            try:
+                # asyncio.wait never raises the job's own cancellation into the worker
+                await asyncio.wait([job.task])
+            finally:
+                self.running -= 1
+            await self._record(job)
+
+    async def _execute(self, job: Job) -> Dict[str, Any]:
+        request = job.request
+        complexity = request.get("complexity") or "intermediate"
+        bypass_cache = bool(request.get("bypass_cache"))
+        # Runs in its own task, so this only attributes this job's provider calls
+        current_client.set(job.client)
+        for attempt in range(self.max_retries + 1):
+            try:
+                if job.kind == "fusion":
+                    result = await build_fusion_map(
+                        request["topic_a"].strip(), request["topic_b"].strip(), complexity, bypass_cache, request.get("fusion")
+                    )
+                else:
+                    result = await build_topic_map(request["topic"].strip(), complexity, bypass_cache, request.get("generation"))
+                return await with_layout(result) if request.get("layout") else result.model_dump()
+            except RateLimitExceeded as e:
+                # Unlike an interactive request, a queued job can afford to wait its turn,
+                # but not for a client's quota window to reset
+                if attempt == self.max_retries or isinstance(e, QuotaExceeded):
+                    raise
+                await asyncio.sleep(e.retry_after)
+
+    async def _record(self, job: Job) -> None:
+        task = job.task
+        if task.cancelled():
+            job.set_status("cancelled")
+            self.cancelled += 1
+            await asyncio.to_thread(self.journal.finish, job.id, "cancelled")
+            return
+        error = task.exception()
+        if error is None:
+            job.result = task.result()
+            job.set_status("completed")
+            self.completed += 1
+            await asyncio.to_thread(self.journal.finish, job.id, "completed", job.result)
+            return
+        logger.warning(f"Job {job.id} failed: {str(error)}")
+        job.error, job.status_code = str(error), error_status(error)
+        job.set_status("failed")
+        self.failed += 1
+        await asyncio.to_thread(self.journal.finish, job.id, "failed", None, job.error, job.status_code)
+
+    def _evict(self) -> None:
+        """Keep at most `max_cached_jobs` in memory; finished ones can be reloaded from the journal."""
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self.max_cached_jobs:
+                break
+            if self._jobs[job_id].status in TERMINAL:
+                del self._jobs[job_id]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "queued": len(self.scheduler),
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled
+        }
+
+
+# Global instance - will be initialized lazily
+job_queue = None
+
+def get_job_queue() -> JobQueue:
+    """Get or create the global job queue (started by the app's startup hook)."""
+    global job_queue
+    if job_queue is None:
+        journal = JobJournal(
+            os.getenv("JOB_JOURNAL_PATH", str(Path(__file__).parent / "jobs.db")),
+            lease=float(os.getenv("JOB_LEASE_SECONDS", "60"))
+        )
+        job_queue = JobQueue(
+            journal,
+            workers=int(os.getenv("JOB_WORKERS", "8")),
+            max_queued_per_client=int(os.getenv("JOB_MAX_QUEUED_PER_CLIENT", "20")),
+            max_retries=int(os.getenv("JOB_MAX_RETRIES", "3")),
+            retention=float(os.getenv("JOB_RETENTION_SECONDS", "86400")),
+            prune_interval=float(os.getenv("JOB_PRUNE_INTERVAL_SECONDS", "3600"))
+        )
+    return job_queue
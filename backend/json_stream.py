@@ -0,0 +1,88 @@
+import json
+from typing import Any, Iterable, List, Optional, Tuple
+
+import fastjson
+
+
+class IncrementalArrayParser:
+    """
+    Incrementally scan a streamed JSON object and emit the elements of selected
+    top-level arrays (e.g. graph_nodes, graph_links) as soon as each one is complete.
+
+    Every character is scanned once, and only the text of the element or key
+    being written is held (as chunks, joined when it completes), so the total work
+    is linear in the size of the response. Anything before the first '{' (such as
+    a markdown code fence) is ignored.
+    """
+
+    def __init__(self, keys: Iterable[str] = ("graph_nodes", "graph_links")):
+        self.keys = set(keys)
+        self._chunks: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._last_key = None
+        self._array_key = None
+        self._in_element = False
+        # Text of the open element, or of the string being read outside one; None when neither
+        self._held: Optional[List[str]] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Consume a chunk of text and return any (array_key, element) pairs completed by it."""
+        self._chunks.append(chunk)
+        completed = []
+        # Where the held text starts in this chunk (0 if it began in an earlier one)
+        start = 0
+
+        for i, ch in enumerate(chunk):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if not self._in_element:
+                        text = self._take(chunk, start, i)
+                        if self._depth == 1:
+                            # Strings directly inside the top-level object are keys or scalar values
+                            self._last_key = text[1:-1]
+            elif ch == '"':
+                self._in_string = True
+                if not self._in_element:
+                    self._held, start = [], i
+            elif ch in "{[":
+                self._depth += 1
+                if ch == "[" and self._depth == 2:
+                    self._array_key = self._last_key if self._last_key in self.keys else None
+                elif ch == "{" and self._depth == 3 and self._array_key is not None:
+                    self._in_element = True
+                    self._held, start = [], i
+            elif ch in "}]":
+                if ch == "}" and self._depth == 3 and self._in_element:
+                    self._in_element = False
+                    element = self._take(chunk, start, i)
+                    try:
+                        completed.append((self._array_key, fastjson.loads(element)))
+                    except json.JSONDecodeError:
+                        pass
+                elif ch == "]" and self._depth == 2:
+                    self._array_key = None
+                self._depth -= 1
+
+        if self._held is not None:
+            self._held.append(chunk[start:])
+        return completed
+
+    def _take(self, chunk: str, start: int, end: int) -> str:
+        """The held text through chunk[end]; stops holding."""
+        held, self._held = self._held, None
+        held.append(chunk[start:end + 1])
+        return "".join(held)
+
+    @property
+    def buffer(self) -> str:
+        """All text fed so far."""
+        if len(self._chunks) > 1:
+            self._chunks = ["".join(self._chunks)]
+        return self._chunks[0] if self._chunks else ""
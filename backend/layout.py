@@ -0,0 +1,210 @@
+import math
+import logging
+from collections import deque
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Bump when the algorithm or its defaults change so cached layouts are recomputed
+LAYOUT_VERSION = "fr-1"
+
+# Same frame and spacing as the D3 simulation in frontend/src/components/Graph.jsx
+DEFAULT_WIDTH = 1100
+DEFAULT_HEIGHT = 700
+LINK_DISTANCE = 140.0
+# Fruchterman-Reingold optimal distance; edges settle at roughly 1.5-2x this in a tree
+SPRING_LENGTH = 80.0
+
+# Rows of the pairwise repulsion computed at once (bounds memory to CHUNK_ROWS x n)
+CHUNK_ROWS = 512
+# Above this many nodes, repulsion from other grid cells is taken from their centroids
+EXACT_REPULSION_LIMIT = 200
+NODES_PER_CELL = 4
+CELL_WINDOW = 32
+
+
+def _edges(nodes: List[Dict[str, Any]], links: List[Dict[str, str]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Link endpoints as index arrays, skipping dangling links and self-loops."""
+    index = {node["id"]: i for i, node in enumerate(nodes)}
+    pairs = [
+        (index[link["source"]], index[link["target"]])
+        for link in links
+        if link["source"] in index and link["target"] in index and link["source"] != link["target"]
+    ]
+    if not pairs:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    src, dst = np.array(pairs, dtype=np.int64).T
+    return src, dst
+
+
+def radial_positions(nodes: List[Dict[str, Any]], src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+    """
+    Radial tree layout used as the starting point: the core node in the centre and
+    each node on the ring for its BFS depth, inside an angular wedge proportional
+    to the number of leaves below it. Nodes not reachable from the core hang off it.
+    """
+    n = len(nodes)
+    neighbours: List[List[int]] = [[] for _ in range(n)]
+    for s, t in zip(src.tolist(), dst.tolist()):
+        neighbours[s].append(t)
+        neighbours[t].append(s)
+
+    root = next((i for i, node in enumerate(nodes) if node.get("type") == "core"), 0)
+    parent = [-1] * n
+    depth = [0] * n
+    order = []
+    seen = [False] * n
+    for start in [root] + list(range(n)):
+        if seen[start]:
+            continue
+        seen[start] = True
+        if start != root:
+            parent[start], depth[start] = root, 1
+        queue = deque([start])
+        while queue:
+            i = queue.popleft()
+            order.append(i)
+            for j in neighbours[i]:
+                if not seen[j]:
+                    seen[j] = True
+                    parent[j], depth[j] = i, depth[i] + 1
+                    queue.append(j)
+
+    children: List[List[int]] = [[] for _ in range(n)]
+    for i in order:
+        if parent[i] >= 0:
+            children[parent[i]].append(i)
+    leaves = [1] * n
+    for i in reversed(order):
+        if children[i]:
+            leaves[i] = sum(leaves[c] for c in children[i])
+
+    angle = [0.0] * n
+    wedge = [0.0] * n
+    wedge[root] = 2 * math.pi
+    for i in order:
+        start = angle[i] - wedge[i] / 2
+        for c in children[i]:
+            wedge[c] = wedge[i] * leaves[c] / leaves[i]
+            angle[c] = start + wedge[c] / 2
+            start += wedge[c]
+
+    radius = np.array(depth, dtype=np.float64) * LINK_DISTANCE
+    theta = np.array(angle, dtype=np.float64)
+    return np.column_stack((radius * np.cos(theta), radius * np.sin(theta)))
+
+
+def _repulsion(x: np.ndarray, y: np.ndarray, k2: float) -> np.ndarray:
+    """Fruchterman-Reingold repulsion k^2/d between every pair of nodes."""
+    n = len(x)
+    force = np.empty((n, 2), dtype=x.dtype)
+    for start in range(0, n, CHUNK_ROWS):
+        dx = x[start:start + CHUNK_ROWS, None] - x[None, :]
+        dy = y[start:start + CHUNK_ROWS, None] - y[None, :]
+        weight = dx * dx
+        weight += dy * dy
+        np.maximum(weight, 1e-2, out=weight)
+        np.divide(k2, weight, out=weight)
+        force[start:start + CHUNK_ROWS, 0] = np.einsum("ij,ij->i", dx, weight)
+        force[start:start + CHUNK_ROWS, 1] = np.einsum("ij,ij->i", dy, weight)
+    return force
+
+
+def _grid_repulsion(x: np.ndarray, y: np.ndarray, k2: float) -> np.ndarray:
+    """
+    Approximate repulsion for large graphs: nodes are binned into a grid of about
+    NODES_PER_CELL nodes per cell; other cells push as one mass at their centroid and
+    nodes sharing a cell push each other exactly. O(n * cells) instead of O(n^2).
+    """
+    n = len(x)
+    side = max(1, int(math.sqrt(n / NODES_PER_CELL)))
+    cx = np.minimum(((x - x.min()) / (np.ptp(x) + 1e-6) * side).astype(np.int64), side - 1)
+    cy = np.minimum(((y - y.min()) / (np.ptp(y) + 1e-6) * side).astype(np.int64), side - 1)
+    cell = cx * side + cy
+    counts = np.bincount(cell, minlength=side * side)
+    occupied = np.flatnonzero(counts)
+    mass = counts[occupied].astype(x.dtype)
+    mx = (np.bincount(cell, weights=x, minlength=side * side)[occupied] / mass).astype(x.dtype)
+    my = (np.bincount(cell, weights=y, minlength=side * side)[occupied] / mass).astype(x.dtype)
+
+    force = np.empty((n, 2), dtype=x.dtype)
+    for start in range(0, n, CHUNK_ROWS):
+        rows = slice(start, start + CHUNK_ROWS)
+        dx = x[rows, None] - mx[None, :]
+        dy = y[rows, None] - my[None, :]
+        weight = dx * dx
+        weight += dy * dy
+        np.maximum(weight, 1e-2, out=weight)
+        np.divide(k2 * mass[None, :], weight, out=weight)
+        weight[cell[rows, None] == occupied[None, :]] = 0
+        force[rows, 0] = np.einsum("ij,ij->i", dx, weight)
+        force[rows, 1] = np.einsum("ij,ij->i", dy, weight)
+
+    # Exact pairs inside each cell: after sorting by cell, cell-mates are at most CELL_WINDOW apart
+    order = np.argsort(cell, kind="stable")
+    sx, sy, sc = x[order], y[order], cell[order]
+    near = np.zeros((n, 2), dtype=x.dtype)
+    for offset in range(1, min(CELL_WINDOW, n)):
+        same = sc[offset:] == sc[:-offset]
+        if not same.any():
+            break
+        dx = sx[offset:] - sx[:-offset]
+        dy = sy[offset:] - sy[:-offset]
+        weight = np.where(same, k2 / np.maximum(dx * dx + dy * dy, 1e-2), 0).astype(x.dtype)
+        near[offset:, 0] += dx * weight
+        near[offset:, 1] += dy * weight
+        near[:-offset, 0] -= dx * weight
+        near[:-offset, 1] -= dy * weight
+    force[order] += near
+    return force
+
+
+def force_directed(pos: np.ndarray, src: np.ndarray, dst: np.ndarray, iterations: int, seed: int = 0) -> np.ndarray:
+    """Refine positions with a vectorized Fruchterman-Reingold simulation and linear cooling."""
+    n = len(pos)
+    if n < 2 or iterations <= 0:
+        return pos
+    rng = np.random.default_rng(seed)
+    # float32 halves the memory traffic of the O(n^2) repulsion; jitter breaks symmetry
+    pos = (pos + rng.normal(scale=1.0, size=pos.shape)).astype(np.float32)
+    k = SPRING_LENGTH
+    temperature = k * max(1.0, math.sqrt(n)) / 4
+    for step in range(iterations):
+        repulsion = _repulsion if n <= EXACT_REPULSION_LIMIT else _grid_repulsion
+        disp = repulsion(pos[:, 0], pos[:, 1], k * k)
+        if len(src):
+            delta = pos[src] - pos[dst]
+            dist = np.sqrt(np.einsum("ij,ij->i", delta, delta)) + 1e-9
+            pull = delta * (dist / k)[:, None]
+            np.subtract.at(disp, src, pull)
+            np.add.at(disp, dst, pull)
+        length = np.sqrt(np.einsum("ij,ij->i", disp, disp)) + 1e-9
+        cap = temperature * (1 - step / iterations)
+        pos += disp * (np.minimum(length, cap) / length)[:, None]
+    return pos.astype(np.float64)
+
+
+def default_iterations(n: int) -> int:
+    """Fewer refinement steps for big graphs, which start from the radial layout anyway."""
+    if n <= 200:
+        return 300
+    if n <= 1000:
+        return 100
+    return 40
+
+
+def compute_layout(nodes: List[Dict[str, Any]], links: List[Dict[str, str]], width: float = DEFAULT_WIDTH,
+                   height: float = DEFAULT_HEIGHT, iterations: int = None, seed: int = 0) -> Dict[str, Tuple[float, float]]:
+    """
+    Position every node. Returns {node_id: (x, y)} centred in a width x height frame;
+    the same graph always gets the same layout.
+    """
+    if not nodes:
+        return {}
+    src, dst = _edges(nodes, links)
+    pos = radial_positions(nodes, src, dst)
+    pos = force_directed(pos, src, dst, default_iterations(len(nodes)) if iterations is None else iterations, seed)
+    pos += np.array([width / 2, height / 2]) - pos.mean(axis=0)
+    return {node["id"]: (round(float(x), 1), round(float(y), 1)) for node, (x, y) in zip(nodes, pos)}
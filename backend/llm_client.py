@@ -1,20 +1,35 @@
 import os
+import copy
 import json
-from typing import Dict, Any
+import time
+import asyncio
+import hashlib
+import logging
+from typing import Dict, Any, List, AsyncIterator, Optional
 from pathlib import Path
-from openai import AsyncOpenAI
 from dotenv import load_dotenv
+import fastjson
+from singleflight import SingleFlight, SharedSingleFlight
+from shared_state import get_shared_state
+from llm_pool import ClientPool, build_pool
+from rate_limiter import ProviderLimiter, RateLimitExceeded
+from tokens import estimate_tokens
+from usage import get_usage_accountant, QuotaExceeded
+from resilience import RetryPolicy, LatencyTracker, classify_error, is_rate_limit, hedged
+from metrics import LLM_CALLS, LLM_ERRORS, LLM_TOKENS, record_stage, record_provider_call, first_byte_since, timed
 
 # Load environment variables from backend directory
 env_path = Path(__file__).parent / '.env'
 load_dotenv(dotenv_path=env_path)
 
+logger = logging.getLogger(__name__)
+
 
 class LLMClient:
     """Abstracted LLM client that works with OpenAI-compatible APIs."""
     
     def __init__(self):
-        api_key = os.getenv("LLM_API_KEY", "")
+        api_key = os.getenv("LLM_API_KEY", "") or os.getenv("LLM_API_KEYS", "").split(",")[0].strip()
         # Default to Groq API for Llama 3.3
         base_url = os.getenv("LLM_BASE_URL", "https://api.groq.com/openai/v1")
         # Default to Llama 3.3 70B model
@@ -23,106 +38,354 @@ class LLMClient:
         self.api_key = api_key
         self.base_url = base_url
         self.model = model
-        self._client = None
+        self.temperature = 0.7
+        self.expected_completion_tokens = int(os.getenv("LLM_EXPECTED_COMPLETION_TOKENS", "2000"))
+        self._pool = None
+        # With several workers, coalescing and rate-limit budgets span all of them
+        shared_state = get_shared_state()
+        if shared_state is not None:
+            self._singleflight = SharedSingleFlight(
+                shared_state,
+                lock_ttl=float(os.getenv("SINGLEFLIGHT_LOCK_TTL", "120")),
+                wait_timeout=float(os.getenv("SINGLEFLIGHT_WAIT_TIMEOUT", "90"))
+            )
+        else:
+            self._singleflight = SingleFlight()
+        self.limiter = ProviderLimiter.from_env(shared_state)
+        # Resilience: retries, hedging and an ordered model fallback chain
+        self.retry_policy = RetryPolicy.from_env()
+        self.fallback_models = [m.strip() for m in os.getenv("LLM_FALLBACK_MODELS", "").split(",") if m.strip()]
+        self.hedging = os.getenv("LLM_HEDGING", "false").lower() in ("1", "true", "yes")
+        self.hedge_min_delay = float(os.getenv("LLM_HEDGE_MIN_DELAY", "2"))
+        self._latencies: Dict[str, LatencyTracker] = {}
     
     @property
-    def client(self):
-        """Lazy initialization of the OpenAI client."""
-        if self._client is None:
+    def pool(self) -> ClientPool:
+        """Lazy initialization of the provider client pool."""
+        if self._pool is None:
             if not self.api_key:
                 raise ValueError("LLM_API_KEY environment variable is not set. Please create a .env file in the backend directory.")
             
-            self._client = AsyncOpenAI(
-                api_key=self.api_key,
-                base_url=self.base_url
-            )
-        return self._client
+            self._pool = build_pool(self.base_url, self.api_key)
+        return self._pool
+    
+    @property
+    def client(self):
+        """The OpenAI client of the first pooled endpoint."""
+        return self.pool.endpoints[0].client
     
-    async def generate_cognitive_map(self, prompt: str) -> Dict[str, Any]:
+    async def warm_up(self) -> int:
+        """Open provider connections ahead of the first request. Returns how many endpoints are warm."""
+        return await self.pool.warm_up()
+    
+    async def drain(self, timeout: float) -> bool:
+        """Wait for queued and in-flight provider calls to finish. Returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        while self.limiter.in_flight or self.limiter.waiting or self._singleflight.in_flight:
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.1)
+        return True
+    
+    async def close(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+    
+    async def generate_cognitive_map(self, prompt: str, expected_tokens: Optional[int] = None) -> Dict[str, Any]:
         """
         Generate cognitive map from prompt.
+        Identical concurrent requests share a single provider call.
+        `expected_tokens` is the expected completion size, used for rate limiting.
         Returns parsed JSON response.
         """
+        key = hashlib.sha256(
+            json.dumps([prompt, self.model, self.temperature]).encode("utf-8")
+        ).hexdigest()
+        # Quotas are per caller: a coalesced caller is checked and charged like the
+        # leader, since it gets the same result
+        accountant = get_usage_accountant()
+        reservation = None
+        if accountant is not None:
+            reservation = accountant.check(self._estimate_tokens(prompt, expected_tokens))
+        LLM_CALLS.inc(outcome="coalesced" if key in self._singleflight else "leader")
+        started = time.perf_counter()
+        try:
+            result = await self._singleflight.do(key, lambda: self._generate_cognitive_map(prompt, expected_tokens))
+        except Exception as e:
+            if accountant is not None and not isinstance(e, QuotaExceeded):
+                accountant.record(0, 0, time.perf_counter() - started, ok=False)
+            raise
+        finally:
+            if accountant is not None:
+                accountant.release(reservation)
+        if accountant is not None:
+            usage = (result.get("metadata") or {}).get("usage") or {}
+            accountant.record(
+                usage.get("prompt_tokens") or estimate_tokens(prompt),
+                usage.get("completion_tokens") or 0,
+                time.perf_counter() - started
+            )
+        # Callers mutate the result, so each one gets its own copy
+        return copy.deepcopy(result)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Report request coalescing counters."""
+        stats = {
+            "model": self.model,
+            "singleflight": self._singleflight.stats(),
+            "limiter": self.limiter.stats()
+        }
+        if self._pool is not None:
+            stats["endpoints"] = self._pool.stats()
+        return stats
+    
+    def _build_messages(self, prompt: str) -> List[Dict[str, str]]:
+        return [
+            {
+                "role": "system",
+                "content": "You are a cognitive mapping expert. Always return valid JSON only, no markdown formatting."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+    
+    async def _create_completion(self, client, prompt: str, model: Optional[str] = None, **kwargs):
+        """Call the chat completions API, retrying without response_format if unsupported."""
         try:
             # Try with response_format first (OpenAI), fallback if not supported
-            try:
-                response = await self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "You are a cognitive mapping expert. Always return valid JSON only, no markdown formatting."
-                        },
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    temperature=0.7,
-                    response_format={"type": "json_object"}
-                )
-            except (TypeError, ValueError) as e:
-                # Fallback for APIs that don't support response_format
-                response = await self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "You are a cognitive mapping expert. Always return valid JSON only, no markdown formatting."
-                        },
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    temperature=0.7
-                )
-            
-            if not response.choices or not response.choices[0].message.content:
-                raise RuntimeError("LLM returned empty response")
-            
-            content = response.choices[0].message.content.strip()
-            
-            # Remove markdown code blocks if present
-            if content.startswith("```json"):
-                content = content[7:]
-            if content.startswith("```"):
-                content = content[3:]
-            if content.endswith("```"):
-                content = content[:-3]
-            
-            content = content.strip()
-            
-            if not content:
-                raise RuntimeError("LLM returned empty content after processing")
-            
-            return json.loads(content)
-            
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Failed to parse LLM response as JSON: {str(e)}")
+            return await client.chat.completions.create(
+                model=model or self.model,
+                messages=self._build_messages(prompt),
+                temperature=self.temperature,
+                response_format={"type": "json_object"},
+                **kwargs
+            )
+        except (TypeError, ValueError) as e:
+            # Fallback for APIs that don't support response_format
+            return await client.chat.completions.create(
+                model=model or self.model,
+                messages=self._build_messages(prompt),
+                temperature=self.temperature,
+                **kwargs
+            )
+    
+    async def _generate_cognitive_map(self, prompt: str, expected_tokens: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Make the provider call and parse the JSON response.
+        Retryable failures (429, 5xx, timeouts, unparseable JSON) are retried with
+        jittered backoff, then the next model in the fallback chain is tried.
+        Every attempt is recorded in the result's metadata.
+        """
+        attempts = []
+        error = None
+        models = [self.model] + self.fallback_models
+        for position, model in enumerate(models):
+            for attempt in range(self.retry_policy.max_attempts):
+                started = time.monotonic()
+                try:
+                    (data, usage), was_hedged = await hedged(
+                        lambda: self._attempt(prompt, model, expected_tokens),
+                        self._hedge_delay(model)
+                    )
+                    attempts.append({
+                        "model": model,
+                        "outcome": "ok",
+                        "hedged": was_hedged,
+                        "latency_ms": round((time.monotonic() - started) * 1000, 1)
+                    })
+                    data["metadata"] = {"model": model, "attempts": attempts, "usage": usage}
+                    return data
+                except RateLimitExceeded:
+                    # Our own limiter turned the call away; retrying would only queue again
+                    LLM_ERRORS.inc(model=model, kind="rejected")
+                    raise
+                except Exception as e:
+                    error = e
+                    kind = classify_error(e)
+                    LLM_ERRORS.inc(model=model, kind=kind or "error")
+                    attempts.append({
+                        "model": model,
+                        "outcome": kind or "error",
+                        "error": str(e)[:200],
+                        "latency_ms": round((time.monotonic() - started) * 1000, 1)
+                    })
+                    if kind is None:
+                        raise self._translate_error(e, model)
+                    if kind == "model" or attempt + 1 == self.retry_policy.max_attempts:
+                        break
+                    delay = self.retry_policy.backoff(attempt)
+                    if is_rate_limit(e):
+                        delay = max(delay, _retry_after(e))
+                    await asyncio.sleep(delay)
+            if position + 1 < len(models):
+                logger.warning(f"Model {model} failed, falling back to {models[position + 1]}")
+        
+        if is_rate_limit(error):
+            raise RateLimitExceeded(f"LLM provider rate limit reached: {str(error)}", _retry_after(error))
+        if isinstance(error, json.JSONDecodeError):
+            raise ValueError(f"Failed to parse LLM response as JSON: {str(error)}")
+        raise self._translate_error(error, self.model)
+    
+    async def _attempt(self, prompt: str, model: str, expected_tokens: Optional[int] = None):
+        """
+        One limited provider call. Returns (parsed JSON, token usage).
+        Raises provider exceptions unchanged for classification.
+        """
+        started = time.monotonic()
+        usage = None
+        queued = time.perf_counter()
+        async with self.limiter.slot(self._estimate_tokens(prompt, expected_tokens)) as outcome:
+            sent = time.perf_counter()
+            record_stage("queue_wait", sent - queued)
+            async with self.pool.lease() as endpoint:
+                try:
+                    response = await self._create_completion(endpoint.client, prompt, model=model)
+                except Exception as e:
+                    if is_rate_limit(e):
+                        outcome["throttled"] = True
+                    raise
+            record_provider_call(sent, time.perf_counter(), first_byte_since(sent))
+            if response.usage:
+                outcome["tokens"] = response.usage.total_tokens
+                usage = {
+                    "prompt_tokens": response.usage.prompt_tokens,
+                    "completion_tokens": response.usage.completion_tokens
+                }
+                LLM_TOKENS.inc(response.usage.prompt_tokens or 0, model=model, type="prompt")
+                LLM_TOKENS.inc(response.usage.completion_tokens or 0, model=model, type="completion")
+        
+        if not response.choices or not response.choices[0].message.content:
+            raise RuntimeError("LLM returned empty response")
+        
+        with timed("parse"):
+            data = parse_json_content(response.choices[0].message.content)
+        self._latency(model).record(time.monotonic() - started)
+        return data, usage
+    
+    def _latency(self, model: str) -> LatencyTracker:
+        if model not in self._latencies:
+            self._latencies[model] = LatencyTracker()
+        return self._latencies[model]
+    
+    def _hedge_delay(self, model: str) -> Optional[float]:
+        """Fire a hedge request once a call runs past this model's p95 latency."""
+        if not self.hedging:
+            return None
+        p95 = self._latency(model).percentile(95)
+        if p95 is None:
+            return None
+        return max(self.hedge_min_delay, p95)
+    
+    async def stream_cognitive_map(self, prompt: str, expected_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        """
+        Stream the cognitive map completion.
+        Yields raw text deltas as they arrive from the provider.
+        """
+        accountant = get_usage_accountant()
+        reservation = None
+        sent = None
+        completion = []
+        try:
+            estimated = self._estimate_tokens(prompt, expected_tokens)
+            if accountant is not None:
+                reservation = accountant.check(estimated)
+            queued = time.perf_counter()
+            async with self.limiter.slot(estimated) as outcome:
+                sent = time.perf_counter()
+                record_stage("queue_wait", sent - queued)
+                first_delta = None
+                async with self.pool.lease() as endpoint:
+                    try:
+                        stream = await self._create_completion(endpoint.client, prompt, stream=True)
+                    except Exception as e:
+                        if not is_rate_limit(e):
+                            raise
+                        outcome["throttled"] = True
+                        raise RateLimitExceeded(f"LLM provider rate limit reached: {str(e)}", _retry_after(e))
+                    async for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            if first_delta is None:
+                                first_delta = time.perf_counter()
+                            completion.append(chunk.choices[0].delta.content)
+                            yield chunk.choices[0].delta.content
+                record_provider_call(sent, time.perf_counter(), first_delta)
+            if accountant is not None:
+                # Streams carry no usage from the provider: count estimates
+                accountant.record(estimate_tokens(prompt), estimate_tokens("".join(completion)), time.perf_counter() - sent)
         except Exception as e:
-            error_msg = str(e)
-            # Provide helpful error messages for common issues
-            if "model" in error_msg.lower() and ("not exist" in error_msg.lower() or "not_found" in error_msg.lower()):
-                # Provide model suggestions based on the base URL
-                if "groq" in self.base_url.lower():
-                    model_suggestions = "Groq models: 'llama-3.3-70b-versatile', 'llama-3.1-70b-versatile', 'llama-3.1-8b-instant', 'mixtral-8x7b-32768'"
-                else:
-                    model_suggestions = "OpenAI models: 'gpt-3.5-turbo', 'gpt-4', 'gpt-4-turbo-preview', 'gpt-4o'"
-                
-                raise RuntimeError(
-                    f"Model '{self.model}' is not available. "
-                    f"Please check your .env file and set LLM_MODEL to a valid model name. "
-                    f"Common options: {model_suggestions}. "
-                    f"Original error: {error_msg}"
-                )
-            elif "api key" in error_msg.lower() or "unauthorized" in error_msg.lower():
-                raise RuntimeError(
-                    f"Invalid API key. Please check your LLM_API_KEY in the .env file. "
-                    f"Original error: {error_msg}"
-                )
+            if accountant is not None and sent is not None:
+                accountant.record(estimate_tokens(prompt), estimate_tokens("".join(completion)), time.perf_counter() - sent, ok=False)
+            if isinstance(e, QuotaExceeded):
+                kind = "rejected"
             else:
-                raise RuntimeError(f"LLM API error: {error_msg}")
+                kind = "rate_limit" if isinstance(e, RateLimitExceeded) else classify_error(e)
+            LLM_ERRORS.inc(model=self.model, kind=kind or "error")
+            raise self._translate_error(e)
+        finally:
+            if accountant is not None:
+                accountant.release(reservation)
+    
+    def _estimate_tokens(self, prompt: str, expected_tokens: Optional[int] = None) -> int:
+        """Token reservation for the limiter: the prompt estimate plus the expected completion."""
+        return estimate_tokens(prompt) + (expected_tokens or self.expected_completion_tokens)
+    
+    def _translate_error(self, e: Exception, model: Optional[str] = None) -> RuntimeError:
+        """Turn provider errors into RuntimeErrors with helpful messages for common issues."""
+        if isinstance(e, RuntimeError):
+            return e
+        if is_rate_limit(e):
+            return RateLimitExceeded(f"LLM provider rate limit reached: {str(e)}", _retry_after(e))
+        error_msg = str(e)
+        if "model" in error_msg.lower() and ("not exist" in error_msg.lower() or "not_found" in error_msg.lower()):
+            # Provide model suggestions based on the base URL
+            if "groq" in self.base_url.lower():
+                model_suggestions = "Groq models: 'llama-3.3-70b-versatile', 'llama-3.1-70b-versatile', 'llama-3.1-8b-instant', 'mixtral-8x7b-32768'"
+            else:
+                model_suggestions = "OpenAI models: 'gpt-3.5-turbo', 'gpt-4', 'gpt-4-turbo-preview', 'gpt-4o'"
+            
+            return RuntimeError(
+                f"Model '{model or self.model}' is not available. "
+                f"Please check your .env file and set LLM_MODEL to a valid model name. "
+                f"Common options: {model_suggestions}. "
+                f"Original error: {error_msg}"
+            )
+        elif "api key" in error_msg.lower() or "unauthorized" in error_msg.lower():
+            return RuntimeError(
+                f"Invalid API key. Please check your LLM_API_KEY in the .env file. "
+                f"Original error: {error_msg}"
+            )
+        else:
+            return RuntimeError(f"LLM API error: {error_msg}")
+
+
+def _retry_after(error: Exception) -> float:
+    """Read the provider's Retry-After hint, defaulting to one second."""
+    try:
+        return float(error.response.headers.get("retry-after", 1))
+    except (AttributeError, TypeError, ValueError):
+        return 1.0
+
+
+def parse_json_content(content: str) -> Dict[str, Any]:
+    """Strip markdown code fences from an LLM reply and parse it as JSON."""
+    content = content.strip()
+    
+    # Remove markdown code blocks if present
+    if content.startswith("```json"):
+        content = content[7:]
+    if content.startswith("```"):
+        content = content[3:]
+    if content.endswith("```"):
+        content = content[:-3]
+    
+    content = content.strip()
+    
+    if not content:
+        raise RuntimeError("LLM returned empty content after processing")
+    
+    return fastjson.loads(content)
 
 
 # Global instance - will be initialized lazily
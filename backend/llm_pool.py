@@ -0,0 +1,176 @@
+import os
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional, TYPE_CHECKING
+
+from metrics import mark_first_byte
+
+if TYPE_CHECKING:
+    import httpx
+    from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() not in ("0", "false", "no")
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class TransportSettings:
+    """httpx transport settings for provider connections, read from the environment."""
+
+    def __init__(self):
+        self.max_connections = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+        self.max_keepalive = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))
+        self.keepalive_expiry = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30"))
+        self.connect_timeout = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+        self.read_timeout = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+        self.http2 = _env_flag("LLM_HTTP2", "true")
+        if self.http2 and not _http2_available():
+            logger.warning("LLM_HTTP2 is enabled but the 'h2' package is not installed - falling back to HTTP/1.1")
+            self.http2 = False
+
+    def build_http_client(self) -> "httpx.AsyncClient":
+        import httpx
+        return httpx.AsyncClient(
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive,
+                keepalive_expiry=self.keepalive_expiry
+            ),
+            timeout=httpx.Timeout(
+                self.read_timeout,
+                connect=self.connect_timeout,
+                read=self.read_timeout
+            ),
+            # Timestamps response headers so provider TTFB can be told apart from generation time
+            event_hooks={"response": [mark_first_byte]}
+        )
+
+
+class LLMEndpoint:
+    """One provider base URL / API key pair with its own connection pool."""
+
+    def __init__(self, base_url: str, api_key: str, settings: TransportSettings):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.settings = settings
+        self.outstanding = 0
+        self.requests = 0
+        # When a request to this endpoint last completed, for the readiness check
+        self.last_ok: Optional[float] = None
+        self._client = None
+
+    @property
+    def client(self) -> "AsyncOpenAI":
+        if self._client is None:
+            # The SDK is the slowest import in the app; load it on first use
+            from openai import AsyncOpenAI
+            self._client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                # Retries are handled by LLMClient's retry policy
+                max_retries=0,
+                http_client=self.settings.build_http_client()
+            )
+        return self._client
+
+    async def warm_up(self) -> bool:
+        """Open a connection (DNS, TCP and TLS) ahead of the first real request."""
+        try:
+            await self.client.models.list()
+            self.last_ok = time.monotonic()
+            return True
+        except Exception as e:
+            logger.warning(f"Connection warm-up failed for {self.base_url}: {str(e)}")
+            return False
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+class ClientPool:
+    """
+    Fan out provider calls across endpoints with least-outstanding-requests balancing.
+    Ties are broken round-robin so idle endpoints share load evenly.
+    """
+
+    def __init__(self, endpoints: List[LLMEndpoint]):
+        if not endpoints:
+            raise ValueError("ClientPool needs at least one endpoint")
+        self.endpoints = endpoints
+        self._next = 0
+
+    def pick(self) -> LLMEndpoint:
+        count = len(self.endpoints)
+        start = self._next
+        self._next = (self._next + 1) % count
+        best = None
+        for offset in range(count):
+            endpoint = self.endpoints[(start + offset) % count]
+            if best is None or endpoint.outstanding < best.outstanding:
+                best = endpoint
+        return best
+
+    @asynccontextmanager
+    async def lease(self):
+        """Borrow the least busy endpoint for the duration of one request."""
+        endpoint = self.pick()
+        endpoint.outstanding += 1
+        endpoint.requests += 1
+        try:
+            yield endpoint
+            endpoint.last_ok = time.monotonic()
+        finally:
+            endpoint.outstanding -= 1
+
+    async def warm_up(self) -> int:
+        """Warm every endpoint concurrently. Returns how many succeeded."""
+        results = await asyncio.gather(*(endpoint.warm_up() for endpoint in self.endpoints))
+        return sum(results)
+
+    async def close(self) -> None:
+        await asyncio.gather(*(endpoint.close() for endpoint in self.endpoints))
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [
+            {"base_url": e.base_url, "outstanding": e.outstanding, "requests": e.requests}
+            for e in self.endpoints
+        ]
+
+
+def _split(value: Optional[str]) -> List[str]:
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+
+def build_pool(base_url: str, api_key: str) -> ClientPool:
+    """
+    Build a client pool from LLM_BASE_URLS / LLM_API_KEYS (comma separated),
+    falling back to the single LLM_BASE_URL / LLM_API_KEY pair.
+    A single URL is shared by every key and a single key by every URL;
+    otherwise URLs and keys are paired in order.
+    """
+    base_urls = _split(os.getenv("LLM_BASE_URLS")) or [base_url]
+    api_keys = _split(os.getenv("LLM_API_KEYS")) or [api_key]
+    if len(base_urls) == 1:
+        base_urls = base_urls * len(api_keys)
+    elif len(api_keys) == 1:
+        api_keys = api_keys * len(base_urls)
+    elif len(base_urls) != len(api_keys):
+        raise ValueError("LLM_BASE_URLS and LLM_API_KEYS must have the same number of entries")
+
+    settings = TransportSettings()
+    return ClientPool([LLMEndpoint(url, key, settings) for url, key in zip(base_urls, api_keys)])
@@ -1,7 +1,13 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from routes import router
+from metrics import MetricsMiddleware, metrics_enabled, server_timing_enabled
+from usage import UsageMiddleware, get_usage_accountant
+from readiness import get_readiness
+from contextlib import asynccontextmanager
+import os
 import logging
 
 # Logging setup
@@ -11,23 +17,54 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Try to check llm_client configuration at startup (lazy initialization)
-try:
+
+# Startup and shutdown. Heavy imports and provider connections are warmed in the
+# background so the server starts answering (/livez) at once; /readyz reports
+# when it is worth sending traffic here.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from jobs import get_job_queue
+    from warmer import get_cache_warmer
+    readiness = get_readiness()
+    readiness.start()
+    # Per-client token accounting, flushed to SQLite in batches
+    accountant = get_usage_accountant()
+    if accountant is not None:
+        await accountant.start()
+    # Run queued jobs, including ones left unfinished by the previous process
+    await get_job_queue().start()
+    # Keep popular maps in the cache, regenerating them before they expire
+    warmer = get_cache_warmer()
+    if warmer is not None:
+        await warmer.start()
+
+    yield
+
+    # Fail readiness first so load balancers stop routing new requests here
+    await readiness.stop()
+    if warmer is not None:
+        await warmer.stop()
+    # Give running jobs the drain window, then stop; unfinished ones resume on the next start
+    timeout = float(os.getenv("LLM_DRAIN_TIMEOUT", "30"))
+    await get_job_queue().stop(timeout)
+    # Let in-flight LLM calls (including background batch jobs) finish before closing connections
     from llm_client import get_llm_client
     client = get_llm_client()
-    if client.api_key:
-        logger.info("LLM client configured successfully")
-    else:
-        logger.warning("LLM_API_KEY not set - API calls will fail until .env is configured")
-except Exception as e:
-    logger.warning(f"Could not check LLM client configuration: {str(e)}")
-    logger.warning("The server will start but API calls may fail")
+    if not await client.drain(timeout):
+        logger.warning(f"Shutting down with LLM calls still in flight after {timeout}s")
+    await client.close()
+    if accountant is not None:
+        await accountant.stop()
+    from exporter import get_exporter
+    get_exporter().shutdown()
+
 
 # Create FastAPI app
 app = FastAPI(
     title="MindMesh API",
     description="API for generating structured cognitive maps",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS setup - update with your frontend URLs
@@ -46,6 +83,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency and per-stage timings for /metrics (and optionally Server-Timing)
+if metrics_enabled():
+    app.add_middleware(MetricsMiddleware, server_timing=server_timing_enabled())
+
+# Attribute each request to a client for usage accounting and quotas
+app.add_middleware(UsageMiddleware)
+
 # Include API routes
 app.include_router(router)
 
@@ -61,3 +105,14 @@ async def root():
 @app.get("/health")
 async def health():
     return {"status": "healthy"}
+
+# Liveness: the process is up and serving requests
+@app.get("/livez")
+async def livez():
+    return {"status": "alive"}
+
+# Readiness: warmed up, provider reachable, limiter queue not saturated and not shutting down
+@app.get("/readyz")
+async def readyz():
+    report = await get_readiness().check()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
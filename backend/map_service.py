@@ -0,0 +1,441 @@
+import os
+import sqlite3
+import asyncio
+import logging
+
+from typing import Dict, Any, List
+
+import fastjson
+from schemas import CognitiveMapResponse, ExpandResponse
+from prompt import (
+    get_prompt, get_fusion_prompt, get_expand_prompt, get_bridge_prompt, get_prompt_hash, get_output_mode,
+    expected_completion_tokens, expected_expand_tokens, expected_bridge_tokens
+)
+from tokens import estimate_tokens
+from llm_client import get_llm_client
+from fanout import generate_parallel_map, get_generation_mode, gather_or_cancel
+from fusion import get_fusion_mode, source_graph, align_nodes, compose_graph
+from graph_normalizer import get_graph_normalizer, TYPE_TO_LIST
+from cache import get_response_cache, make_cache_key, normalize_topic
+from map_store import get_map_store, VersionConflict
+from semantic_cache import get_semantic_cache
+from warmer import get_cache_warmer
+from metrics import CACHE_LOOKUPS, timed
+
+logger = logging.getLogger(__name__)
+
+
+def topic_cache_key(topic: str, complexity: str, model: str) -> str:
+    return make_cache_key(
+        "map",
+        {"topic": normalize_topic(topic), "complexity": complexity},
+        model,
+        get_prompt_hash("map")
+    )
+
+
+def fusion_cache_key(topic_a: str, topic_b: str, complexity: str, model: str, mode: str = "direct") -> str:
+    return make_cache_key(
+        "fusion",
+        {"topic_a": normalize_topic(topic_a), "topic_b": normalize_topic(topic_b), "complexity": complexity},
+        model,
+        get_prompt_hash("compose" if mode == "compose" else "fusion")
+    )
+
+
+def token_budget(prompt: str, complexity: str) -> dict:
+    """Estimated prompt and completion tokens for one generation, reported in the response metadata."""
+    return {
+        "output_mode": get_output_mode(),
+        "prompt_estimate": estimate_tokens(prompt),
+        "completion_estimate": expected_completion_tokens(complexity)
+    }
+
+
+def _with_budget(response_data: dict, budget: dict) -> None:
+    response_data['metadata'] = {**(response_data.get('metadata') or {}), 'tokens': budget}
+
+
+def _cached(cache, cache_key: str, kind: str, bypass_cache: bool):
+    """Look the map up in the response cache, counting the outcome."""
+    if bypass_cache:
+        CACHE_LOOKUPS.inc(kind=kind, result="bypass")
+        return None
+    cached = cache.get(cache_key)
+    CACHE_LOOKUPS.inc(kind=kind, result="miss" if cached is None else "hit")
+    return cached
+
+
+def _semantic_partition(complexity: str, model: str) -> tuple:
+    return ("map", complexity, model, get_prompt_hash("map"))
+
+
+def semantic_cached(cache, topic: str, complexity: str, model: str):
+    """
+    After an exact miss, serve the cached map of a near-duplicate topic
+    ("intro to ML" for "machine learning"). Returns the cached map or None.
+    """
+    semantic = get_semantic_cache()
+    if semantic is None:
+        return None
+    partition = _semantic_partition(complexity, model)
+    with timed("semantic_lookup"):
+        match = semantic.lookup(partition, topic)
+    if match is None:
+        return None
+    matched_topic, matched_key, similarity = match
+    cached = cache.get(matched_key)
+    if cached is None:
+        # The exact entry expired or was evicted; the index must not point at it any more
+        semantic.forget(partition, matched_topic)
+        return None
+    CACHE_LOOKUPS.inc(kind="map", result="semantic_hit")
+    logger.info(f"Semantic cache hit for topic: {topic} -> {matched_topic} (similarity {similarity:.3f})")
+    cached['metadata'] = {
+        **(cached.get('metadata') or {}),
+        'cache': 'semantic',
+        'matched_topic': matched_topic,
+        'similarity': round(similarity, 4)
+    }
+    return cached
+
+
+def remember_topic(topic: str, complexity: str, model: str, cache_key: str) -> None:
+    """Index a freshly cached map so near-duplicate topics can reuse it."""
+    semantic = get_semantic_cache()
+    if semantic is not None:
+        semantic.add(_semantic_partition(complexity, model), topic, cache_key)
+
+
+def track_request(topic: str, complexity: str) -> None:
+    """Count a map request so the cache warmer keeps popular maps fresh."""
+    warmer = get_cache_warmer()
+    if warmer is not None:
+        warmer.record(topic, complexity)
+
+
+def _from_cache(cached: dict) -> CognitiveMapResponse:
+    cached['metadata'] = {**(cached.get('metadata') or {}), 'cache': 'hit'}
+    return CognitiveMapResponse.model_validate(cached)
+
+
+async def save_map(result: CognitiveMapResponse, complexity: str, kind: str = "map") -> None:
+    """Persist a freshly generated map and stamp it with its map_id. Storage failures are logged, not raised."""
+    store = get_map_store()
+    if store is None:
+        return
+    model = (result.metadata or {}).get("model") or get_llm_client().model
+    map_id = store.new_id()
+    result.map_id = map_id
+    try:
+        await asyncio.to_thread(store.save, map_id, result.model_dump(), complexity, model, get_prompt_hash(kind))
+    except sqlite3.Error as e:
+        logger.warning(f"Could not save map: {str(e)}")
+        result.map_id = None
+
+
+async def build_topic_map(topic: str, complexity: str = "intermediate", bypass_cache: bool = False,
+                          generation: str = None, track: bool = True) -> CognitiveMapResponse:
+    """
+    Generate (or fetch from the cache) a validated cognitive map for one topic.
+    `generation` picks one LLM call ("single") or fan-out sections ("parallel");
+    both kinds of map share cache entries. `track=False` keeps the call out of
+    the warmer's request counts (used by the warmer itself).
+    Raises RateLimitExceeded, ValueError or RuntimeError on failure.
+    """
+    if track:
+        track_request(topic, complexity)
+    llm_client = get_llm_client()
+    cache = get_response_cache()
+    cache_key = topic_cache_key(topic, complexity, llm_client.model)
+    cached = _cached(cache, cache_key, "map", bypass_cache)
+    if cached is not None:
+        logger.info(f"Cache hit for topic: {topic} (complexity: {complexity})")
+        return _from_cache(cached)
+    cached = None if bypass_cache else semantic_cached(cache, topic, complexity, llm_client.model)
+    if cached is not None:
+        return CognitiveMapResponse.model_validate(cached)
+
+    mode = get_generation_mode(generation, complexity)
+    logger.info(f"Generating cognitive map for topic: {topic} (complexity: {complexity}, generation: {mode})")
+
+    if mode == "parallel":
+        response_data = await generate_parallel_map(topic, complexity)
+    else:
+        # Generate prompt
+        with timed("prompt_build"):
+            prompt = get_prompt(topic, complexity)
+            budget = token_budget(prompt, complexity)
+
+        # Call LLM
+        response_data = await llm_client.generate_cognitive_map(prompt, budget["completion_estimate"])
+        _with_budget(response_data, budget)
+
+    logger.debug(f"LLM response keys: {list(response_data.keys())}")
+
+    with timed("normalize"):
+        get_graph_normalizer().normalize(response_data, topic)
+
+    logger.debug(f"Final response: {len(response_data.get('graph_nodes', []))} nodes, {len(response_data.get('graph_links', []))} links")
+
+    # Validate, store, cache and return
+    with timed("validate"):
+        result = CognitiveMapResponse.model_validate(response_data)
+    await save_map(result, complexity, "map")
+    cache.set(cache_key, result.model_dump())
+    remember_topic(topic, complexity, llm_client.model, cache_key)
+    return result
+
+
+async def compose_fusion(topic_a: str, topic_b: str, complexity: str = "intermediate") -> Dict[str, Any]:
+    """
+    Raw fusion map built from the two single-topic maps (fetched from the cache or
+    generated concurrently): nodes with similar labels are merged and the LLM only
+    writes the bridge, i.e. the synthesized core, intersections and tensions.
+    """
+    map_a, map_b = await gather_or_cancel([build_topic_map(topic_a, complexity), build_topic_map(topic_b, complexity)])
+    nodes_a, links_a = source_graph("a", map_a.model_dump())
+    nodes_b, links_b = source_graph("b", map_b.model_dump())
+    with timed("align"):
+        aliases = align_nodes(nodes_a, nodes_b, float(os.getenv("FUSION_MERGE_THRESHOLD", "0.8")))
+
+    with timed("prompt_build"):
+        prompt = get_bridge_prompt(topic_a, nodes_a, topic_b, [node for node in nodes_b if node["id"] not in aliases], complexity)
+        budget = {
+            "output_mode": get_output_mode(),
+            "prompt_estimate": estimate_tokens(prompt),
+            "completion_estimate": expected_bridge_tokens(complexity)
+        }
+    bridge = await get_llm_client().generate_cognitive_map(prompt, budget["completion_estimate"])
+
+    data = compose_graph(f"Fusion: {topic_a} & {topic_b}", nodes_a, links_a, nodes_b, links_b, aliases, bridge)
+    data["metadata"] = {
+        **(bridge.get("metadata") or {}),
+        "tokens": budget,
+        "fusion": {
+            "mode": "compose",
+            "sources": [(m.metadata or {}).get("cache") or "generated" for m in (map_a, map_b)],
+            "merged_nodes": len(aliases)
+        }
+    }
+    return data
+
+
+async def build_fusion_map(topic_a: str, topic_b: str, complexity: str = "intermediate", bypass_cache: bool = False,
+                           fusion: str = None) -> CognitiveMapResponse:
+    """
+    Generate (or fetch from the cache) a validated fusion map for two topics.
+    `fusion` picks one fusion prompt ("direct") or a bridge between the two
+    single-topic maps ("compose"); "auto" composes when both topic maps are cached
+    (generating a missing one first would take longer than a direct fusion).
+    In auto mode a fusion cached by the other mode is served as well.
+    bypass_cache refreshes the fusion itself, not the topic maps it is composed from.
+    Raises RateLimitExceeded, ValueError or RuntimeError on failure.
+    """
+    llm_client = get_llm_client()
+    cache = get_response_cache()
+    requested = get_fusion_mode(fusion)
+    mode = requested
+    if mode == "auto":
+        topics_cached = all(
+            cache.contains(topic_cache_key(topic, complexity, llm_client.model)) for topic in (topic_a, topic_b)
+        )
+        mode = "compose" if topics_cached else "direct"
+    cache_key = fusion_cache_key(topic_a, topic_b, complexity, llm_client.model, mode)
+    if requested == "auto" and not bypass_cache and not cache.contains(cache_key):
+        # e.g. a direct fusion cached before both topic maps were
+        other_key = fusion_cache_key(
+            topic_a, topic_b, complexity, llm_client.model, "direct" if mode == "compose" else "compose"
+        )
+        if cache.contains(other_key):
+            cache_key = other_key
+    cached = _cached(cache, cache_key, "fusion", bypass_cache)
+    if cached is not None:
+        logger.info(f"Cache hit for fusion: {topic_a} & {topic_b} (complexity: {complexity})")
+        return _from_cache(cached)
+    # Store under the mode that generates it
+    cache_key = fusion_cache_key(topic_a, topic_b, complexity, llm_client.model, mode)
+
+    logger.info(f"Generating fusion map for topics: {topic_a} & {topic_b} (complexity: {complexity}, fusion: {mode})")
+
+    if mode == "compose":
+        response_data = await compose_fusion(topic_a, topic_b, complexity)
+    else:
+        # Generate prompt
+        with timed("prompt_build"):
+            prompt = get_fusion_prompt(topic_a, topic_b, complexity)
+            budget = token_budget(prompt, complexity)
+
+        # Call LLM
+        response_data = await llm_client.generate_cognitive_map(prompt, budget["completion_estimate"])
+        _with_budget(response_data, budget)
+
+    logger.debug(f"Fusion LLM response keys: {list(response_data.keys())}")
+
+    with timed("normalize"):
+        get_graph_normalizer().normalize(
+            response_data,
+            f"{topic_a} & {topic_b}",
+            reasoning_trail=f"This fusion map explores the intersections and relationships between {topic_a} and {topic_b}, highlighting connections and contradictions."
+        )
+
+    # Validate, store, cache and return
+    with timed("validate"):
+        result = CognitiveMapResponse.model_validate(response_data)
+    await save_map(result, complexity, "compose" if mode == "compose" else "fusion")
+    cache.set(cache_key, result.model_dump())
+    return result
+
+
+def layout_cache_key(data: Dict[str, Any]) -> str:
+    """Layouts depend only on the graph's shape, so maps with the same nodes and links share one."""
+    from layout import LAYOUT_VERSION
+    return make_cache_key(
+        "layout",
+        {
+            "nodes": [[node["id"], node["type"]] for node in data["graph_nodes"]],
+            "links": [[link["source"], link["target"]] for link in data["graph_links"]]
+        },
+        "numpy",
+        LAYOUT_VERSION
+    )
+
+
+async def with_layout(result: CognitiveMapResponse) -> Dict[str, Any]:
+    """
+    The map as a dict with precomputed x/y on every graph node.
+    Positions come from the response cache or are computed off the event loop.
+    """
+    # NumPy-backed; imported on first use to keep it out of startup
+    from layout import compute_layout, LAYOUT_VERSION
+    cache = get_response_cache()
+    data = result.model_dump()
+    cache_key = layout_cache_key(data)
+    positions = cache.get(cache_key)
+    CACHE_LOOKUPS.inc(kind="layout", result="miss" if positions is None else "hit")
+    if positions is None:
+        with timed("layout"):
+            positions = await asyncio.to_thread(compute_layout, data["graph_nodes"], data["graph_links"])
+        cache.set(cache_key, positions)
+    for node in data["graph_nodes"]:
+        node["x"], node["y"] = positions[node["id"]]
+    data['metadata'] = {**(data.get('metadata') or {}), 'layout': LAYOUT_VERSION}
+    return data
+
+
+def _path_to(nodes_by_id: Dict[str, Dict[str, Any]], links: List[Dict[str, str]], node_id: str, max_depth: int = 4) -> List[str]:
+    """Labels from the root down to `node_id`, following the first incoming link at each step."""
+    parents = {}
+    for link in links:
+        parents.setdefault(link["target"], link["source"])
+    path = [node_id]
+    while path[-1] in parents and len(path) <= max_depth and parents[path[-1]] not in path:
+        path.append(parents[path[-1]])
+    return [nodes_by_id[i]["label"] for i in reversed(path) if i in nodes_by_id]
+
+
+async def expand_node(topic: str, nodes: List[Dict[str, Any]], links: List[Dict[str, str]], node_id: str,
+                      complexity: str = "intermediate", bypass_cache: bool = False) -> ExpandResponse:
+    """
+    Generate new children for one node of an existing graph.
+    Only the new nodes and links are returned; the graph itself is not modified.
+    Raises LookupError if the node is not in the graph, plus the build_topic_map errors.
+    """
+    nodes_by_id = {node["id"]: node for node in nodes}
+    node = nodes_by_id.get(node_id)
+    if node is None:
+        raise LookupError(f"Node '{node_id}' not found in the map")
+
+    path = _path_to(nodes_by_id, links, node_id)
+    existing = [nodes_by_id[l["target"]]["label"] for l in links if l["source"] == node_id and l["target"] in nodes_by_id]
+
+    llm_client = get_llm_client()
+    cache = get_response_cache()
+    cache_key = make_cache_key(
+        "expand",
+        {
+            "topic": normalize_topic(topic),
+            "node": [node.get("type"), normalize_topic(node.get("label", ""))],
+            "path": [normalize_topic(label) for label in path],
+            "existing": sorted(normalize_topic(label) for label in existing),
+            "complexity": complexity
+        },
+        llm_client.model,
+        get_prompt_hash("expand")
+    )
+    response_data = _cached(cache, cache_key, "expand", bypass_cache)
+    fresh = response_data is None
+    if not fresh:
+        response_data['metadata'] = {**(response_data.get('metadata') or {}), 'cache': 'hit'}
+    else:
+        logger.info(f"Expanding node {node_id} of: {topic} (complexity: {complexity})")
+        with timed("prompt_build"):
+            prompt = get_expand_prompt(topic, node, path, existing, complexity)
+            budget = {"prompt_estimate": estimate_tokens(prompt), "completion_estimate": expected_expand_tokens(complexity)}
+        response_data = await llm_client.generate_cognitive_map(prompt, budget["completion_estimate"])
+        _with_budget(response_data, budget)
+
+    with timed("normalize"):
+        children, child_links = get_graph_normalizer().expansion(nodes, node_id, response_data.get("children"))
+    if not children:
+        raise ValueError("The LLM returned no new children for this node")
+    if fresh:
+        cache.set(cache_key, response_data)
+    with timed("validate"):
+        return ExpandResponse.model_validate({
+            "node_id": node_id,
+            "graph_nodes": children,
+            "graph_links": child_links,
+            "metadata": response_data.get("metadata")
+        })
+
+
+async def expand_stored_map(map_id: str, node_id: str, complexity: str = "intermediate",
+                            bypass_cache: bool = False) -> ExpandResponse:
+    """
+    Expand a node of a stored map and save the grown map back under the same id.
+    The save is a compare-and-set on the map's version: when another expansion
+    saved first, the new children are renumbered against the latest map (dropping
+    labels it already has) and saved again, up to EXPAND_SAVE_ATTEMPTS times.
+    Raises LookupError if the map or node does not exist, VersionConflict if the
+    map kept changing.
+    """
+    store = get_map_store()
+    if store is None:
+        raise RuntimeError("Map store is disabled")
+    stored = await asyncio.to_thread(store.get_versioned, map_id)
+    if stored is None:
+        raise LookupError("Map not found")
+    data, version = fastjson.loads(stored[0]), stored[1]
+
+    result = await expand_node(data["topic"], data["graph_nodes"], data["graph_links"], node_id, complexity, bypass_cache)
+    result.map_id = map_id
+
+    attempts = int(os.getenv("EXPAND_SAVE_ATTEMPTS", "3"))
+    for attempt in range(attempts):
+        for child in result.graph_nodes:
+            data["graph_nodes"].append(child.model_dump())
+            field = TYPE_TO_LIST.get(child.type)
+            if field:
+                data.setdefault(field, []).append(child.label)
+        data["graph_links"].extend(link.model_dump() for link in result.graph_links)
+        try:
+            result.version = await asyncio.to_thread(store.update, map_id, data, version)
+            return result
+        except VersionConflict:
+            if attempt + 1 == attempts:
+                raise
+        except sqlite3.Error as e:
+            logger.warning(f"Could not save expanded map {map_id}: {str(e)}")
+            return result
+        stored = await asyncio.to_thread(store.get_versioned, map_id)
+        if stored is None:
+            raise LookupError("Map not found")
+        data, version = fastjson.loads(stored[0]), stored[1]
+        children, links = get_graph_normalizer().expansion(
+            data["graph_nodes"], node_id, [child.model_dump() for child in result.graph_nodes]
+        )
+        result = ExpandResponse.model_validate({
+            **result.model_dump(), "graph_nodes": children, "graph_links": links
+        })
+    return result
@@ -0,0 +1,224 @@
+import os
+import time
+import uuid
+import sqlite3
+import threading
+import logging
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+import fastjson
+
+logger = logging.getLogger(__name__)
+
+
+CHANGE_KINDS = ("node", "link", "removed_node", "removed_link")
+
+
+class VersionConflict(Exception):
+    """The stored map changed since the version an update was based on."""
+
+
+def _diff(old: Dict[str, Any], new: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """(kind, ref) for every node and link that differs between two versions of a map."""
+    old_nodes = {node["id"]: node for node in old.get("graph_nodes") or []}
+    new_nodes = {node["id"]: node for node in new.get("graph_nodes") or []}
+    old_links = {fastjson.dumps([link["source"], link["target"]]) for link in old.get("graph_links") or []}
+    new_links = {fastjson.dumps([link["source"], link["target"]]) for link in new.get("graph_links") or []}
+    changed = [("node", node_id) for node_id, node in new_nodes.items() if old_nodes.get(node_id) != node]
+    changed += [("removed_node", node_id) for node_id in old_nodes if node_id not in new_nodes]
+    changed += [("link", ref) for ref in sorted(new_links - old_links)]
+    changed += [("removed_link", ref) for ref in sorted(old_links - new_links)]
+    return changed
+
+
+def _fts_query(q: str) -> str:
+    """Turn free text into a safe FTS5 query: every word must match, as a prefix."""
+    terms = [term.replace('"', '""') for term in q.split()]
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+class MapStore:
+    """
+    SQLite-backed store of generated maps with an FTS5 index over topics,
+    node labels and node descriptions.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS maps (
+                id TEXT PRIMARY KEY,
+                topic TEXT NOT NULL,
+                complexity TEXT NOT NULL,
+                model TEXT NOT NULL,
+                prompt_hash TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                data TEXT NOT NULL,
+                version INTEGER NOT NULL DEFAULT 1
+            );
+            CREATE INDEX IF NOT EXISTS maps_created_at ON maps (created_at);
+            CREATE TABLE IF NOT EXISTS map_changes (
+                map_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                ref TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                PRIMARY KEY (map_id, kind, ref)
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS maps_fts USING fts5(
+                id UNINDEXED, topic, labels, descriptions
+            );
+            """
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(maps)")]
+        if "version" not in columns:
+            # Stores created before versioning: every existing map starts at version 1
+            self._conn.execute("ALTER TABLE maps ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+        self._conn.commit()
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+    def save(self, map_id: str, data: Dict[str, Any], complexity: str, model: str, prompt_hash: str) -> None:
+        nodes = data.get("graph_nodes") or []
+        labels = " ".join(node.get("label") or "" for node in nodes)
+        descriptions = " ".join(node.get("description") or "" for node in nodes)
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO maps (id, topic, complexity, model, prompt_hash, created_at, data, version) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, 1)",
+                    (map_id, data.get("topic", ""), complexity, model, prompt_hash, time.time(),
+                     fastjson.dumps(data))
+                )
+                self._conn.execute("DELETE FROM map_changes WHERE map_id = ?", (map_id,))
+                self._conn.execute("DELETE FROM maps_fts WHERE id = ?", (map_id,))
+                self._conn.execute(
+                    "INSERT INTO maps_fts (id, topic, labels, descriptions) VALUES (?, ?, ?, ?)",
+                    (map_id, data.get("topic", ""), labels, descriptions)
+                )
+
+    def update(self, map_id: str, data: Dict[str, Any], expected_version: Optional[int] = None) -> Optional[int]:
+        """
+        Replace a stored map's data (e.g. after an expansion), keeping its other columns.
+        Bumps the map's version and records which nodes and links were added, changed
+        or removed, for changes(). Returns the new version, or None if the map is gone.
+        Raises VersionConflict if the map is no longer at `expected_version`, or was
+        written by another process while this update was being made.
+        """
+        nodes = data.get("graph_nodes") or []
+        labels = " ".join(node.get("label") or "" for node in nodes)
+        descriptions = " ".join(node.get("description") or "" for node in nodes)
+        with self._lock:
+            row = self._conn.execute("SELECT data, version FROM maps WHERE id = ?", (map_id,)).fetchone()
+            if row is None:
+                return None
+            if expected_version is not None and row[1] != expected_version:
+                raise VersionConflict(f"Map {map_id} is at version {row[1]}, not {expected_version}")
+            version = row[1] + 1
+            changed = _diff(fastjson.loads(row[0]), data)
+            with self._conn:
+                # Compare-and-set: other worker processes write to the same file
+                cursor = self._conn.execute(
+                    "UPDATE maps SET data = ?, version = ? WHERE id = ? AND version = ?",
+                    (fastjson.dumps(data), version, map_id, row[1])
+                )
+                if cursor.rowcount != 1:
+                    raise VersionConflict(f"Map {map_id} was changed by another process")
+                # A ref is either present or removed: its latest change replaces the opposite row
+                for kind, ref in changed:
+                    opposite = kind[len("removed_"):] if kind.startswith("removed_") else f"removed_{kind}"
+                    self._conn.execute(
+                        "DELETE FROM map_changes WHERE map_id = ? AND kind = ? AND ref = ?", (map_id, opposite, ref)
+                    )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO map_changes (map_id, kind, ref, version) VALUES (?, ?, ?, ?)",
+                    [(map_id, kind, ref, version) for kind, ref in changed]
+                )
+                self._conn.execute(
+                    "UPDATE maps_fts SET labels = ?, descriptions = ? WHERE id = ?",
+                    (labels, descriptions, map_id)
+                )
+        return version
+
+    def get(self, map_id: str) -> Optional[Dict[str, Any]]:
+        data = self.get_json(map_id)
+        return fastjson.loads(data) if data is not None else None
+
+    def get_json(self, map_id: str) -> Optional[str]:
+        """The stored map as JSON text, validated when it was saved."""
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM maps WHERE id = ?", (map_id,)).fetchone()
+        return row[0] if row else None
+
+    def get_versioned(self, map_id: str) -> Optional[Tuple[str, int]]:
+        """The stored map as JSON text and its current version."""
+        with self._lock:
+            row = self._conn.execute("SELECT data, version FROM maps WHERE id = ?", (map_id,)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def changes(self, map_id: str, since: int, until: int) -> Dict[str, List[Any]]:
+        """
+        Node ids and [source, target] links added, changed or removed after version
+        `since` up to `until`, grouped by kind: "node", "link", "removed_node", "removed_link".
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT kind, ref FROM map_changes WHERE map_id = ? AND version > ? AND version <= ? "
+                "ORDER BY version, rowid",
+                (map_id, since, until)
+            ).fetchall()
+        grouped: Dict[str, List[Any]] = {kind: [] for kind in CHANGE_KINDS}
+        for kind, ref in rows:
+            grouped[kind].append(fastjson.loads(ref) if kind.endswith("link") else ref)
+        return grouped
+
+    def search(self, q: Optional[str] = None, limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+        """Full-text search (best match first), or newest maps first when `q` is empty."""
+        columns = "m.id, m.topic, m.complexity, m.model, m.created_at"
+        with self._lock:
+            if q and q.strip():
+                match = _fts_query(q)
+                total = self._conn.execute(
+                    "SELECT COUNT(*) FROM maps_fts WHERE maps_fts MATCH ?", (match,)
+                ).fetchone()[0]
+                rows = self._conn.execute(
+                    f"SELECT {columns} FROM maps_fts f JOIN maps m ON m.id = f.id "
+                    "WHERE maps_fts MATCH ? ORDER BY bm25(maps_fts, 0, 10.0, 3.0, 1.0) LIMIT ? OFFSET ?",
+                    (match, limit, offset)
+                ).fetchall()
+            else:
+                total = self._conn.execute("SELECT COUNT(*) FROM maps").fetchone()[0]
+                rows = self._conn.execute(
+                    f"SELECT {columns} FROM maps m ORDER BY m.created_at DESC LIMIT ? OFFSET ?",
+                    (limit, offset)
+                ).fetchall()
+        items = [
+            {"id": r[0], "topic": r[1], "complexity": r[2], "model": r[3], "created_at": r[4]}
+            for r in rows
+        ]
+        return {"total": total, "limit": limit, "offset": offset, "items": items}
+
+
+# Global instance - will be initialized lazily
+map_store = None
+
+def get_map_store() -> Optional[MapStore]:
+    """Get or create the global map store. Returns None when disabled or unavailable."""
+    global map_store
+    if map_store is None:
+        if os.getenv("MAP_STORE_ENABLED", "true").lower() in ("0", "false", "no"):
+            return None
+        path = os.getenv("MAP_STORE_PATH", str(Path(__file__).parent / "maps.db"))
+        try:
+            map_store = MapStore(path)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not open map store at {path}: {str(e)}")
+            return None
+    return map_store
@@ -1,3 +1,7 @@
+import os
+import hashlib
+from typing import List, Optional
+
 COGNITIVE_MAP_PROMPT = """You are a cognitive mapping expert. Given a topic and complexity level, generate a comprehensive cognitive map in JSON format.
 
 COMPLEXITY LEVELS:
@@ -89,12 +93,298 @@ Complexity: {complexity}
 """
 
 
-def get_prompt(topic: str, complexity: str = "intermediate") -> str:
+# Compact "graph-only" templates: the model emits graph_nodes/graph_links once and the
+# flat lists (sub_ideas, contradictions, ...) are derived server-side from node types.
+GRAPH_MAP_PROMPT = """Build a cognitive map of the topic below as JSON.
+
+Nodes: 1 "core" node, then {counts}.
+- sub: key components of the core idea, linked from core
+- contradiction: opposing views or limitations, linked from the sub-idea they challenge
+- adjacent: related fields, linked from core or a sub-idea
+- example: concrete real-world applications, linked from a sub-idea or adjacent field
+Each node has id, type, a short label and a description of 2-3 meaningful sentences. {style}
+reasoning_trail: 4-6 sentences on why these ideas were chosen, how they connect and how the contradictions arise.
+
+Return only this JSON object, no markdown:
+{{"topic": "{topic}", "core_idea": "...", "graph_nodes": [{{"id": "core", "type": "core", "label": "...", "description": "..."}}, ...], "graph_links": [{{"source": "core", "target": "sub1"}}, ...], "reasoning_trail": "..."}}
+
+Topic: {topic}
+"""
+
+GRAPH_FUSION_PROMPT = """Build a fusion cognitive map of two topics as JSON: their overlapping concepts, tensions between them, how they influence each other, what is unique to each, and how they integrate.
+
+Nodes: 1 "core" node for the synthesis, then {counts}. Types: sub (shared or unique concepts), contradiction (tensions), adjacent (related fields), example (real-world cases).
+Each node has id, type, a short label and a description of 2-3 meaningful sentences. {style}
+reasoning_trail: 4-6 sentences on the fusion, its intersections and relationships.
+
+Return only this JSON object, no markdown:
+{{"topic": "Fusion: {topic_a} & {topic_b}", "core_idea": "...", "graph_nodes": [{{"id": "core", "type": "core", "label": "...", "description": "..."}}, ...], "graph_links": [{{"source": "core", "target": "sub1"}}, ...], "reasoning_trail": "..."}}
+
+Topic A: {topic_a}
+Topic B: {topic_b}
+"""
+
+EXPAND_PROMPT = """Expand one node of a cognitive map about "{topic}".
+
+Node ({node_type}): {label}
+{description}
+Path from the core: {path}
+Already linked to it, do not repeat: {existing}
+
+Give {count} new child nodes that go deeper into this node. Types: sub (component), contradiction (limitation or opposing view), adjacent (related field), example (real-world case). Each has a short label and a description of 2-3 sentences. {style}
+
+Return only this JSON object, no markdown:
+{{"children": [{{"type": "sub", "label": "...", "description": "..."}}, ...]}}
+"""
+
+# Parallel ("fan-out") generation: a short skeleton call, then concurrent section calls
+SKELETON_PROMPT = """Outline a cognitive map of the topic below as JSON: the core idea and its {count} key sub-ideas (components of the core idea), as short labels. {style}
+
+Return only this JSON object, no markdown:
+{{"topic": "{topic}", "core_label": "...", "core_idea": "one sentence", "sub_ideas": ["...", ...]}}
+
+Topic: {topic}
+"""
+
+SECTION_PROMPT = """Cognitive map of "{topic}". Core idea: {core_idea}
+Sub-ideas:
+{outline}
+
+Add {count} {type} nodes: {meaning}. Each has a short label, a description of 2-3 meaningful sentences and the id of the sub-idea it belongs to ("core" if it concerns the whole topic). Do not repeat the sub-ideas. {style}
+
+Return only this JSON object, no markdown:
+{{"section": "{type}", "nodes": [{{"label": "...", "description": "...", "parent": "sub1"}}, ...]}}
+"""
+
+DESCRIBE_PROMPT = """Cognitive map of "{topic}". Core idea: {core_idea}
+Sub-ideas:
+{outline}
+
+Write a description of 2-3 meaningful sentences for each of these nodes: {ids}. {style}{trail}
+
+Return only this JSON object, no markdown:
+{{"descriptions": {{"{first}": "...", ...}}{trail_key}}}
+"""
+
+TRAIL_INSTRUCTION = " Also write a reasoning_trail: 4-6 sentences on why these ideas were chosen, how they connect and how contradictions arise."
+
+SECTION_MEANINGS = {
+    "contradiction": "opposing views or limitations, each attached to the sub-idea it challenges",
+    "adjacent": "related fields or disciplines, attached to the core or to the sub-idea they connect to",
+    "example": "concrete real-world applications, each attached to the sub-idea it illustrates",
+}
+
+# Node counts per section for the fan-out prompts (same ranges as COMPLEXITY_SETTINGS["counts"])
+SECTION_COUNTS = {
+    "beginner": {"sub": "3-5", "contradiction": "2-3", "adjacent": "3-4", "example": "3-4"},
+    "intermediate": {"sub": "5-8", "contradiction": "3-5", "adjacent": "4-6", "example": "4-6"},
+    "expert": {"sub": "8-12", "contradiction": "5-7", "adjacent": "6-8", "example": "6-8"},
+}
+
+# Fusion composed from two existing single-topic maps: the LLM only writes what connects them
+BRIDGE_PROMPT = """Two cognitive maps are being fused into one. Their nodes (id: label):
+
+Topic A: {topic_a}
+{outline_a}
+
+Topic B: {topic_b}
+{outline_b}
+
+Add only what connects them: {counts}. Intersections are concepts the topics share or where they meet; tensions are conflicts between them. Each has a short label, a description of 2-3 meaningful sentences and "links": ids of the nodes above it connects, at least one from each topic. Also give the synthesized core (a short label and one core_idea sentence on how the topics combine) and a reasoning_trail of 4-6 sentences on the intersections and tensions. {style}
+
+Return only this JSON object, no markdown:
+{{"core_label": "...", "core_idea": "...", "bridges": [{{"type": "intersection", "label": "...", "description": "...", "links": ["a.sub1", "b.sub2"]}}, {{"type": "tension", "label": "...", "description": "...", "links": ["a.sub3", "b.con1"]}}, ...], "reasoning_trail": "..."}}
+"""
+
+BRIDGE_COUNTS = {
+    "beginner": {"intersection": "2-3", "tension": "1-2"},
+    "intermediate": {"intersection": "3-4", "tension": "2-3"},
+    "expert": {"intersection": "4-6", "tension": "3-4"},
+}
+
+# Per-complexity instructions for the compact templates, plus midpoint node counts for estimates
+COMPLEXITY_SETTINGS = {
+    "beginner": {
+        "counts": "3-5 sub, 2-3 contradiction, 3-4 adjacent and 3-4 example nodes",
+        "style": "Use simple language.",
+        "nodes": 14
+    },
+    "intermediate": {
+        "counts": "5-8 sub, 3-5 contradiction, 4-6 adjacent and 4-6 example nodes",
+        "style": "Balance breadth and depth.",
+        "nodes": 22
+    },
+    "expert": {
+        "counts": "8-12 sub, 5-7 contradiction, 6-8 adjacent and 6-8 example nodes",
+        "style": "Give deep, nuanced analysis.",
+        "nodes": 32
+    },
+}
+
+# How many children one expansion asks for
+EXPAND_CHILDREN = {"beginner": "3-4", "intermediate": "4-5", "expert": "5-6"}
+
+OUTPUT_MODES = ("full", "graph")
+
+
+def get_output_mode() -> str:
+    """Prompt output mode from PROMPT_OUTPUT_MODE: "graph" (compact, default) or "full"."""
+    mode = os.getenv("PROMPT_OUTPUT_MODE", "graph").lower()
+    return mode if mode in OUTPUT_MODES else "graph"
+
+
+def _settings(complexity: str) -> dict:
+    return COMPLEXITY_SETTINGS.get(complexity, COMPLEXITY_SETTINGS["intermediate"])
+
+
+def _hash(*templates: str) -> str:
+    return hashlib.sha256("".join(templates).encode("utf-8")).hexdigest()[:16]
+
+
+PROMPT_HASHES = {
+    ("map", "full"): _hash(COGNITIVE_MAP_PROMPT),
+    ("fusion", "full"): _hash(FUSION_MAP_PROMPT),
+    ("map", "graph"): _hash(GRAPH_MAP_PROMPT, repr(COMPLEXITY_SETTINGS)),
+    ("fusion", "graph"): _hash(GRAPH_FUSION_PROMPT, repr(COMPLEXITY_SETTINGS)),
+    # Expansion has a single compact template in both output modes
+    ("expand", "full"): _hash(EXPAND_PROMPT, repr(EXPAND_CHILDREN), repr(COMPLEXITY_SETTINGS)),
+    ("expand", "graph"): _hash(EXPAND_PROMPT, repr(EXPAND_CHILDREN), repr(COMPLEXITY_SETTINGS)),
+    # Composed fusions embed two single-topic maps, so they also change with the map prompt
+    ("compose", "full"): _hash(BRIDGE_PROMPT, repr(BRIDGE_COUNTS), COGNITIVE_MAP_PROMPT),
+    ("compose", "graph"): _hash(BRIDGE_PROMPT, repr(BRIDGE_COUNTS), GRAPH_MAP_PROMPT, repr(COMPLEXITY_SETTINGS)),
+}
+
+# Parallel generation produces the same kind of map, so it shares the "map" cache entries;
+# this hash only tags the response metadata
+FANOUT_PROMPT_HASH = _hash(SKELETON_PROMPT, SECTION_PROMPT, DESCRIBE_PROMPT, TRAIL_INSTRUCTION, repr(SECTION_COUNTS))
+
+
+def get_prompt_hash(kind: str = "map", output_mode: Optional[str] = None) -> str:
+    """Return a short hash of the prompt template, used to key cached responses."""
+    return PROMPT_HASHES[(kind, output_mode or get_output_mode())]
+
+
+def get_prompt(topic: str, complexity: str = "intermediate", output_mode: Optional[str] = None) -> str:
     """Generate the prompt for the given topic and complexity."""
+    if (output_mode or get_output_mode()) == "graph":
+        settings = _settings(complexity)
+        return GRAPH_MAP_PROMPT.format(topic=topic, counts=settings["counts"], style=settings["style"])
     return COGNITIVE_MAP_PROMPT.format(topic=topic, complexity=complexity)
 
 
-def get_fusion_prompt(topic_a: str, topic_b: str, complexity: str = "intermediate") -> str:
+def get_fusion_prompt(topic_a: str, topic_b: str, complexity: str = "intermediate", output_mode: Optional[str] = None) -> str:
     """Generate the prompt for fusion map."""
+    if (output_mode or get_output_mode()) == "graph":
+        settings = _settings(complexity)
+        return GRAPH_FUSION_PROMPT.format(topic_a=topic_a, topic_b=topic_b, counts=settings["counts"], style=settings["style"])
     return FUSION_MAP_PROMPT.format(topic_a=topic_a, topic_b=topic_b, complexity=complexity)
 
+
+def get_expand_prompt(topic: str, node: dict, path: List[str], existing: List[str], complexity: str = "intermediate") -> str:
+    """Generate the prompt for expanding one node with new children."""
+    settings = _settings(complexity)
+    return EXPAND_PROMPT.format(
+        topic=topic,
+        node_type=node.get("type", "sub"),
+        label=node.get("label", ""),
+        description=node.get("description") or "",
+        path=" > ".join(path) or node.get("label", ""),
+        existing=", ".join(existing) or "nothing yet",
+        count=EXPAND_CHILDREN.get(complexity, EXPAND_CHILDREN["intermediate"]),
+        style=settings["style"]
+    )
+
+
+def _section_counts(complexity: str) -> dict:
+    return SECTION_COUNTS.get(complexity, SECTION_COUNTS["intermediate"])
+
+
+def _outline(sub_ideas: List[str]) -> str:
+    return "\n".join(f"sub{i}: {label}" for i, label in enumerate(sub_ideas, 1))
+
+
+def get_skeleton_prompt(topic: str, complexity: str = "intermediate") -> str:
+    """Prompt for the first fan-out step: core idea and sub-idea labels only."""
+    return SKELETON_PROMPT.format(topic=topic, count=_section_counts(complexity)["sub"], style=_settings(complexity)["style"])
+
+
+def get_section_prompt(topic: str, core_idea: str, sub_ideas: List[str], node_type: str, complexity: str = "intermediate") -> str:
+    """Prompt for one fan-out section (contradiction, adjacent or example nodes) of a skeleton."""
+    return SECTION_PROMPT.format(
+        topic=topic,
+        core_idea=core_idea,
+        outline=_outline(sub_ideas),
+        count=_section_counts(complexity)[node_type],
+        type=node_type,
+        meaning=SECTION_MEANINGS[node_type],
+        style=_settings(complexity)["style"]
+    )
+
+
+def get_describe_prompt(topic: str, core_idea: str, sub_ideas: List[str], node_ids: List[str],
+                        complexity: str = "intermediate", reasoning_trail: bool = False) -> str:
+    """Prompt for descriptions of some skeleton nodes, optionally with the map's reasoning trail."""
+    return DESCRIBE_PROMPT.format(
+        topic=topic,
+        core_idea=core_idea,
+        outline=_outline(sub_ideas),
+        ids=", ".join(node_ids),
+        first=node_ids[0],
+        style=_settings(complexity)["style"],
+        trail=TRAIL_INSTRUCTION if reasoning_trail else "",
+        trail_key=', "reasoning_trail": "..."' if reasoning_trail else ""
+    )
+
+
+def get_bridge_prompt(topic_a: str, nodes_a: List[dict], topic_b: str, nodes_b: List[dict], complexity: str = "intermediate") -> str:
+    """Prompt for the bridge between two maps; `nodes_a`/`nodes_b` carry namespaced ids (a.sub1, b.core)."""
+    counts = BRIDGE_COUNTS.get(complexity, BRIDGE_COUNTS["intermediate"])
+    return BRIDGE_PROMPT.format(
+        topic_a=topic_a,
+        topic_b=topic_b,
+        outline_a="\n".join(f"{node['id']}: {node['label']}" for node in nodes_a),
+        outline_b="\n".join(f"{node['id']}: {node['label']}" for node in nodes_b),
+        counts=f"{counts['intersection']} intersection and {counts['tension']} tension nodes",
+        style=_settings(complexity)["style"]
+    )
+
+
+def expected_bridge_tokens(complexity: str = "intermediate") -> int:
+    """Rough completion size of a bridge: ~90 tokens per bridge node plus the core and reasoning trail."""
+    counts = BRIDGE_COUNTS.get(complexity, BRIDGE_COUNTS["intermediate"])
+    nodes = sum(int(value.split("-")[-1]) for value in counts.values())
+    return nodes * 90 + 200
+
+
+def expected_section_tokens(kind: str, complexity: str = "intermediate", nodes: int = 0) -> int:
+    """
+    Rough completion size of one fan-out call: ~20 tokens per skeleton label, ~85
+    per section node (label, description, parent) and ~60 per description, plus
+    ~130 for a reasoning trail.
+    """
+    if kind == "skeleton":
+        return int(_section_counts(complexity)["sub"].split("-")[-1]) * 20 + 60
+    if kind == "describe":
+        return nodes * 60 + 20
+    if kind == "trail":
+        return nodes * 60 + 150
+    return int(_section_counts(complexity)[kind].split("-")[-1]) * 85 + 20
+
+
+def expected_expand_tokens(complexity: str = "intermediate") -> int:
+    """Rough completion size for an expansion: ~70 tokens per child plus the wrapper."""
+    most = int(EXPAND_CHILDREN.get(complexity, EXPAND_CHILDREN["intermediate"]).split("-")[-1])
+    return most * 70 + 20
+
+
+def expected_completion_tokens(complexity: str = "intermediate", output_mode: Optional[str] = None) -> int:
+    """
+    Rough completion size for a map: ~75 tokens per node (JSON keys, label and a
+    2-3 sentence description), ~12 per link, ~130 for the reasoning trail, plus
+    ~12 per node for the flat lists in "full" mode.
+    """
+    nodes = _settings(complexity)["nodes"]
+    tokens = nodes * 75 + nodes * 12 + 130
+    if (output_mode or get_output_mode()) == "full":
+        tokens += nodes * 12
+    return tokens
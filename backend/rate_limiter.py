@@ -0,0 +1,288 @@
+import os
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional
+
+from resilience import classify_error
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitExceeded(RuntimeError):
+    """Raised when a provider call cannot be admitted in time. Maps to 503 + Retry-After."""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `rate_per_minute`."""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (0 if available now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        """Take tokens; the balance may go negative to charge for underestimates."""
+        self._refill()
+        self.tokens -= amount
+
+    def refund(self, amount: float) -> None:
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def available(self) -> float:
+        self._refill()
+        return self.tokens
+
+
+class SharedTokenBucket:
+    """
+    TokenBucket whose balance lives in the cross-worker shared state, so every
+    worker draws from one provider budget instead of each having its own.
+    The shared state is called on the event loop; when it is busy or down the
+    bucket fails open (admits) rather than stall or fail the request.
+    """
+
+    def __init__(self, state, name: str, rate_per_minute: float, capacity: Optional[float] = None):
+        self.state = state
+        self.name = name
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+
+    def _balance(self, delta: float = 0.0) -> float:
+        try:
+            return self.state.bucket(self.name, self.rate, self.capacity, delta)
+        except Exception as e:
+            logger.warning(f"Shared {self.name} budget unavailable, admitting: {str(e)}")
+            return self.capacity
+
+    @property
+    def tokens(self) -> float:
+        return self._balance()
+
+    def wait_time(self, amount: float) -> float:
+        tokens = self.tokens
+        amount = min(amount, self.capacity)
+        if tokens >= amount:
+            return 0.0
+        return (amount - tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        self._balance(-amount)
+
+    def refund(self, amount: float) -> None:
+        self._balance(amount)
+
+    def available(self) -> float:
+        return self.tokens
+
+
+class AdaptiveConcurrencyLimit:
+    """
+    AIMD concurrency cap: grows by roughly one slot per window of healthy calls
+    and shrinks multiplicatively on throttling, provider errors or latency spikes.
+    """
+
+    def __init__(self, initial: int = 8, minimum: int = 1, maximum: int = 32,
+                 latency_target: float = 20.0, backoff: float = 0.7):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.limit = float(max(minimum, min(initial, maximum)))
+
+    def on_success(self, latency: float) -> None:
+        if latency > self.latency_target:
+            self._decrease()
+        else:
+            self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+
+    def on_throttle(self) -> None:
+        self._decrease()
+
+    def _decrease(self) -> None:
+        self.limit = max(self.minimum, self.limit * self.backoff)
+
+    @property
+    def slots(self) -> int:
+        return int(self.limit)
+
+
+class ProviderLimiter:
+    """
+    Admission control in front of one LLM provider.
+    Combines request and token buckets with an adaptive concurrency cap.
+    Callers queue for a bounded time; when the queue is full or the wait
+    times out they are rejected with RateLimitExceeded.
+    """
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0,
+                 concurrency: Optional[AdaptiveConcurrencyLimit] = None,
+                 max_queue: int = 100, queue_timeout: float = 10.0, shared_state=None):
+        self.request_bucket = self._bucket("rpm", requests_per_minute, shared_state)
+        self.token_bucket = self._bucket("tpm", tokens_per_minute, shared_state)
+        self.concurrency = concurrency or AdaptiveConcurrencyLimit()
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.throttled = 0
+        self._changed = asyncio.Event()
+
+    @staticmethod
+    def _bucket(name: str, rate_per_minute: float, shared_state=None):
+        if rate_per_minute <= 0:
+            return None
+        if shared_state is not None:
+            return SharedTokenBucket(shared_state, name, rate_per_minute)
+        return TokenBucket(rate_per_minute)
+
+    def _admission_wait(self, tokens: float) -> float:
+        """Seconds to wait before this call may start (0 means go now)."""
+        if self.in_flight >= self.concurrency.slots:
+            return float("inf")
+        wait = 0.0
+        if self.request_bucket is not None:
+            wait = max(wait, self.request_bucket.wait_time(1))
+        if self.token_bucket is not None:
+            wait = max(wait, self.token_bucket.wait_time(tokens))
+        return wait
+
+    def retry_after(self) -> float:
+        """A best-effort hint for clients on when to come back."""
+        hint = 1.0
+        if self.request_bucket is not None:
+            hint = max(hint, self.request_bucket.wait_time(1))
+        return hint
+
+    async def _wait_for_admission(self, tokens: float) -> None:
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise RateLimitExceeded("LLM provider queue is full, please retry shortly", self.retry_after())
+
+        deadline = time.monotonic() + self.queue_timeout
+        self.waiting += 1
+        try:
+            while True:
+                wait = self._admission_wait(tokens)
+                if wait == 0:
+                    return
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or (wait != float("inf") and wait > remaining):
+                    self.rejected += 1
+                    raise RateLimitExceeded("Timed out waiting for LLM provider capacity", min(wait, 60.0) if wait != float("inf") else self.retry_after())
+                self._changed.clear()
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=min(wait, remaining))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.waiting -= 1
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens: float = 0):
+        """
+        Hold a provider slot for one call. Yields a dict the caller may update with
+        `tokens` (actual usage) and `throttled` (the provider returned 429).
+        Only a call that completes grows the concurrency limit; 5xx, timeouts and
+        connection errors shrink it, any other failure leaves it unchanged.
+        """
+        await self._wait_for_admission(estimated_tokens)
+        if self.request_bucket is not None:
+            self.request_bucket.consume(1)
+        if self.token_bucket is not None:
+            self.token_bucket.consume(estimated_tokens)
+        self.in_flight += 1
+        self.admitted += 1
+        outcome = {"tokens": None, "throttled": False}
+        started = time.monotonic()
+        failure = None
+        try:
+            yield outcome
+        except BaseException as e:
+            failure = e
+            raise
+        finally:
+            self.in_flight -= 1
+            if outcome["throttled"]:
+                self.throttled += 1
+                self.concurrency.on_throttle()
+                logger.warning(f"Provider throttled; concurrency limit now {self.concurrency.slots}")
+            elif failure is None:
+                self.concurrency.on_success(time.monotonic() - started)
+            elif classify_error(failure) in ("server", "timeout", "connection"):
+                self.concurrency.on_throttle()
+                logger.warning(f"Provider failing ({type(failure).__name__}); concurrency limit now {self.concurrency.slots}")
+            if self.token_bucket is not None and outcome["tokens"] is not None:
+                # Settle the estimate against actual usage
+                difference = estimated_tokens - outcome["tokens"]
+                if difference > 0:
+                    self.token_bucket.refund(difference)
+                else:
+                    self.token_bucket.consume(-difference)
+            self._changed.set()
+
+    def headroom(self) -> float:
+        """
+        Fraction of provider capacity idle right now: the smaller of free concurrency
+        slots and bucket balances, 0 while any call is queued. Background work uses
+        it to run only when interactive traffic leaves room.
+        """
+        if self.waiting:
+            return 0.0
+        free = 1 - self.in_flight / max(1, self.concurrency.slots)
+        for bucket in (self.request_bucket, self.token_bucket):
+            if bucket is not None:
+                free = min(free, bucket.available() / bucket.capacity)
+        return max(0.0, free)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency_limit": self.concurrency.slots,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "throttled": self.throttled
+        }
+
+    @classmethod
+    def from_env(cls, shared_state=None) -> "ProviderLimiter":
+        """
+        Build from LLM_* settings. With `shared_state` the RPM/TPM budgets are shared
+        by all workers; the concurrency cap stays per worker.
+        """
+        return cls(
+            requests_per_minute=float(os.getenv("LLM_RPM", "0")),
+            tokens_per_minute=float(os.getenv("LLM_TPM", "0")),
+            concurrency=AdaptiveConcurrencyLimit(
+                initial=int(os.getenv("LLM_INITIAL_CONCURRENCY", "8")),
+                minimum=int(os.getenv("LLM_MIN_CONCURRENCY", "1")),
+                maximum=int(os.getenv("LLM_MAX_CONCURRENCY", "32")),
+                latency_target=float(os.getenv("LLM_LATENCY_TARGET", "20"))
+            ),
+            max_queue=int(os.getenv("LLM_QUEUE_SIZE", "100")),
+            queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT", "10")),
+            shared_state=shared_state
+        )
@@ -0,0 +1,153 @@
+import os
+import time
+import asyncio
+import logging
+import importlib
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Slow imports kept out of `import main` and loaded by the warm-up instead
+# (or before forking, under gunicorn with preload_app)
+HEAVY_MODULES = ("openai", "numpy", "layout")
+
+
+def preload_modules() -> float:
+    """Import HEAVY_MODULES; returns how many seconds it took."""
+    started = time.perf_counter()
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.warning(f"Could not preload {name}: {str(e)}")
+    return time.perf_counter() - started
+
+
+class Readiness:
+    """
+    Background warm-up after startup and the verdict behind /readyz. The app
+    answers /livez as soon as it is serving; it is ready once the warm-up has
+    imported the heavy modules, opened provider connections and the caches, for
+    as long as a provider endpoint is reachable and the limiter queue has room,
+    and until shutdown starts.
+    """
+
+    def __init__(self, probe_interval: float = 30, probe_timeout: float = 2, max_queue_fraction: float = 0.8):
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.max_queue_fraction = max_queue_fraction
+        self.started = time.monotonic()
+        self.warm_seconds: Optional[float] = None
+        self.draining = False
+        self._task: Optional[asyncio.Task] = None
+        self._probe_lock = asyncio.Lock()
+
+    def start(self) -> None:
+        self.started = time.monotonic()
+        self._task = asyncio.ensure_future(self.warm_up())
+
+    async def stop(self) -> None:
+        """Report not ready from now on so load balancers stop routing here."""
+        self.draining = True
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    @staticmethod
+    def _prepare() -> float:
+        """Imports and SDK client construction (TLS contexts, pools); returns the import seconds."""
+        from llm_client import get_llm_client
+        imports = preload_modules()
+        client = get_llm_client()
+        if client.api_key:
+            for endpoint in client.pool.endpoints:
+                endpoint.client
+        return imports
+
+    async def warm_up(self) -> None:
+        from llm_client import get_llm_client
+        imports = 0.0
+        try:
+            client = get_llm_client()
+            # Off the event loop, so /livez and early requests are still answered
+            imports = await asyncio.to_thread(self._prepare)
+            if client.api_key:
+                warm = await client.warm_up()
+                logger.info(f"Warmed {warm}/{len(client.pool.endpoints)} LLM endpoint connections")
+            else:
+                logger.warning("LLM_API_KEY not set - API calls will fail until .env is configured")
+        except Exception as e:
+            logger.warning(f"Could not warm LLM connections: {str(e)}")
+        try:
+            await asyncio.to_thread(self._open_stores)
+        except Exception as e:
+            logger.warning(f"Could not open caches: {str(e)}")
+        self.warm_seconds = time.monotonic() - self.started
+        logger.info(f"Warm-up finished in {self.warm_seconds:.2f}s ({imports:.2f}s of imports)")
+
+    @staticmethod
+    def _open_stores() -> None:
+        from cache import get_response_cache
+        from semantic_cache import get_semantic_cache
+        from map_store import get_map_store
+        get_response_cache()
+        get_semantic_cache()
+        get_map_store()
+
+    async def _provider_reachable(self) -> bool:
+        """
+        Whether a provider endpoint answered within the last `probe_interval`,
+        from real traffic or, failing that, from a models.list probe.
+        """
+        from llm_client import get_llm_client
+        client = get_llm_client()
+        if not client.api_key:
+            return False
+
+        def recent() -> bool:
+            now = time.monotonic()
+            return any(e.last_ok is not None and now - e.last_ok < self.probe_interval for e in client.pool.endpoints)
+
+        if recent():
+            return True
+        # Concurrent readiness checks share one probe
+        async with self._probe_lock:
+            if recent():
+                return True
+            try:
+                await asyncio.wait_for(client.warm_up(), self.probe_timeout)
+            except asyncio.TimeoutError:
+                pass
+            return recent()
+
+    async def check(self) -> Dict[str, Any]:
+        from llm_client import get_llm_client
+        limiter = get_llm_client().limiter
+        warm = self.warm_seconds is not None
+        checks = {
+            "warm": warm,
+            "provider": warm and not self.draining and await self._provider_reachable(),
+            "limiter": limiter.waiting < limiter.max_queue * self.max_queue_fraction,
+            "draining": self.draining
+        }
+        return {
+            "ready": checks["warm"] and checks["provider"] and checks["limiter"] and not self.draining,
+            "checks": checks,
+            "warm_seconds": round(self.warm_seconds, 3) if warm else None,
+            "limiter": {**limiter.stats(), "max_queue": limiter.max_queue, "headroom": round(limiter.headroom(), 3)}
+        }
+
+
+# Global instance - will be initialized lazily
+readiness = None
+
+def get_readiness() -> Readiness:
+    """Get or create the global readiness state (started by the app's lifespan hook)."""
+    global readiness
+    if readiness is None:
+        readiness = Readiness(
+            probe_interval=float(os.getenv("READY_PROBE_INTERVAL", "30")),
+            probe_timeout=float(os.getenv("READY_PROBE_TIMEOUT", "2")),
+            max_queue_fraction=float(os.getenv("READY_MAX_QUEUE_FRACTION", "0.8"))
+        )
+    return readiness
@@ -0,0 +1,111 @@
+import os
+import json
+import random
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional
+
+
+def classify_error(error: BaseException) -> Optional[str]:
+    """
+    Classify a provider call failure as retryable ("rate_limit", "server", "timeout",
+    "connection", "parse") or not (None). Model-not-found is reported as "model"
+    so callers can move on to the next model in the fallback chain.
+    """
+    # Imported here so startup does not pay for the SDK; provider errors mean it is loaded
+    import httpx
+    from openai import APIConnectionError, APIStatusError, APITimeoutError, RateLimitError
+
+    if isinstance(error, RateLimitError):
+        return "rate_limit"
+    if isinstance(error, APITimeoutError) or isinstance(error, (asyncio.TimeoutError, httpx.TimeoutException)):
+        return "timeout"
+    if isinstance(error, APIConnectionError):
+        return "connection"
+    if isinstance(error, APIStatusError):
+        if error.status_code >= 500:
+            return "server"
+        if error.status_code == 404:
+            return "model"
+        return None
+    if isinstance(error, json.JSONDecodeError):
+        return "parse"
+    return None
+
+
+def is_rate_limit(error: BaseException) -> bool:
+    """Whether a provider call failed with a 429."""
+    return classify_error(error) == "rate_limit"
+
+
+class RetryPolicy:
+    """Bounded retries with exponential backoff and full jitter."""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before retry number `attempt + 1` (attempt counts from 0)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        return cls(
+            max_attempts=int(os.getenv("LLM_MAX_RETRIES", "2")) + 1,
+            base_delay=float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5")),
+            max_delay=float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+        )
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies, used to pick the hedging delay."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def record(self, latency: float) -> None:
+        self.samples.append(latency)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+        return ordered[index]
+
+
+async def hedged(call: Callable[[], Awaitable[Any]], delay: Optional[float]):
+    """
+    Run `call`; if it has not finished after `delay` seconds, start a second copy
+    and return the first one that succeeds. The loser is cancelled.
+    Returns (result, hedged) where `hedged` says whether a second request was fired.
+    """
+    first = asyncio.ensure_future(call())
+    if delay is None:
+        return await first, False
+
+    pending = {first}
+    try:
+        done, pending = await asyncio.wait(pending, timeout=delay)
+        if done and not first.cancelled():
+            return first.result(), False
+
+        # A copy cancelled from outside (e.g. a closed client session) is not an
+        # answer; keep waiting on whatever copy is still running
+        pending.add(asyncio.ensure_future(call()))
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.cancelled():
+                    continue
+                if task.exception() is None:
+                    return task.result(), True
+                error = task.exception()
+        raise error or asyncio.CancelledError()
+    finally:
+        for task in pending:
+            task.cancel()
@@ -1,20 +1,108 @@
-from fastapi import APIRouter, HTTPException, Response
+from fastapi import APIRouter, HTTPException, Response, Query, Request
 from fastapi.responses import StreamingResponse
-from schemas import TopicRequest, CognitiveMapResponse, FusionRequest
-from prompt import get_prompt, get_fusion_prompt
-from llm_client import get_llm_client
+from schemas import (
+    TopicRequest, CognitiveMapResponse, FusionRequest, BatchRequest, MapSearchResponse,
+    ExpandRequest, GraphExpandRequest, ExpandResponse, TopicJobRequest, FusionJobRequest, GraphNode,
+    CompactMapResponse, CompactDeltaResponse
+)
+from prompt import get_prompt
+from llm_client import get_llm_client, parse_json_content
+from json_stream import IncrementalArrayParser
+from graph_normalizer import get_graph_normalizer
+from rate_limiter import RateLimitExceeded
+from usage import get_usage_accountant, current_client, QuotaExceeded, is_admin
+from cache import get_response_cache
+from semantic_cache import get_semantic_cache
+from warmer import get_cache_warmer
+from map_service import (
+    build_topic_map, build_fusion_map, topic_cache_key, semantic_cached, remember_topic, save_map, token_budget, with_layout, expand_node, expand_stored_map,
+    track_request
+)
+from map_store import get_map_store, VersionConflict
+from batch import run_batch, get_batch_registry
+from jobs import get_job_queue, JobQueueFull, TERMINAL
+from metrics import registry, CACHE_LOOKUPS, timed, metrics_enabled
+from fastjson import FastJSONResponse, dumps, dumps_bytes, loads
+from wire import compact_map, compact_delta, compress
+from exporter import get_exporter, positioned_dump, MEDIA_TYPES
 import logging
 import json
+import math
+import os
+import asyncio
+import re
+import time
+from typing import Optional, Union, Literal
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
+def _component_metrics():
+    """Scrape-time gauges and counters from components that keep their own stats."""
+    cache = get_response_cache().stats()
+    semantic = get_semantic_cache().stats() if get_semantic_cache() is not None else {"entries": 0}
+    llm = get_llm_client().stats()
+    limiter = llm["limiter"]
+    export = get_exporter().stats()
+    jobs = get_job_queue().stats()
+    warmer = get_cache_warmer().stats() if get_cache_warmer() is not None else {"queued": 0, "refreshed": 0, "failed": 0}
+    usage = get_usage_accountant().stats() if get_usage_accountant() is not None else {"rejections": 0, "flushes": 0}
+    return [
+        ("mindmesh_cache_entries", "gauge", "Entries in the memory cache", cache["entries"]),
+        ("mindmesh_cache_bytes", "gauge", "Bytes held by the memory cache", cache["bytes"]),
+        ("mindmesh_cache_evictions_total", "counter", "Memory cache evictions", cache["evictions"]),
+        ("mindmesh_cache_disk_hits_total", "counter", "Cache hits served by the SQLite tier", cache["disk_hits"]),
+        ("mindmesh_semantic_cache_entries", "gauge", "Topics in the semantic cache index", semantic["entries"]),
+        ("mindmesh_llm_in_flight", "gauge", "Provider calls currently running", limiter["in_flight"]),
+        ("mindmesh_llm_waiting", "gauge", "Provider calls queued for a limiter slot", limiter["waiting"]),
+        ("mindmesh_llm_concurrency_limit", "gauge", "Current adaptive concurrency limit", limiter["concurrency_limit"]),
+        ("mindmesh_llm_rejected_total", "counter", "Calls the limiter turned away with 503", limiter["rejected"]),
+        ("mindmesh_llm_throttled_total", "counter", "Provider 429 responses", limiter["throttled"]),
+        ("mindmesh_export_pending", "gauge", "Exports queued or rendering in the worker pool", export["pending"]),
+        ("mindmesh_export_renders_total", "counter", "Exports rendered by the worker pool", export["renders"]),
+        ("mindmesh_export_cache_hits_total", "counter", "Exports served from the rendered file cache", export["cache_hits"]),
+        ("mindmesh_jobs_queued", "gauge", "Background jobs waiting for a worker", jobs["queued"]),
+        ("mindmesh_jobs_running", "gauge", "Background jobs currently generating", jobs["running"]),
+        ("mindmesh_jobs_failed_total", "counter", "Background jobs that finished with an error", jobs["failed"]),
+        ("mindmesh_warmer_queue_depth", "gauge", "Popular maps waiting to be regenerated by the cache warmer", warmer["queued"]),
+        ("mindmesh_warmer_refreshes_total", "counter", "Maps regenerated into the cache by the warmer", warmer["refreshed"]),
+        ("mindmesh_warmer_failures_total", "counter", "Cache warmer regenerations that failed", warmer["failed"]),
+        ("mindmesh_quota_rejections_total", "counter", "Provider calls refused because the client was over quota", usage["rejections"]),
+        ("mindmesh_usage_flushes_total", "counter", "Usage counter batches written to SQLite", usage["flushes"]),
+    ]
+
+
+registry.add_collector(_component_metrics)
+
+EXPORT_CHUNK_SIZE = 64 * 1024
+JOB_MAX_WAIT = 60
+JOB_KEEPALIVE = 15
+
+
+def _overloaded(e: RateLimitExceeded) -> HTTPException:
+    """
+    503 with a Retry-After header for requests the provider limiter turned away,
+    429 for clients over their usage quota.
+    """
+    return HTTPException(
+        status_code=429 if isinstance(e, QuotaExceeded) else 503,
+        detail=str(e),
+        headers={"Retry-After": str(math.ceil(e.retry_after))}
+    )
+
+
+def _sse(event: str, data: dict) -> str:
+    """Format a server-sent event."""
+    return f"event: {event}\ndata: {dumps(data)}\n\n"
+
+
 @router.post("/generate-map", response_model=CognitiveMapResponse)
 async def generate_map(request: TopicRequest):
     """
     Generate a cognitive map for the given topic.
+    With layout=true every graph node also gets precomputed x/y positions.
     """
     try:
         if not request.topic or not request.topic.strip():
@@ -22,127 +110,17 @@ async def generate_map(request: TopicRequest):
         
         topic = request.topic.strip()
         complexity = request.complexity or "intermediate"
-        logger.info(f"Generating cognitive map for topic: {topic} (complexity: {complexity})")
-        
-        # Generate prompt
-        prompt = get_prompt(topic, complexity)
         
-        # Call LLM
-        llm_client = get_llm_client()
-        response_data = await llm_client.generate_cognitive_map(prompt)
-        
-        logger.info(f"LLM response keys: {list(response_data.keys())}")
-        logger.info(f"Has graph_nodes: {'graph_nodes' in response_data}")
-        logger.info(f"Has graph_links: {'graph_links' in response_data}")
-        
-        # Ensure graph_nodes exists and is valid
-        if 'graph_nodes' not in response_data or not response_data.get('graph_nodes'):
-            logger.warning("No graph_nodes in response, generating from lists")
-            # Generate nodes from the lists
-            nodes = []
-            links = []
-            
-            # Core node
-            nodes.append({
-                'id': 'core',
-                'type': 'core',
-                'label': response_data.get('core_idea', topic)[:50] if isinstance(response_data.get('core_idea'), str) else topic,
-                'description': response_data.get('core_idea', f"The core concept of {topic}")
-            })
-            
-            # Sub-ideas
-            for i, sub_idea in enumerate(response_data.get('sub_ideas', [])[:10]):
-                node_id = f'sub_{i+1}'
-                nodes.append({
-                    'id': node_id,
-                    'type': 'sub',
-                    'label': sub_idea[:50] if isinstance(sub_idea, str) else f"Sub-idea {i+1}",
-                    'description': sub_idea if isinstance(sub_idea, str) else f"A sub-concept of {topic}"
-                })
-                links.append({'source': 'core', 'target': node_id})
-            
-            # Contradictions
-            for i, contradiction in enumerate(response_data.get('contradictions', [])[:8]):
-                node_id = f'contradiction_{i+1}'
-                nodes.append({
-                    'id': node_id,
-                    'type': 'contradiction',
-                    'label': contradiction[:50] if isinstance(contradiction, str) else f"Contradiction {i+1}",
-                    'description': contradiction if isinstance(contradiction, str) else f"A contradiction related to {topic}"
-                })
-                # Link to first sub-idea if available
-                if len(nodes) > 1:
-                    links.append({'source': 'sub_1', 'target': node_id})
-                else:
-                    links.append({'source': 'core', 'target': node_id})
-            
-            # Adjacent fields
-            for i, adjacent in enumerate(response_data.get('adjacent_fields', [])[:8]):
-                node_id = f'adjacent_{i+1}'
-                nodes.append({
-                    'id': node_id,
-                    'type': 'adjacent',
-                    'label': adjacent[:50] if isinstance(adjacent, str) else f"Adjacent field {i+1}",
-                    'description': adjacent if isinstance(adjacent, str) else f"An adjacent field related to {topic}"
-                })
-                links.append({'source': 'core', 'target': node_id})
-            
-            # Examples
-            for i, example in enumerate(response_data.get('real_world_examples', [])[:8]):
-                node_id = f'example_{i+1}'
-                nodes.append({
-                    'id': node_id,
-                    'type': 'example',
-                    'label': example[:50] if isinstance(example, str) else f"Example {i+1}",
-                    'description': example if isinstance(example, str) else f"A real-world example of {topic}"
-                })
-                # Link to first sub-idea if available
-                if len(nodes) > 1:
-                    links.append({'source': 'sub_1', 'target': node_id})
-                else:
-                    links.append({'source': 'core', 'target': node_id})
-            
-            response_data['graph_nodes'] = nodes
-            response_data['graph_links'] = links
-            logger.info(f"Generated {len(nodes)} nodes and {len(links)} links")
-        
-        # Ensure all nodes have descriptions
-        if 'graph_nodes' in response_data and response_data['graph_nodes']:
-            for node in response_data['graph_nodes']:
-                if 'description' not in node or not node.get('description'):
-                    node['description'] = f"This {node.get('type', 'node')} represents: {node.get('label', '')}"
-                # Ensure required fields
-                if 'id' not in node:
-                    node['id'] = f"node_{response_data['graph_nodes'].index(node)}"
-                if 'type' not in node:
-                    node['type'] = 'sub'
-                if 'label' not in node:
-                    node['label'] = 'Unnamed Node'
-        
-        # Ensure graph_links exists
-        if 'graph_links' not in response_data or not response_data.get('graph_links'):
-            logger.warning("No graph_links in response, generating minimal links")
-            response_data['graph_links'] = []
-            # Create links from core to first few nodes
-            if response_data.get('graph_nodes'):
-                for i, node in enumerate(response_data['graph_nodes'][1:6]):  # Link first 5 nodes to core
-                    response_data['graph_links'].append({
-                        'source': response_data['graph_nodes'][0]['id'],
-                        'target': node['id']
-                    })
-        
-        # Ensure reasoning_trail exists
-        if 'reasoning_trail' not in response_data or not response_data.get('reasoning_trail'):
-            response_data['reasoning_trail'] = "This cognitive map explores the relationships and connections within the topic, showing how different concepts relate to each other."
-        
-        logger.info(f"Final response: {len(response_data.get('graph_nodes', []))} nodes, {len(response_data.get('graph_links', []))} links")
-        
-        # Validate and return
-        return CognitiveMapResponse(**response_data)
+        result = await build_topic_map(topic, complexity, bool(request.bypass_cache), request.generation)
+        # Already validated; skip response_model re-validation and the stdlib encoder
+        return FastJSONResponse(await with_layout(result) if request.layout else result)
         
     except HTTPException:
         # Re-raise HTTP exceptions as-is
         raise
+    except RateLimitExceeded as e:
+        logger.warning(f"Rate limited: {str(e)}")
+        raise _overloaded(e)
     except ValueError as e:
         logger.error(f"Validation error: {str(e)}")
         raise HTTPException(status_code=422, detail=str(e))
@@ -154,10 +132,234 @@ async def generate_map(request: TopicRequest):
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
 
+@router.post("/generate-map/stream")
+async def generate_map_stream(request: TopicRequest):
+    """
+    Stream a cognitive map as server-sent events.
+    Emits a `node` or `link` event for each graph element as soon as the LLM has
+    finished writing it, then a final `result` event with the validated map.
+    With layout=true the `result` map carries x/y positions (as do the node
+    events of a cached map, which are all known up front).
+    """
+    if not request.topic or not request.topic.strip():
+        raise HTTPException(status_code=400, detail="Topic cannot be empty")
+    
+    topic = request.topic.strip()
+    complexity = request.complexity or "intermediate"
+    track_request(topic, complexity)
+    llm_client = get_llm_client()
+    cache = get_response_cache()
+    cache_key = topic_cache_key(topic, complexity, llm_client.model)
+    cached = None if request.bypass_cache else cache.get(cache_key)
+    CACHE_LOOKUPS.inc(kind="map", result="bypass" if request.bypass_cache else ("miss" if cached is None else "hit"))
+    if cached is None and not request.bypass_cache:
+        cached = semantic_cached(cache, topic, complexity, llm_client.model)
+    
+    async def events():
+        if cached is not None:
+            logger.info(f"Cache hit for streamed topic: {topic} (complexity: {complexity})")
+            data = await with_layout(CognitiveMapResponse.model_validate(cached)) if request.layout else cached
+            for node in data['graph_nodes']:
+                yield _sse("node", node)
+            for link in data['graph_links']:
+                yield _sse("link", link)
+            yield _sse("result", data)
+            return
+        
+        logger.info(f"Streaming cognitive map for topic: {topic} (complexity: {complexity})")
+        parser = IncrementalArrayParser()
+        try:
+            with timed("prompt_build"):
+                prompt = get_prompt(topic, complexity)
+                budget = token_budget(prompt, complexity)
+            async for delta in llm_client.stream_cognitive_map(prompt, budget["completion_estimate"]):
+                for key, element in parser.feed(delta):
+                    yield _sse("node" if key == "graph_nodes" else "link", element)
+            
+            with timed("parse"):
+                response_data = parse_json_content(parser.buffer)
+            response_data['metadata'] = {'model': llm_client.model, 'tokens': budget}
+            with timed("normalize"):
+                get_graph_normalizer().normalize(response_data, topic)
+            with timed("validate"):
+                result = CognitiveMapResponse.model_validate(response_data)
+            await save_map(result, complexity, "map")
+            cache.set(cache_key, result.model_dump())
+            remember_topic(topic, complexity, llm_client.model, cache_key)
+            yield _sse("result", await with_layout(result) if request.layout else result.model_dump())
+        except RateLimitExceeded as e:
+            logger.warning(f"Rate limited: {str(e)}")
+            yield _sse("error", {"detail": str(e), "retry_after": math.ceil(e.retry_after)})
+        except json.JSONDecodeError as e:
+            logger.error(f"Validation error: {str(e)}")
+            yield _sse("error", {"detail": f"Failed to parse LLM response as JSON: {str(e)}"})
+        except Exception as e:
+            logger.error(f"Streaming error: {str(e)}")
+            yield _sse("error", {"detail": f"Failed to generate cognitive map: {str(e)}"})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/generate-map/batch")
+async def generate_map_batch(request: BatchRequest):
+    """
+    Generate cognitive maps for many topics concurrently.
+    In stream mode results come back as NDJSON, one line per topic in completion order.
+    In job mode (the default for large batches) a job id is returned for polling.
+    Per-topic failures are reported inline and never abort the batch.
+    """
+    max_items = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+    if not request.items:
+        raise HTTPException(status_code=400, detail="Batch must contain at least one topic")
+    if len(request.items) > max_items:
+        raise HTTPException(status_code=400, detail=f"Batch cannot contain more than {max_items} topics")
+    
+    parallelism = max(1, min(
+        request.parallelism or int(os.getenv("BATCH_PARALLELISM", "8")),
+        int(os.getenv("BATCH_MAX_PARALLELISM", "32"))
+    ))
+    mode = request.mode or "auto"
+    if mode == "auto":
+        mode = "job" if len(request.items) > int(os.getenv("BATCH_JOB_THRESHOLD", "50")) else "stream"
+    logger.info(f"Batch of {len(request.items)} topics (mode: {mode}, parallelism: {parallelism})")
+    
+    if mode == "job":
+        job = await get_batch_registry().submit(request.items, parallelism)
+        return {"job_id": job.id, "status": job.status, "total": job.total}
+    
+    async def lines():
+        async for result in run_batch(request.items, parallelism):
+            yield dumps(result) + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.get("/generate-map/batch/{job_id}")
+async def get_batch_job(job_id: str, offset: int = 0):
+    """
+    Poll a batch job. Pass `offset` to receive only results after the ones already seen.
+    """
+    snapshot = await asyncio.to_thread(get_batch_registry().snapshot, job_id, max(0, offset))
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return snapshot
+
+
+def _client_id(request: Request) -> str:
+    """
+    Who a job belongs to for fairness and usage accounting: the client set by
+    UsageMiddleware (an API key fingerprint, else X-Client-Id), else the caller's address.
+    """
+    return current_client.get() or request.headers.get("x-client-id") or (request.client.host if request.client else None) or "anonymous"
+
+
+@router.post("/jobs", status_code=202)
+async def submit_job(body: Union[FusionJobRequest, TopicJobRequest], request: Request):
+    """
+    Queue a map (`topic`) or fusion (`topic_a`/`topic_b`) generation to run in the
+    background. Poll GET /jobs/{job_id} or follow GET /jobs/{job_id}/events.
+    """
+    if isinstance(body, FusionJobRequest):
+        kind = "fusion"
+        if not body.topic_a.strip() or not body.topic_b.strip():
+            raise HTTPException(status_code=400, detail="Both topics cannot be empty")
+    else:
+        kind = "map"
+        if not body.topic.strip():
+            raise HTTPException(status_code=400, detail="Topic cannot be empty")
+    try:
+        job = await get_job_queue().submit(
+            kind, body.model_dump(exclude={"priority"}), _client_id(request), body.priority or "normal"
+        )
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    logger.info(f"Queued {kind} job {job.id} (priority: {body.priority})")
+    return job.snapshot()
+
+
+async def _find_job(job_id: str):
+    job = await get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = Query(0, ge=0)):
+    """
+    Job status, plus the result once completed. With `wait`, long-poll: hold the
+    request up to that many seconds (max 60) until the job finishes.
+    """
+    queue = get_job_queue()
+    job = await _find_job(job_id)
+    deadline = time.monotonic() + min(wait, JOB_MAX_WAIT)
+    while job.status not in TERMINAL and time.monotonic() < deadline:
+        job = await queue.wait(job, job.status, deadline - time.monotonic())
+    return FastJSONResponse(job.snapshot())
+
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Server-sent events for a job: `status` on every change, then a final `result`,
+    `error` or `cancelled` event.
+    """
+    queue = get_job_queue()
+    job = await _find_job(job_id)
+
+    async def events():
+        nonlocal job
+        status = None
+        while True:
+            if job.status != status:
+                status = job.status
+                yield _sse("status", {"job_id": job.id, "status": status})
+            if status in TERMINAL:
+                break
+            job = await queue.wait(job, status, JOB_KEEPALIVE)
+            if job.status == status:
+                yield ": keepalive\n\n"
+        if status == "completed":
+            yield _sse("result", job.result)
+        elif status == "failed":
+            yield _sse("error", {"detail": job.error, "status_code": job.status_code})
+        else:
+            yield _sse("cancelled", {"job_id": job.id})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job. Finished jobs are returned unchanged."""
+    queue = get_job_queue()
+    try:
+        job = await queue.cancel(job_id)
+    except LookupError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status == "running":
+        # Give the cancelled generation a moment to unwind so the reply shows the final status
+        job = await queue.wait(job, "running", 1.0)
+    return job.snapshot()
+
+
 @router.post("/fusion-map", response_model=CognitiveMapResponse)
 async def generate_fusion_map(request: FusionRequest):
     """
     Generate a fusion cognitive map for two topics.
+    With layout=true every graph node also gets precomputed x/y positions.
     """
     try:
         if not request.topic_a or not request.topic_a.strip():
@@ -168,104 +370,15 @@ async def generate_fusion_map(request: FusionRequest):
         topic_a = request.topic_a.strip()
         topic_b = request.topic_b.strip()
         complexity = request.complexity or "intermediate"
-        logger.info(f"Generating fusion map for topics: {topic_a} & {topic_b} (complexity: {complexity})")
-        
-        # Generate prompt
-        prompt = get_fusion_prompt(topic_a, topic_b, complexity)
-        
-        # Call LLM
-        llm_client = get_llm_client()
-        response_data = await llm_client.generate_cognitive_map(prompt)
-        
-        logger.info(f"Fusion LLM response keys: {list(response_data.keys())}")
-        
-        # Ensure graph_nodes exists and is valid (same logic as generate_map)
-        if 'graph_nodes' not in response_data or not response_data.get('graph_nodes'):
-            logger.warning("No graph_nodes in fusion response, generating from lists")
-            nodes = []
-            links = []
-            
-            nodes.append({
-                'id': 'core',
-                'type': 'core',
-                'label': response_data.get('core_idea', f"{topic_a} & {topic_b}")[:50],
-                'description': response_data.get('core_idea', f"Fusion of {topic_a} and {topic_b}")
-            })
-            
-            for i, sub_idea in enumerate(response_data.get('sub_ideas', [])[:10]):
-                node_id = f'sub_{i+1}'
-                nodes.append({
-                    'id': node_id,
-                    'type': 'sub',
-                    'label': sub_idea[:50] if isinstance(sub_idea, str) else f"Sub-idea {i+1}",
-                    'description': sub_idea if isinstance(sub_idea, str) else f"A sub-concept"
-                })
-                links.append({'source': 'core', 'target': node_id})
-            
-            for i, contradiction in enumerate(response_data.get('contradictions', [])[:8]):
-                node_id = f'contradiction_{i+1}'
-                nodes.append({
-                    'id': node_id,
-                    'type': 'contradiction',
-                    'label': contradiction[:50] if isinstance(contradiction, str) else f"Contradiction {i+1}",
-                    'description': contradiction if isinstance(contradiction, str) else f"A contradiction"
-                })
-                links.append({'source': 'sub_1' if len(nodes) > 1 else 'core', 'target': node_id})
-            
-            for i, adjacent in enumerate(response_data.get('adjacent_fields', [])[:8]):
-                node_id = f'adjacent_{i+1}'
-                nodes.append({
-                    'id': node_id,
-                    'type': 'adjacent',
-                    'label': adjacent[:50] if isinstance(adjacent, str) else f"Adjacent {i+1}",
-                    'description': adjacent if isinstance(adjacent, str) else f"An adjacent field"
-                })
-                links.append({'source': 'core', 'target': node_id})
-            
-            for i, example in enumerate(response_data.get('real_world_examples', [])[:8]):
-                node_id = f'example_{i+1}'
-                nodes.append({
-                    'id': node_id,
-                    'type': 'example',
-                    'label': example[:50] if isinstance(example, str) else f"Example {i+1}",
-                    'description': example if isinstance(example, str) else f"A real-world example"
-                })
-                links.append({'source': 'sub_1' if len(nodes) > 1 else 'core', 'target': node_id})
-            
-            response_data['graph_nodes'] = nodes
-            response_data['graph_links'] = links
         
-        # Ensure all nodes have descriptions
-        if 'graph_nodes' in response_data and response_data['graph_nodes']:
-            for node in response_data['graph_nodes']:
-                if 'description' not in node or not node.get('description'):
-                    node['description'] = f"This {node.get('type', 'node')} represents: {node.get('label', '')}"
-                if 'id' not in node:
-                    node['id'] = f"node_{response_data['graph_nodes'].index(node)}"
-                if 'type' not in node:
-                    node['type'] = 'sub'
-                if 'label' not in node:
-                    node['label'] = 'Unnamed Node'
-        
-        # Ensure graph_links exists
-        if 'graph_links' not in response_data or not response_data.get('graph_links'):
-            response_data['graph_links'] = []
-            if response_data.get('graph_nodes'):
-                for i, node in enumerate(response_data['graph_nodes'][1:6]):
-                    response_data['graph_links'].append({
-                        'source': response_data['graph_nodes'][0]['id'],
-                        'target': node['id']
-                    })
-        
-        # Ensure reasoning_trail exists
-        if 'reasoning_trail' not in response_data or not response_data.get('reasoning_trail'):
-            response_data['reasoning_trail'] = f"This fusion map explores the intersections and relationships between {topic_a} and {topic_b}, highlighting connections and contradictions."
-        
-        # Validate and return
-        return CognitiveMapResponse(**response_data)
+        result = await build_fusion_map(topic_a, topic_b, complexity, bool(request.bypass_cache), request.fusion)
+        return FastJSONResponse(await with_layout(result) if request.layout else result)
         
     except HTTPException:
         raise
+    except RateLimitExceeded as e:
+        logger.warning(f"Rate limited: {str(e)}")
+        raise _overloaded(e)
     except ValueError as e:
         logger.error(f"Validation error: {str(e)}")
         raise HTTPException(status_code=422, detail=str(e))
@@ -277,11 +390,235 @@ async def generate_fusion_map(request: FusionRequest):
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
 
-@router.post("/export/pdf")
-async def export_pdf(data: dict):
+@router.get("/maps", response_model=MapSearchResponse)
+async def search_maps(
+    q: str = "",
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0)
+):
+    """
+    Search stored maps by topic, node labels and descriptions.
+    Without `q`, lists the newest maps first.
+    """
+    store = get_map_store()
+    if store is None:
+        raise HTTPException(status_code=503, detail="Map store is disabled")
+    return await asyncio.to_thread(store.search, q, limit, offset)
+
+
+def _versioned(request: Request, body: bytes, etag: str) -> Response:
+    """
+    A stored-map response: 304 when the client's If-None-Match already has `etag`
+    (weak comparison), otherwise the body, compressed when the client accepts gzip or brotli.
+    """
+    # Weak: gzip, brotli and identity bodies of one version share the tag but not the bytes
+    headers = {"ETag": f"W/{etag}", "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if_none_match = request.headers.get("if-none-match", "")
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    if etag in tags or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    body, encoding = compress(body, request.headers.get("accept-encoding"))
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(body, media_type="application/json", headers=headers)
+
+
+async def _stored(map_id: str):
+    store = get_map_store()
+    if store is None:
+        raise HTTPException(status_code=503, detail="Map store is disabled")
+    stored = await asyncio.to_thread(store.get_versioned, map_id)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Map not found")
+    return store, stored[0], stored[1]
+
+
+@router.get("/maps/{map_id}", responses={
+    200: {
+        "model": Union[CognitiveMapResponse, CompactMapResponse, CompactDeltaResponse],
+        "description": "The full map; the compact map with format=compact; the compact delta with since=<version>"
+    },
+    304: {"description": "The client's If-None-Match matches the current version"}
+})
+async def get_map(
+    map_id: str,
+    request: Request,
+    format: Literal["full", "compact"] = "full",
+    since: int = Query(0, ge=0),
+    descriptions: bool = False
+):
+    """
+    Fetch a stored map by id without calling the LLM.
+    `format=compact` sends the compact wire format: interned strings and node
+    summaries (descriptions only with `descriptions=true`, else fetched per node).
+    `since=<version>` sends, compact, only what changed after that version.
+    Every response carries an ETag; a matching If-None-Match gets a 304.
+    """
+    store, data, version = await _stored(map_id)
+    if 0 < since <= version:
+        etag = f'"{map_id}.{version}.delta{since}{"d" if descriptions else ""}"'
+        changes = await asyncio.to_thread(store.changes, map_id, since, version)
+        body = dumps_bytes(compact_delta(map_id, version, since, loads(data), changes, descriptions))
+    elif format == "compact" or since:
+        etag = f'"{map_id}.{version}.compact{"d" if descriptions else ""}"'
+        body = dumps_bytes(compact_map(map_id, version, loads(data), descriptions))
+    else:
+        # Stored maps were validated on save, so the JSON is sent as-is
+        etag = f'"{map_id}.{version}"'
+        body = data.encode("utf-8")
+    return _versioned(request, body, etag)
+
+
+@router.get("/maps/{map_id}/nodes/{node_id}", responses={200: {"model": GraphNode}, 304: {"description": "Not modified"}})
+async def get_map_node(map_id: str, node_id: str, request: Request):
+    """
+    One node of a stored map with its description, for clients that fetched
+    the compact node summaries.
+    """
+    _, data, version = await _stored(map_id)
+    node = next((node for node in loads(data)["graph_nodes"] if node["id"] == node_id), None)
+    if node is None:
+        raise HTTPException(status_code=404, detail="Node not found")
+    return _versioned(request, dumps_bytes(node), f'"{map_id}.{version}.{node_id}"')
+
+
+async def _expand(build):
+    """Run an expansion and map its errors to HTTP responses."""
+    try:
+        return FastJSONResponse(await build())
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except VersionConflict as e:
+        raise HTTPException(status_code=409, detail=f"The map kept changing while saving the expansion: {str(e)}")
+    except RateLimitExceeded as e:
+        logger.warning(f"Rate limited: {str(e)}")
+        raise _overloaded(e)
+    except ValueError as e:
+        logger.error(f"Validation error: {str(e)}")
+        raise HTTPException(status_code=422, detail=str(e))
+    except RuntimeError as e:
+        logger.error(f"LLM error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to expand node: {str(e)}")
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+
+
+@router.post("/maps/expand", response_model=ExpandResponse)
+async def expand_graph_node(request: GraphExpandRequest):
+    """
+    Expand one node of a graph sent in the request (for maps that were not stored).
+    Returns only the new child nodes and links, with ids namespaced under the node id.
+    """
+    nodes = [node.model_dump() for node in request.graph_nodes]
+    links = [link.model_dump() for link in request.graph_links]
+    return await _expand(lambda: expand_node(
+        request.topic, nodes, links, request.node_id, request.complexity or "intermediate", bool(request.bypass_cache)
+    ))
+
+
+@router.post("/maps/{map_id}/expand", response_model=ExpandResponse)
+async def expand_map_node(map_id: str, request: ExpandRequest):
+    """
+    Expand one node of a stored map with new children and save them into the map.
+    Returns only the new child nodes and links, with ids namespaced under the node id.
+    """
+    if get_map_store() is None:
+        raise HTTPException(status_code=503, detail="Map store is disabled")
+    return await _expand(lambda: expand_stored_map(
+        map_id, request.node_id, request.complexity or "intermediate", bool(request.bypass_cache)
+    ))
+
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """
+    Report response cache hit/miss counters and occupancy, plus the semantic
+    near-duplicate tier and the cache warmer.
+    """
+    semantic = get_semantic_cache()
+    warmer = get_cache_warmer()
+    return {
+        **get_response_cache().stats(),
+        "semantic": semantic.stats() if semantic is not None else None,
+        "warmer": warmer.stats() if warmer is not None else None
+    }
+
+
+@router.get("/usage")
+async def usage_report(request: Request, client: Optional[str] = None, hours: float = Query(24, gt=0, le=24 * 90)):
+    """
+    Provider calls, tokens and latency per client over the last `hours`, with each
+    client's quota and how much of the current window it has used. Callers see
+    their own usage; USAGE_ADMIN_KEY sees every client's.
+    """
+    accountant = get_usage_accountant()
+    if accountant is None:
+        raise HTTPException(status_code=404, detail="Usage accounting is disabled")
+    if not is_admin(request.headers.get("authorization"), request.headers.get("x-api-key")):
+        own = _client_id(request)
+        if client is not None and client != own:
+            raise HTTPException(status_code=403, detail="Only USAGE_ADMIN_KEY may read other clients' usage")
+        client = own
+    return await accountant.report(hours, client)
+
+
+@router.get("/llm/stats")
+async def llm_stats():
+    """
+    Report how many provider calls were coalesced by single-flight.
+    """
+    return get_llm_client().stats()
+
+
+@router.get("/metrics")
+async def metrics():
+    """
+    Expose request latency, per-stage timings, token usage, cache and error counters
+    in the Prometheus text format.
+    """
+    if not metrics_enabled():
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(content=registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+async def _export(fmt: str, data: dict, topic: str, source: Optional[str] = None) -> StreamingResponse:
+    """Render a map in the export worker pool and stream the file back."""
+    if fmt not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format '{fmt}' (expected svg, pdf or png)")
+    try:
+        content = await get_exporter().export(fmt, data, source)
+    except RateLimitExceeded as e:
+        logger.warning(f"Export rejected: {str(e)}")
+        raise _overloaded(e)
+    except Exception as e:
+        logger.error(f"Export error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to export map: {str(e)}")
+
+    filename = "cognitive-map-" + ("-".join(re.findall(r"[A-Za-z0-9]+", topic)) or "map") + f".{fmt}"
+    return StreamingResponse(
+        (content[i:i + EXPORT_CHUNK_SIZE] for i in range(0, len(content), EXPORT_CHUNK_SIZE)),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Content-Length": str(len(content))}
+    )
+
+
+@router.post("/export/{fmt}")
+async def export_map(fmt: str, result: CognitiveMapResponse):
+    """
+    Export a map as svg, pdf or png. Graph nodes with x/y keep their positions;
+    otherwise the map is laid out first.
+    """
+    return await _export(fmt, positioned_dump(result), result.topic)
+
+
+@router.get("/maps/{map_id}/export/{fmt}")
+async def export_stored_map(map_id: str, fmt: str):
     """
-    Export cognitive map as PDF (placeholder - requires additional library).
+    Export a stored map as svg, pdf or png.
     """
-    # This is a placeholder - in production, use libraries like reportlab or weasyprint
-    return {"message": "PDF export feature - to be implemented with reportlab/weasyprint", "data": data}
+    _, text, version = await _stored(map_id)
+    data = await asyncio.to_thread(loads, text)
+    # A stored version never changes, so it identifies the rendered file
+    return await _export(fmt, data, data.get("topic", ""), f"map:{map_id}@{version}")
 
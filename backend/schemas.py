@@ -1,16 +1,36 @@
-from pydantic import BaseModel
-from typing import List, Optional, Literal
+from pydantic import BaseModel, Field
+from typing import List, Optional, Literal, Dict, Any, Union
 
 
 class TopicRequest(BaseModel):
     topic: str
     complexity: Optional[Literal["beginner", "intermediate", "expert"]] = "intermediate"
+    bypass_cache: Optional[bool] = False  # Force a fresh generation and refresh the cache
+    layout: Optional[bool] = False  # Add precomputed x/y positions to graph_nodes
+    generation: Optional[Literal["single", "parallel", "auto"]] = None  # None: GENERATION_MODE
 
 
 class FusionRequest(BaseModel):
     topic_a: str
     topic_b: str
     complexity: Optional[Literal["beginner", "intermediate", "expert"]] = "intermediate"
+    bypass_cache: Optional[bool] = False  # Force a fresh generation and refresh the cache
+    layout: Optional[bool] = False  # Add precomputed x/y positions to graph_nodes
+    fusion: Optional[Literal["direct", "compose", "auto"]] = None  # None: FUSION_MODE
+
+
+class BatchRequest(BaseModel):
+    items: List[TopicRequest]
+    parallelism: Optional[int] = None  # Max concurrent generations, capped by BATCH_MAX_PARALLELISM
+    mode: Optional[Literal["auto", "stream", "job"]] = "auto"  # auto: job mode for large batches
+
+
+class TopicJobRequest(TopicRequest):
+    priority: Optional[Literal["high", "normal", "low"]] = "normal"
+
+
+class FusionJobRequest(FusionRequest):
+    priority: Optional[Literal["high", "normal", "low"]] = "normal"
 
 
 class GraphNode(BaseModel):
@@ -18,6 +38,10 @@ class GraphNode(BaseModel):
     type: str  # "core" | "sub" | "contradiction" | "adjacent" | "example"
     label: str
     description: Optional[str] = ""  # 2-3 meaningful sentences
+    # Server-side layout position. Left out of model dumps so unpositioned maps stay
+    # compact; map_service.with_layout adds it when the client asks for layout=true.
+    x: Optional[float] = Field(default=None, exclude=True)
+    y: Optional[float] = Field(default=None, exclude=True)
 
 
 class GraphLink(BaseModel):
@@ -35,4 +59,69 @@ class CognitiveMapResponse(BaseModel):
     graph_nodes: List[GraphNode]
     graph_links: List[GraphLink]
     reasoning_trail: Optional[str] = ""  # Paragraph explaining the cognitive map structure
+    map_id: Optional[str] = None  # Id of the stored map, for GET /maps/{map_id}
+    metadata: Optional[Dict[str, Any]] = None  # Generation details: model used, attempts, cache outcome
+
+
+class ExpandRequest(BaseModel):
+    node_id: str
+    complexity: Optional[Literal["beginner", "intermediate", "expert"]] = "intermediate"
+    bypass_cache: Optional[bool] = False
+
+
+class GraphExpandRequest(ExpandRequest):
+    # The current graph, for expanding maps that are not in the map store
+    topic: str
+    graph_nodes: List[GraphNode]
+    graph_links: List[GraphLink]
+
+
+class ExpandResponse(BaseModel):
+    map_id: Optional[str] = None
+    version: Optional[int] = None  # Stored map version after the expansion, for GET /maps/{map_id}?since=
+    node_id: str
+    graph_nodes: List[GraphNode]  # Only the new children, ids namespaced under node_id
+    graph_links: List[GraphLink]
+    metadata: Optional[Dict[str, Any]] = None
+
+
+class MapSummary(BaseModel):
+    id: str
+    topic: str
+    complexity: str
+    model: str
+    created_at: float
+
+
+class MapSearchResponse(BaseModel):
+    total: int
+    limit: int
+    offset: int
+    items: List[MapSummary]
+
+
+class CompactMapResponse(BaseModel):
+    # GET /maps/{map_id}?format=compact; see wire.compact_map
+    format: str
+    map_id: str
+    version: int
+    topic: str
+    core_idea: str
+    reasoning_trail: Optional[str] = ""
+    metadata: Optional[Dict[str, Any]] = None
+    strings: List[str]  # Interned ids, types and labels
+    nodes: List[List[Union[int, str]]]  # [id, type, label] string indexes, plus the description with descriptions=true
+    links: List[List[int]]  # [source, target] string indexes
+
 
+class CompactDeltaResponse(BaseModel):
+    # GET /maps/{map_id}?since=<version>; see wire.compact_delta
+    format: str
+    map_id: str
+    version: int
+    since: int
+    strings: List[str]
+    nodes: List[List[Union[int, str]]]  # Current rows of added or changed nodes
+    links: List[List[int]]  # Added links
+    removed_nodes: List[int]
+    removed_links: List[List[int]]
@@ -0,0 +1,288 @@
+import os
+import re
+import json
+import math
+import time
+import zlib
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from cache import normalize_topic
+
+logger = logging.getLogger(__name__)
+
+# NumPy, imported when the first index is built to keep it out of startup; False if not installed
+np = None
+
+
+def _numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:  # pragma: no cover - optional speedup
+            np = False
+    return np or None
+
+# Words that change how a topic is phrased but not which map it should get
+FILLER_WORDS = {
+    "a", "an", "the", "to", "of", "in", "on", "for", "and", "about", "what", "is", "are",
+    "intro", "introduction", "basics", "basic", "fundamentals", "overview", "explained",
+    "beginner", "beginners", "guide", "101", "primer", "concepts", "understanding",
+}
+
+
+def _singular(word: str) -> str:
+    if len(word) > 3 and word.isalpha() and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+# A word keeps the symbols that name a different thing: "C++", "C#" and "C" are three
+# languages, "Node.js" is not "Node". Trailing sentence punctuation is dropped.
+WORD = re.compile(r"[^\W_]+(?:[.+#][^\W_]+)*[+#]*")
+
+
+def content_words(topic: str) -> List[str]:
+    """Lower-cased, singularized words of a topic without filler like "intro to" or "basics"."""
+    words = WORD.findall(topic.casefold())
+    kept = [word for word in words if word not in FILLER_WORDS] or words
+    return [_singular(word) for word in kept]
+
+
+# Acronyms share no n-grams with their expansion, so they are expanded before
+# embedding. Only listed acronyms are: matching by initials alone served "Music
+# Licensing" the map for "ML". Extend with SEMANTIC_CACHE_ALIASES.
+ALIASES = {
+    "ai": "artificial intelligence",
+    "ml": "machine learning",
+    "nlp": "natural language processing",
+    "llm": "large language model",
+}
+
+
+def expand_aliases(topic: str, aliases: Dict[str, str]) -> str:
+    """"intro to ML" -> "intro to machine learning" for the acronyms in `aliases`."""
+    return WORD.sub(lambda m: aliases.get(m.group(0).casefold(), m.group(0)), topic)
+
+
+def load_aliases(path: str) -> Dict[str, str]:
+    """ALIASES plus a JSON object of {"acronym": "expansion"} from `path`."""
+    with open(path, encoding="utf-8") as f:
+        extra = json.load(f)
+    if not isinstance(extra, dict) or not all(isinstance(v, str) for v in extra.values()):
+        raise ValueError("expected an object of acronym -> expansion")
+    return {**ALIASES, **{k.casefold(): v for k, v in extra.items()}}
+
+
+class HashedNgramEmbedder:
+    """
+    Dependency-free topic embeddings: character 3-5 grams and whole words hashed
+    into a fixed number of dimensions, sublinear TF weighted and L2 normalized.
+    """
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+
+    def _features(self, topic: str) -> Dict[str, float]:
+        words = content_words(topic)
+        features: Dict[str, float] = {}
+        text = f" {' '.join(words)} "
+        for n in (3, 4, 5):
+            for i in range(len(text) - n + 1):
+                gram = text[i:i + n]
+                features[gram] = features.get(gram, 0.0) + 1.0
+        for word in words:
+            features[f"w:{word}"] = features.get(f"w:{word}", 0.0) + 2.0
+        return features
+
+    def embed(self, topic: str) -> Dict[int, float]:
+        """Sparse unit vector as {dimension: weight}."""
+        vector: Dict[int, float] = {}
+        for feature, count in self._features(topic).items():
+            digest = zlib.crc32(feature.encode("utf-8"))
+            index = digest % self.dim
+            sign = 1.0 if (digest >> 31) & 1 else -1.0
+            vector[index] = vector.get(index, 0.0) + sign * (1.0 + math.log(count))
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+        return {i: v / norm for i, v in vector.items()}
+
+
+class VectorIndex:
+    """
+    Exact cosine nearest-neighbour search over unit vectors. Uses a NumPy matrix
+    when NumPy is installed, else sparse dot products.
+    """
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self._slots: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._sparse: Dict[str, Dict[int, float]] = {}
+        self._matrix = np.zeros((64, dim), dtype=np.float32) if _numpy() is not None else None
+        self._keys: List[Optional[str]] = [None] * 64 if self._matrix is not None else []
+
+    def add(self, key: str, vector: Dict[int, float]) -> None:
+        if key in self._slots or key in self._sparse:
+            self.remove(key)
+        if self._matrix is None:
+            self._sparse[key] = vector
+            return
+        if self._free:
+            slot = self._free.pop()
+        else:
+            slot = len(self._slots)
+            if slot >= self._matrix.shape[0]:
+                grown = np.zeros((self._matrix.shape[0] * 2, self.dim), dtype=np.float32)
+                grown[:slot] = self._matrix
+                self._matrix = grown
+                self._keys.extend([None] * (grown.shape[0] - len(self._keys)))
+        row = self._matrix[slot]
+        row[:] = 0
+        for i, v in vector.items():
+            row[i] = v
+        self._slots[key] = slot
+        self._keys[slot] = key
+
+    def remove(self, key: str) -> None:
+        if self._matrix is None:
+            self._sparse.pop(key, None)
+            return
+        slot = self._slots.pop(key, None)
+        if slot is not None:
+            self._matrix[slot] = 0
+            self._keys[slot] = None
+            self._free.append(slot)
+
+    def nearest(self, vector: Dict[int, float]) -> Tuple[Optional[str], float]:
+        """Best matching key and its cosine similarity."""
+        if self._matrix is None:
+            best, best_score = None, -1.0
+            for key, other in self._sparse.items():
+                score = sum(v * other.get(i, 0.0) for i, v in vector.items())
+                if score > best_score:
+                    best, best_score = key, score
+            return best, best_score
+        if not self._slots:
+            return None, -1.0
+        used = len(self._slots) + len(self._free)
+        indices = np.fromiter(vector.keys(), dtype=np.int64, count=len(vector))
+        weights = np.fromiter(vector.values(), dtype=np.float32, count=len(vector))
+        scores = self._matrix[:used, indices] @ weights
+        slot = int(np.argmax(scores))
+        if self._keys[slot] is None:
+            return None, -1.0
+        return self._keys[slot], float(scores[slot])
+
+    def __len__(self) -> int:
+        return len(self._slots) if self._matrix is not None else len(self._sparse)
+
+
+class SemanticCache:
+    """
+    Near-duplicate topic lookup in front of the exact response cache.
+    Maps each cached topic's embedding to its exact cache key, partitioned by
+    request kind, complexity, model and prompt version. Entries expire after `ttl`
+    and the least recently used are evicted past `max_entries`.
+
+    Topics are embedded with known acronyms expanded (`aliases`), so "ML" and
+    "machine learning" embed alike; every match, acronym or not, has to reach the
+    threshold.
+    """
+
+    def __init__(self, embedder=None, threshold: float = 0.9, max_entries: int = 5000, ttl: float = 3600,
+                 aliases: Optional[Dict[str, str]] = None):
+        self.embedder = embedder or HashedNgramEmbedder()
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.aliases = ALIASES if aliases is None else aliases
+        self._indexes: Dict[Tuple[str, ...], VectorIndex] = {}
+        # (partition, topic) -> (exact cache key, expires_at), in LRU order
+        self._entries: "OrderedDict[Tuple[Tuple[str, ...], str], tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _index(self, partition: Tuple[str, ...]) -> VectorIndex:
+        if partition not in self._indexes:
+            self._indexes[partition] = VectorIndex(self.embedder.dim)
+        return self._indexes[partition]
+
+    def _embed(self, topic: str) -> Dict[int, float]:
+        return self.embedder.embed(expand_aliases(topic, self.aliases))
+
+    def add(self, partition: Tuple[str, ...], topic: str, cache_key: str) -> None:
+        """Remember that `topic` is cached under `cache_key`."""
+        self.forget(partition, topic)
+        name = normalize_topic(topic)
+        self._entries[(partition, name)] = (cache_key, time.monotonic() + self.ttl)
+        self._index(partition).add(name, self._embed(topic))
+        while len(self._entries) > self.max_entries:
+            old_partition, old_name = next(iter(self._entries))
+            self.forget(old_partition, old_name)
+            self.evictions += 1
+
+    def lookup(self, partition: Tuple[str, ...], topic: str) -> Optional[Tuple[str, str, float]]:
+        """
+        Find a cached topic similar to `topic`.
+        Returns (matched topic, exact cache key, similarity) or None.
+        """
+        index = self._indexes.get(partition)
+        match, score = (None, -1.0) if index is None else index.nearest(self._embed(topic))
+        if match is None or score < self.threshold:
+            self.misses += 1
+            return None
+        cache_key, expires_at = self._entries[(partition, match)]
+        if expires_at < time.monotonic():
+            self.forget(partition, match)
+            self.misses += 1
+            return None
+        self._entries.move_to_end((partition, match))
+        self.hits += 1
+        return match, cache_key, score
+
+    def forget(self, partition: Tuple[str, ...], topic: str) -> None:
+        """Drop a topic, e.g. when its exact cache entry has been evicted."""
+        name = normalize_topic(topic)
+        if self._entries.pop((partition, name), None) is not None:
+            self._index(partition).remove(name)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "evictions": self.evictions,
+            "threshold": self.threshold,
+            "backend": "numpy" if np else "python"
+        }
+
+
+# Global instance - will be initialized lazily
+semantic_cache = None
+
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """Get or create the global semantic cache. Returns None when disabled."""
+    global semantic_cache
+    if semantic_cache is None:
+        if os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+            return None
+        aliases = None
+        aliases_path = os.getenv("SEMANTIC_CACHE_ALIASES", "")
+        if aliases_path:
+            try:
+                aliases = load_aliases(aliases_path)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not read semantic cache aliases from {aliases_path}: {str(e)}")
+        semantic_cache = SemanticCache(
+            aliases=aliases,
+            threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9")),
+            max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "5000")),
+            ttl=float(os.getenv("CACHE_TTL_SECONDS", "3600"))
+        )
+    return semantic_cache
@@ -0,0 +1,340 @@
+import os
+import time
+import sqlite3
+import threading
+import logging
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SharedState:
+    """
+    Key/value and token-bucket state shared by every worker process.
+    Used for the shared cache tier, cross-worker single-flight and rate-limit buckets.
+    Methods are synchronous (local SQLite or one Redis round trip). Async callers run
+    them with asyncio.to_thread; the cache tier and rate-limit buckets call them
+    inline and fail open, so the SQLite busy timeout is kept short.
+    """
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def set_if_absent(self, key: str, value: str, ttl: float) -> bool:
+        """Atomically store `value` unless the key exists. Returns True if stored."""
+        raise NotImplementedError
+
+    def delete_if_equals(self, key: str, value: str) -> bool:
+        """Atomically delete the key if it still holds `value` (lock release)."""
+        raise NotImplementedError
+
+    def clear(self, prefix: str) -> None:
+        raise NotImplementedError
+
+    def purge_expired(self) -> int:
+        """Drop expired keys; returns how many. Backends that expire keys themselves do nothing."""
+        return 0
+
+    def bucket(self, name: str, rate: float, capacity: float, delta: float = 0.0) -> float:
+        """
+        Refill token bucket `name` at `rate` tokens/second up to `capacity`, add
+        `delta` (negative to consume) and return the new balance, atomically.
+        """
+        raise NotImplementedError
+
+
+class MemorySharedState(SharedState):
+    """
+    In-process implementation with the same semantics as the Redis backend.
+    Only shares state within one process; meant as a stand-in for tests.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values: Dict[str, Tuple[str, Optional[float]]] = {}
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    def _live(self, key: str) -> Optional[str]:
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at < time.time():
+            del self._values[key]
+            return None
+        return value
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self._live(key)
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._values[key] = (value, time.time() + ttl if ttl else None)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._values.pop(key, None)
+
+    def set_if_absent(self, key: str, value: str, ttl: float) -> bool:
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            self._values[key] = (value, time.time() + ttl)
+            return True
+
+    def delete_if_equals(self, key: str, value: str) -> bool:
+        with self._lock:
+            if self._live(key) != value:
+                return False
+            del self._values[key]
+            return True
+
+    def clear(self, prefix: str) -> None:
+        with self._lock:
+            for key in [k for k in self._values if k.startswith(prefix)]:
+                del self._values[key]
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [k for k, (_, expires_at) in self._values.items() if expires_at is not None and expires_at < now]
+            for key in expired:
+                del self._values[key]
+        return len(expired)
+
+    def bucket(self, name: str, rate: float, capacity: float, delta: float = 0.0) -> float:
+        with self._lock:
+            now = time.time()
+            tokens, updated = self._buckets.get(name, (capacity, now))
+            tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+            tokens = min(capacity, tokens + delta)
+            self._buckets[name] = (tokens, now)
+            return tokens
+
+
+class SqliteSharedState(SharedState):
+    """
+    SQLite-backed state for workers on one host. The database is opened lazily
+    per process, so it is safe to create before gunicorn forks its workers.
+    Reads skip expired rows; they are deleted on open and every `purge_every` writes.
+    """
+
+    def __init__(self, path: str, purge_every: int = 1000, timeout: float = 0.25):
+        self.path = path
+        self.purge_every = purge_every
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._writes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS shared_kv (
+                    key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL
+                );
+                CREATE TABLE IF NOT EXISTS shared_buckets (
+                    name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL
+                );
+                """
+            )
+            conn.execute("DELETE FROM shared_kv WHERE expires_at < ?", (time.time(),))
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def _wrote(self) -> None:
+        """Count a write and purge expired rows every `purge_every` writes (lock held)."""
+        self._writes += 1
+        if self._writes >= self.purge_every:
+            self._writes = 0
+            self._conn.execute("DELETE FROM shared_kv WHERE expires_at < ?", (time.time(),))
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._connection().execute("DELETE FROM shared_kv WHERE expires_at < ?", (time.time(),))
+        return cursor.rowcount
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT value FROM shared_kv WHERE key = ? AND (expires_at IS NULL OR expires_at >= ?)",
+                (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO shared_kv (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + ttl if ttl else None)
+            )
+            self._wrote()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._connection().execute("DELETE FROM shared_kv WHERE key = ?", (key,))
+
+    def set_if_absent(self, key: str, value: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM shared_kv WHERE key = ? AND expires_at < ?", (key, now))
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO shared_kv (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, now + ttl)
+                )
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+            self._wrote()
+        return cursor.rowcount == 1
+
+    def delete_if_equals(self, key: str, value: str) -> bool:
+        with self._lock:
+            cursor = self._connection().execute("DELETE FROM shared_kv WHERE key = ? AND value = ?", (key, value))
+        return cursor.rowcount == 1
+
+    def clear(self, prefix: str) -> None:
+        with self._lock:
+            self._connection().execute(
+                "DELETE FROM shared_kv WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+            )
+
+    def bucket(self, name: str, rate: float, capacity: float, delta: float = 0.0) -> float:
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT tokens, updated_at FROM shared_buckets WHERE name = ?", (name,)
+                ).fetchone()
+                tokens, updated = row if row else (capacity, now)
+                tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+                tokens = min(capacity, tokens + delta)
+                conn.execute(
+                    "INSERT OR REPLACE INTO shared_buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                    (name, tokens, now)
+                )
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+        return tokens
+
+
+_COMPARE_AND_DELETE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_BUCKET = """
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local delta = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+tokens = math.min(capacity, tokens + delta)
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], 86400)
+return tostring(tokens)
+"""
+
+
+class RedisSharedState(SharedState):
+    """
+    Redis-backed state for workers spread over several hosts. Takes any client
+    with the redis-py API (e.g. fakeredis with Lua support in tests).
+    """
+
+    def __init__(self, client, namespace: str = "mindmesh:"):
+        self.client = client
+        self.namespace = namespace
+
+    @staticmethod
+    def _text(value) -> Optional[str]:
+        if isinstance(value, bytes):
+            return value.decode("utf-8")
+        return value
+
+    def get(self, key: str) -> Optional[str]:
+        return self._text(self.client.get(self.namespace + key))
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        self.client.set(self.namespace + key, value, px=int(ttl * 1000) if ttl else None)
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.namespace + key)
+
+    def set_if_absent(self, key: str, value: str, ttl: float) -> bool:
+        return bool(self.client.set(self.namespace + key, value, nx=True, px=int(ttl * 1000)))
+
+    def delete_if_equals(self, key: str, value: str) -> bool:
+        return bool(self.client.eval(_COMPARE_AND_DELETE, 1, self.namespace + key, value))
+
+    def clear(self, prefix: str) -> None:
+        keys = list(self.client.scan_iter(match=f"{self.namespace}{prefix}*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def bucket(self, name: str, rate: float, capacity: float, delta: float = 0.0) -> float:
+        result = self.client.eval(_BUCKET, 1, f"{self.namespace}bucket:{name}", rate, capacity, delta, time.time())
+        return float(self._text(result))
+
+
+def build_shared_state(backend: str) -> Optional[SharedState]:
+    """Create the configured backend; None means single-process mode (nothing shared)."""
+    backend = backend.lower()
+    if backend in ("", "none"):
+        return None
+    if backend == "memory":
+        return MemorySharedState()
+    if backend == "sqlite":
+        return SqliteSharedState(
+            os.getenv("SHARED_STATE_PATH", str(Path(__file__).parent / "shared_state.db")),
+            timeout=float(os.getenv("SHARED_STATE_BUSY_TIMEOUT", "0.25"))
+        )
+    if backend == "redis":
+        import redis
+        return RedisSharedState(redis.Redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0")))
+    raise ValueError(f"Unknown SHARED_STATE_BACKEND '{backend}' (expected none, memory, sqlite or redis)")
+
+
+# Global instance - will be initialized lazily
+shared_state = None
+shared_state_loaded = False
+
+def get_shared_state() -> Optional[SharedState]:
+    """Get or create the state shared across workers. Returns None in single-process mode."""
+    global shared_state, shared_state_loaded
+    if not shared_state_loaded:
+        shared_state_loaded = True
+        backend = os.getenv("SHARED_STATE_BACKEND", "none")
+        try:
+            shared_state = build_shared_state(backend)
+        except Exception as e:
+            logger.warning(f"Could not set up shared state backend '{backend}', state stays per process: {str(e)}")
+            shared_state = None
+    return shared_state
@@ -0,0 +1,146 @@
+import time
+import uuid
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+import fastjson
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into a single execution.
+    Every caller awaits the same task through asyncio.shield, so a caller that
+    is cancelled (e.g. a disconnected client) does not cancel the call for the
+    others. The shared task is only cancelled once every waiter has gone.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda t, key=key: self._forget(key, t))
+        else:
+            self.coalesced += 1
+
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and self._waiters.get(key) == 1:
+                # Last interested caller left; stop paying for the call
+                task.cancel()
+            raise
+        finally:
+            if key in self._waiters and self._inflight.get(key) is task:
+                self._waiters[key] -= 1
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+            del self._waiters[key]
+        # Mark the exception as retrieved when nobody was left to await it
+        if not task.cancelled():
+            task.exception()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._inflight
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": self.in_flight
+        }
+
+
+class SharedSingleFlight(SingleFlight):
+    """
+    Single-flight across worker processes. Within a process calls are coalesced
+    as usual; across processes the first worker takes a lock in the shared state
+    and publishes its (JSON-serializable) result for the others to pick up.
+    Followers fall back to making the call themselves if the leader fails, its
+    lock expires or they have waited `wait_timeout` seconds.
+    """
+
+    def __init__(self, state, lock_ttl: float = 120.0, wait_timeout: float = 90.0, result_ttl: float = 30.0):
+        super().__init__()
+        self.state = state
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self.result_ttl = result_ttl
+        self.remote_coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        return await super().do(key, lambda: self._across_workers(key, fn))
+
+    async def _across_workers(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        lock_key = f"singleflight:lock:{key}"
+        result_key = f"singleflight:result:{key}"
+        owner = uuid.uuid4().hex
+        deadline = time.monotonic() + self.wait_timeout
+        delay = 0.05
+        waited = False
+        while True:
+            if waited:
+                # Another worker held the lock; use its result if it has published one
+                try:
+                    published = await asyncio.to_thread(self.state.get, result_key)
+                except Exception as e:
+                    logger.warning(f"Shared single-flight unavailable, calling directly: {str(e)}")
+                    return await fn()
+                if published is not None:
+                    self.remote_coalesced += 1
+                    return fastjson.loads(published)
+            try:
+                leader = await asyncio.to_thread(self.state.set_if_absent, lock_key, owner, self.lock_ttl)
+            except Exception as e:
+                logger.warning(f"Shared single-flight unavailable, calling directly: {str(e)}")
+                return await fn()
+            if leader:
+                try:
+                    result = await fn()
+                    await asyncio.to_thread(self._publish, result_key, result)
+                    return result
+                finally:
+                    await asyncio.to_thread(self._release, lock_key, owner)
+
+            # Another worker is making this call; wait for its result
+            if time.monotonic() >= deadline:
+                logger.warning(f"Gave up waiting for another worker's call after {self.wait_timeout}s")
+                return await fn()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+            waited = True
+
+    def _publish(self, result_key: str, result: Any) -> None:
+        try:
+            self.state.set(result_key, fastjson.dumps(result), self.result_ttl)
+        except Exception as e:
+            logger.warning(f"Could not publish single-flight result: {str(e)}")
+
+    def _release(self, lock_key: str, owner: str) -> None:
+        try:
+            self.state.delete_if_equals(lock_key, owner)
+        except Exception as e:
+            logger.warning(f"Could not release single-flight lock, it expires in {self.lock_ttl}s: {str(e)}")
+
+    def stats(self) -> Dict[str, int]:
+        stats = super().stats()
+        stats["remote_coalesced"] = self.remote_coalesced
+        return stats
@@ -0,0 +1,56 @@
+import asyncio
+
+import batch
+from batch import BatchJobRegistry
+from schemas import TopicRequest
+from shared_state import MemorySharedState
+
+
+class _Map:
+    def __init__(self, topic: str):
+        self.topic = topic
+
+    def model_dump(self):
+        return {"topic": self.topic}
+
+
+async def _fake_build(topic, complexity, bypass_cache, generation):
+    await asyncio.sleep(0)
+    if topic == "bad":
+        raise ValueError("bad topic")
+    return _Map(topic)
+
+
+def test_batch_job_is_visible_from_another_worker(monkeypatch):
+    monkeypatch.setattr(batch, "build_topic_map", _fake_build)
+    state = MemorySharedState()
+    # Two worker processes sharing one state backend
+    submitting, polled = BatchJobRegistry(state=state), BatchJobRegistry(state=state)
+
+    async def scenario():
+        job = await submitting.submit([TopicRequest(topic=t) for t in ("a", "bad", "c")], parallelism=2)
+        await job.task
+        return job
+
+    job = asyncio.run(scenario())
+    snapshot = polled.snapshot(job.id)
+
+    assert snapshot["status"] == "completed"
+    assert snapshot["total"] == 3 and snapshot["completed"] == 3 and snapshot["failed"] == 1
+    assert sorted(r["topic"] for r in snapshot["results"]) == ["a", "bad", "c"]
+    assert polled.snapshot(job.id, offset=2)["results"] == snapshot["results"][2:]
+    assert polled.snapshot("unknown") is None
+
+
+def test_without_shared_state_other_workers_do_not_know_the_job(monkeypatch):
+    monkeypatch.setattr(batch, "build_topic_map", _fake_build)
+    submitting, polled = BatchJobRegistry(), BatchJobRegistry()
+
+    async def scenario():
+        job = await submitting.submit([TopicRequest(topic="a")], parallelism=1)
+        await job.task
+        return job
+
+    job = asyncio.run(scenario())
+    assert submitting.snapshot(job.id)["completed"] == 1
+    assert polled.snapshot(job.id) is None
@@ -0,0 +1,89 @@
+import time
+
+from cache import MemoryCacheTier, SqliteCacheTier, SharedCacheTier, ResponseCache
+from shared_state import MemorySharedState
+
+
+def test_memory_budget_counts_encoded_bytes():
+    memory = MemoryCacheTier(max_bytes=100)
+    memory.set("a", "热" * 30)  # 30 characters, 90 bytes
+
+    assert memory.size_bytes == 90
+    memory.set("b", "é" * 10)  # 20 bytes: over budget together, evicts "a"
+    assert memory.get("a") is None and memory.size_bytes == 20
+
+
+def test_memory_tier_holds_bytes_for_exports():
+    memory = MemoryCacheTier(max_bytes=100)
+    memory.set("png", b"\x89PNG" + b"\0" * 36)
+
+    assert memory.get("png").startswith(b"\x89PNG") and memory.size_bytes == 40
+
+
+def test_disk_hit_keeps_the_disk_entry_expiry(tmp_path):
+    disk = SqliteCacheTier(str(tmp_path / "cache.db"), ttl=100)
+    disk.set("k", '{"topic": "x"}')
+    disk._conn.execute("UPDATE response_cache SET expires_at = ?", (time.time() + 10,))
+    disk._conn.commit()
+    cache = ResponseCache(MemoryCacheTier(ttl=100), disk)
+
+    assert cache.get("k") == {"topic": "x"}
+    assert cache.memory.ttl_remaining("k") <= 10
+
+
+def test_shared_tier_reports_expiry_and_promotes_with_it():
+    shared = SharedCacheTier(MemorySharedState(), ttl=50)
+    shared.set("k", '{"topic": "x"}')
+    cache = ResponseCache(MemoryCacheTier(ttl=3600), shared)
+
+    assert 0 < shared.ttl_remaining("k") <= 50
+    assert cache.get("k") == {"topic": "x"}
+    assert cache.memory.ttl_remaining("k") <= 50
+
+
+class _DownState(MemorySharedState):
+    def _fail(self, *args, **kwargs):
+        raise ConnectionError("shared state is down")
+
+    get = set = delete = clear = _fail
+
+
+def test_shared_tier_outage_does_not_raise_from_invalidation():
+    cache = ResponseCache(MemoryCacheTier(), SharedCacheTier(_DownState()))
+    cache.set("k", {"topic": "x"})
+
+    cache.delete("k")
+    cache.clear()
+    assert cache.get("k") is None
+
+
+def _disk_rows(disk: SqliteCacheTier) -> int:
+    return disk._conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+
+def test_disk_tier_purges_expired_rows_on_open_and_every_n_writes(tmp_path):
+    path = str(tmp_path / "cache.db")
+    disk = SqliteCacheTier(path)
+    disk.set("old", "a")
+    disk.set("new", "b")
+    disk._conn.execute("UPDATE response_cache SET expires_at = 0 WHERE key = 'old'")
+    disk._conn.commit()
+    assert _disk_rows(SqliteCacheTier(path)) == 1
+
+    disk = SqliteCacheTier(path, purge_every=2)
+    disk.set("old", "a")
+    disk._conn.execute("UPDATE response_cache SET expires_at = 0 WHERE key = 'old'")
+    disk._conn.commit()
+    disk.set("other", "c")  # second write
+    assert _disk_rows(disk) == 2 and disk.get("old") is None
+
+
+def test_disk_tier_errors_do_not_raise_from_the_response_cache(tmp_path):
+    disk = SqliteCacheTier(str(tmp_path / "cache.db"))
+    cache = ResponseCache(MemoryCacheTier(), disk)
+    cache.set("k", {"topic": "x"})
+    disk._conn.close()
+
+    cache.delete("k")
+    cache.clear()
+    assert cache.get("k") is None
@@ -0,0 +1,32 @@
+import asyncio
+import threading
+
+import exporter
+from exporter import Exporter
+
+MAP = {"topic": "Export", "graph_nodes": [{"id": "core", "type": "core", "label": "Export"}], "graph_links": []}
+
+
+def test_map_content_is_hashed_off_the_event_loop(monkeypatch):
+    threads = []
+    make_cache_key = exporter.make_cache_key
+
+    def recording(*args):
+        threads.append(threading.current_thread())
+        return make_cache_key(*args)
+
+    monkeypatch.setattr(exporter, "make_cache_key", recording)
+    exp = Exporter()
+    exp.cache.set(Exporter.cache_key("svg", MAP), b"<svg/>")
+
+    assert asyncio.run(exp.export("svg", MAP)) == b"<svg/>"
+    assert threads[-1] is not threading.main_thread()
+    assert exp.cache_hits == 1
+
+
+def test_stored_map_is_keyed_on_its_version():
+    exp = Exporter()
+    exp.cache.set(Exporter.cache_key("svg", {}, "map:abc@3"), b"v3")
+
+    assert asyncio.run(exp.export("svg", MAP, "map:abc@3")) == b"v3"
+    assert Exporter.cache_key("svg", MAP, "map:abc@4") != Exporter.cache_key("svg", MAP, "map:abc@3")
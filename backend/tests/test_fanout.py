@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+import fanout
+from fanout import merge_sections, get_generation_mode, gather_or_cancel
+
+
+def _merge(sections, descriptions=()):
+    return merge_sections("Rust", "Rust", "A systems language", ["Ownership", "Traits"], sections, list(descriptions))
+
+
+def _links(data):
+    return {link["target"]: link["source"] for link in data["graph_links"]}
+
+
+def test_section_nodes_are_numbered_per_type_skipping_invalid_items():
+    data = _merge([
+        {"nodes": [{"label": "GC languages", "parent": "sub1"}, {"label": " "}, {"label": "Unsafe", "parent": "sub2"}]},
+        {"nodes": [{"label": "C++"}, "not a node"]},
+        {"nodes": []},
+    ])
+
+    ids = [node["id"] for node in data["graph_nodes"]]
+    assert ids == ["core", "sub1", "sub2", "con1", "con2", "adj1"]
+    assert [n["label"] for n in data["graph_nodes"] if n["type"] == "contradiction"] == ["GC languages", "Unsafe"]
+
+
+def test_unknown_parents_fall_back_like_the_normalizer():
+    data = _merge([
+        {"nodes": [{"label": "Known", "parent": "sub2"}, {"label": "Made up", "parent": "sub9"}]},
+        {"nodes": [{"label": "No parent"}]},
+        {"nodes": [{"label": "Example", "parent": "adj1"}]},
+    ])
+    links = _links(data)
+
+    assert links["con1"] == "sub2"
+    assert links["sub1"] == links["sub2"] == "core"
+    # Section nodes are not parents; unmatched ones hang off the sub-idea or core default
+    expected = {t: ("sub1" if t in fanout.SUB_LINKED_TYPES else "core") for t in fanout.SECTION_TYPES}
+    assert links["con2"] == expected["contradiction"]
+    assert links["adj1"] == expected["adjacent"]
+    assert links["ex1"] == expected["example"]
+
+
+def test_descriptions_and_first_reasoning_trail_are_merged():
+    data = _merge([{}, {}, {}], [
+        {"descriptions": {"core": "Memory safety without GC", "sub1": "Borrowing rules"}, "reasoning_trail": "first"},
+        {"descriptions": {"sub2": "Shared behaviour", "sub3": 7}, "reasoning_trail": "second"},
+    ])
+    descriptions = {node["id"]: node["description"] for node in data["graph_nodes"]}
+
+    assert descriptions == {"core": "Memory safety without GC", "sub1": "Borrowing rules", "sub2": "Shared behaviour"}
+    assert data["reasoning_trail"] == "first"
+
+
+def test_generation_mode_auto_fans_out_expert_maps_only(monkeypatch):
+    monkeypatch.delenv("GENERATION_MODE", raising=False)
+    assert get_generation_mode(None, "expert") == "parallel"
+    assert get_generation_mode(None, "beginner") == "single"
+    assert get_generation_mode("single", "expert") == "single"
+    assert get_generation_mode("bogus", "expert") == "parallel"
+
+
+def test_gather_or_cancel_cancels_the_other_sections_on_failure():
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def fail():
+        raise ValueError("section failed")
+
+    with pytest.raises(ValueError):
+        asyncio.run(gather_or_cancel([slow(), fail()]))
+    assert cancelled == [True]
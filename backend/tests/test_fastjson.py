@@ -0,0 +1,59 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import fastjson
+from fastjson import FastJSONResponse
+from schemas import CognitiveMapResponse
+
+DATA = {"topic": "Café", "nested": {"list": [1, 2.5, None, True]}, "quote": 'a "b" \\ c'}
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def backend(request, monkeypatch):
+    if request.param == "orjson":
+        if fastjson.orjson is None:
+            pytest.skip("orjson is not installed")
+    else:
+        monkeypatch.setattr(fastjson, "orjson", None)
+    return request.param
+
+
+def test_encoding_is_compact_utf8_json(backend):
+    expected = json.dumps(DATA, separators=(",", ":"), ensure_ascii=False)
+
+    assert fastjson.dumps(DATA) == expected
+    assert fastjson.dumps_bytes(DATA) == expected.encode("utf-8")
+    assert fastjson.loads(expected) == DATA
+    assert fastjson.loads(expected.encode("utf-8")) == DATA
+
+
+def test_invalid_json_raises_the_standard_error(backend):
+    with pytest.raises(json.JSONDecodeError):
+        fastjson.loads('{"topic": ')
+
+
+def test_response_renders_models_data_and_preencoded_content(backend):
+    model = CognitiveMapResponse.model_validate({
+        "topic": "Jazz", "core_idea": "Music", "sub_ideas": [], "contradictions": [], "adjacent_fields": [],
+        "real_world_examples": [], "graph_nodes": [], "graph_links": [],
+    })
+    response = FastJSONResponse(DATA)
+
+    assert json.loads(response.body) == DATA
+    assert FastJSONResponse(model).body == model.model_dump_json().encode("utf-8")
+    assert FastJSONResponse(b'{"raw":1}').body == b'{"raw":1}'
+    assert FastJSONResponse('{"text":1}').body == b'{"text":1}'
+    assert response.headers["content-type"] == "application/json"
+
+
+def test_returning_the_response_skips_response_model_filtering():
+    app = FastAPI()
+
+    @app.get("/map", response_model=CognitiveMapResponse)
+    async def get_map():
+        return FastJSONResponse({"topic": "Jazz", "extra": "kept"})
+
+    assert TestClient(app).get("/map").json() == {"topic": "Jazz", "extra": "kept"}
@@ -0,0 +1,43 @@
+from graph_normalizer import GraphNormalizer
+
+
+def _normalize(nodes, links):
+    return GraphNormalizer().normalize({"graph_nodes": nodes, "graph_links": links}, "Topic")
+
+
+def test_label_less_nodes_are_kept_apart():
+    data = _normalize(
+        [
+            {"id": "core", "type": "core", "label": "Topic"},
+            {"id": "a", "type": "sub"},
+            {"id": "b", "type": "sub", "label": ""},
+        ],
+        [{"source": "core", "target": "a"}, {"source": "core", "target": "b"}],
+    )
+
+    assert [node["id"] for node in data["graph_nodes"]] == ["core", "a", "b"]
+    assert [node["label"] for node in data["graph_nodes"][1:]] == ["Unnamed Node", "Unnamed Node"]
+    assert data["graph_links"] == [{"source": "core", "target": "a"}, {"source": "core", "target": "b"}]
+
+
+def test_label_less_node_with_repeated_id_is_still_a_duplicate():
+    data = _normalize(
+        [{"id": "core", "type": "core", "label": "Topic"}, {"id": "a", "type": "sub"}, {"id": "a", "type": "sub"}],
+        [{"source": "core", "target": "a"}],
+    )
+
+    assert [node["id"] for node in data["graph_nodes"]] == ["core", "a"]
+
+
+def test_same_labelled_concept_is_deduped_and_links_rewired():
+    data = _normalize(
+        [
+            {"id": "core", "type": "core", "label": "Topic"},
+            {"id": "a", "type": "sub", "label": "Energy"},
+            {"id": "b", "type": "sub", "label": "energy"},
+        ],
+        [{"source": "core", "target": "b"}],
+    )
+
+    assert [node["id"] for node in data["graph_nodes"]] == ["core", "a"]
+    assert data["graph_links"] == [{"source": "core", "target": "a"}]
@@ -0,0 +1,66 @@
+import time
+import asyncio
+
+import jobs
+from jobs import JobJournal, JobQueue, Job
+
+
+def _running_job(journal: JobJournal) -> Job:
+    job = Job("map", {"topic": "Restart"}, "client", 1)
+    journal.insert(job)
+    assert journal.claim(job.id)
+    return job
+
+
+def test_restart_with_same_host_and_pid_recovers_running_jobs(tmp_path, monkeypatch):
+    journal = JobJournal(str(tmp_path / "jobs.db"))
+    job = _running_job(journal)
+    # Nothing to take over from ourselves
+    assert journal.recover() == []
+
+    # A restarted container: same hostname, same pid, new process run
+    monkeypatch.setattr(jobs, "BOOT_TOKEN", "rebooted")
+    restarted = JobJournal(str(tmp_path / "jobs.db"))
+    recovered = restarted.recover()
+
+    assert [row["id"] for row in recovered] == [job.id]
+    assert recovered[0]["status"] == "queued"
+    assert recovered[0]["owner"] == jobs._owner()
+
+
+def test_other_host_is_recovered_only_after_its_lease_expires(tmp_path):
+    journal = JobJournal(str(tmp_path / "jobs.db"), lease=60)
+    job = _running_job(journal)
+    owner = "other-host:1:abc"
+    journal._conn.execute("UPDATE jobs SET owner = ?, heartbeat = ? WHERE id = ?", (owner, time.time(), job.id))
+    journal._conn.commit()
+    assert journal.recover() == []
+
+    journal._conn.execute("UPDATE jobs SET heartbeat = ? WHERE id = ?", (time.time() - 120, job.id))
+    journal._conn.commit()
+    assert [row["id"] for row in journal.recover()] == [job.id]
+
+
+def test_renew_keeps_own_jobs_leased(tmp_path):
+    journal = JobJournal(str(tmp_path / "jobs.db"), lease=60)
+    job = _running_job(journal)
+    journal._conn.execute("UPDATE jobs SET heartbeat = 0 WHERE id = ?", (job.id,))
+    journal._conn.commit()
+
+    assert journal.renew() == 1
+    assert journal.get(job.id)["owner"] == jobs._owner()
+    with journal._lock:
+        heartbeat = journal._conn.execute("SELECT heartbeat FROM jobs WHERE id = ?", (job.id,)).fetchone()[0]
+    assert heartbeat > time.time() - 5
+
+
+def test_maintenance_prunes_finished_jobs_while_running(tmp_path):
+    journal = JobJournal(str(tmp_path / "jobs.db"))
+    queue = JobQueue(journal, retention=60, prune_interval=0)
+    job = _running_job(journal)
+    journal.finish(job.id, "completed", {"topic": "Restart"})
+    journal._conn.execute("UPDATE jobs SET finished_at = ? WHERE id = ?", (time.time() - 120, job.id))
+    journal._conn.commit()
+
+    asyncio.run(queue._maintain_once())
+    assert journal.get(job.id) is None
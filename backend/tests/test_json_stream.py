@@ -0,0 +1,118 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import map_service
+import routes
+from json_stream import IncrementalArrayParser
+from main import app
+
+MAP = {
+    "topic": "Go",
+    "core_idea": "A {simple} \"systems\" language",
+    "graph_nodes": [
+        {"id": "core", "type": "core", "label": "Go", "description": "Braces } and [brackets] in a string"},
+        {"id": "sub1", "type": "sub", "label": "Goroutines", "description": "Escaped \\\" quote and \\\\ slash"},
+        {"id": "sub2", "type": "sub", "label": "Channels", "description": "Typed \"pipes\""},
+    ],
+    "graph_links": [{"source": "core", "target": "sub1"}, {"source": "core", "target": "sub2"}],
+}
+TEXT = "```json\n" + json.dumps(MAP, indent=2) + "\n```"
+
+
+def _feed(text, size):
+    parser = IncrementalArrayParser()
+    events = []
+    for i in range(0, len(text), size):
+        events.extend(parser.feed(text[i:i + size]))
+    return parser, events
+
+
+@pytest.mark.parametrize("size", [1, 3, 17, len(TEXT)])
+def test_elements_are_emitted_whole_across_chunk_boundaries(size):
+    parser, events = _feed(TEXT, size)
+
+    assert events == [("graph_nodes", node) for node in MAP["graph_nodes"]] + [
+        ("graph_links", link) for link in MAP["graph_links"]
+    ]
+    assert parser.buffer == TEXT
+
+
+def test_elements_are_emitted_as_soon_as_they_close():
+    parser = IncrementalArrayParser()
+    first = json.dumps(MAP["graph_nodes"][0])
+
+    assert parser.feed('{"topic": "Go", "graph_nodes": [' + first[:-1]) == []
+    assert parser.feed("}") == [("graph_nodes", MAP["graph_nodes"][0])]
+
+
+def test_arrays_outside_the_selected_keys_are_skipped():
+    parser, events = _feed(json.dumps({"tags": [{"id": "x"}], **MAP}), 5)
+
+    assert [key for key, _ in events] == ["graph_nodes"] * 3 + ["graph_links"] * 2
+
+
+class _Cache:
+    def __init__(self, entries=None):
+        self.entries = dict(entries or {})
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, value):
+        self.entries[key] = value
+
+
+class _LLM:
+    model = "test-model"
+
+    async def stream_cognitive_map(self, prompt, max_tokens):
+        for i in range(0, len(TEXT), 40):
+            yield TEXT[i:i + 40]
+
+
+def _events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def stream(monkeypatch):
+    cache = _Cache()
+    for module in (routes, map_service):
+        monkeypatch.setattr(module, "get_response_cache", lambda: cache)
+    monkeypatch.setattr(routes, "get_llm_client", lambda: _LLM())
+    monkeypatch.setattr(map_service, "get_map_store", lambda: None)
+    monkeypatch.setattr(map_service, "get_semantic_cache", lambda: None)
+    monkeypatch.setattr(map_service, "get_cache_warmer", lambda: None)
+    client = TestClient(app)
+
+    def post(**body):
+        response = client.post("/generate-map/stream", json={"topic": "Go", "bypass_cache": True, **body})
+        assert response.status_code == 200
+        return _events(response.text)
+
+    return post
+
+
+def test_stream_sends_nodes_then_the_result(stream):
+    events = stream()
+
+    assert [kind for kind, _ in events] == ["node"] * 3 + ["link"] * 2 + ["result"]
+    assert all("x" not in node for node in events[-1][1]["graph_nodes"])
+
+
+@pytest.mark.parametrize("bypass_cache", [True, False])
+def test_stream_positions_nodes_when_layout_is_requested(stream, bypass_cache):
+    # The second request is served from the map the first one cached
+    stream()
+    events = stream(layout=True, bypass_cache=bypass_cache)
+    kind, result = events[-1]
+
+    assert kind == "result"
+    assert [node["id"] for node in result["graph_nodes"]] == ["core", "sub1", "sub2"]
+    assert all(isinstance(node["x"], float) and isinstance(node["y"], float) for node in result["graph_nodes"])
@@ -0,0 +1,116 @@
+import asyncio
+import math
+
+import numpy as np
+import pytest
+
+import layout
+import map_service
+from layout import compute_layout, radial_positions
+from schemas import CognitiveMapResponse
+
+
+def _tree(children_per_node, depth):
+    nodes = [{"id": "core", "type": "core"}]
+    links = []
+    frontier = ["core"]
+    for level in range(depth):
+        next_frontier = []
+        for parent in frontier:
+            for i in range(children_per_node):
+                node_id = f"{parent}.{i}"
+                nodes.append({"id": node_id, "type": "sub"})
+                links.append({"source": parent, "target": node_id})
+                next_frontier.append(node_id)
+        frontier = next_frontier
+    return nodes, links
+
+
+def test_every_node_is_placed_once_and_centred_in_the_frame():
+    nodes, links = _tree(3, 2)
+    links.append({"source": "core", "target": "missing"})
+    links.append({"source": "core.0", "target": "core.0"})
+
+    positions = compute_layout(nodes, links, width=1000, height=600)
+    xs, ys = zip(*positions.values())
+
+    assert list(positions) == [node["id"] for node in nodes]
+    assert sum(xs) / len(xs) == pytest.approx(500, abs=1)
+    assert sum(ys) / len(ys) == pytest.approx(300, abs=1)
+    assert min(math.dist(a, b) for i, a in enumerate(positions.values()) for b in list(positions.values())[i + 1:]) > 10
+
+
+def test_the_same_graph_always_gets_the_same_layout():
+    nodes, links = _tree(4, 2)
+
+    assert compute_layout(nodes, links) == compute_layout([dict(n) for n in nodes], list(links))
+    assert compute_layout([], []) == {}
+    assert compute_layout([{"id": "core", "type": "core"}], []) == {"core": (550.0, 350.0)}
+
+
+def test_radial_start_puts_each_depth_on_its_own_ring():
+    nodes, links = _tree(2, 2)
+    nodes.append({"id": "orphan", "type": "example"})
+    src, dst = layout._edges(nodes, links)
+
+    radius = np.hypot(*radial_positions(nodes, src, dst).T)
+    depth = {node["id"]: node["id"].count(".") for node in nodes}
+    depth["orphan"] = 1
+
+    assert radius == pytest.approx([depth[node["id"]] * layout.LINK_DISTANCE for node in nodes])
+
+
+def test_grid_repulsion_approximates_the_exact_forces():
+    rng = np.random.default_rng(1)
+    x, y = (rng.uniform(0, 2000, size=400).astype(np.float32) for _ in range(2))
+
+    exact = layout._repulsion(x, y, 6400.0)
+    approx = layout._grid_repulsion(x, y, 6400.0)
+    cosine = np.einsum("ij,ij->i", exact, approx) / (np.linalg.norm(exact, axis=1) * np.linalg.norm(approx, axis=1))
+
+    assert np.median(cosine) > 0.95
+
+
+def test_large_graphs_lay_out_with_finite_positions():
+    nodes, links = _tree(7, 3)
+
+    positions = compute_layout(nodes, links)
+
+    assert len(positions) == len(nodes) > layout.EXACT_REPULSION_LIMIT
+    assert all(math.isfinite(x) and math.isfinite(y) for x, y in positions.values())
+
+
+class _Cache:
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, value):
+        self.entries[key] = value
+
+
+def _map(nodes, links, description=""):
+    return CognitiveMapResponse.model_validate({
+        "topic": "Tree", "core_idea": "Tree", "sub_ideas": [], "contradictions": [], "adjacent_fields": [],
+        "real_world_examples": [], "reasoning_trail": "",
+        "graph_nodes": [{**node, "label": node["id"], "description": description} for node in nodes],
+        "graph_links": links,
+    })
+
+
+def test_layouts_are_cached_by_graph_shape(monkeypatch):
+    cache = _Cache()
+    calls = []
+    monkeypatch.setattr(map_service, "get_response_cache", lambda: cache)
+    monkeypatch.setattr(layout, "compute_layout", lambda nodes, links: calls.append(1) or compute_layout(nodes, links))
+    nodes, links = _tree(3, 1)
+
+    first = asyncio.run(map_service.with_layout(_map(nodes, links)))
+    second = asyncio.run(map_service.with_layout(_map(nodes, links, description="Reworded")))
+    asyncio.run(map_service.with_layout(_map(nodes, links[:-1])))
+
+    assert len(calls) == 2
+    assert [(n["x"], n["y"]) for n in first["graph_nodes"]] == [(n["x"], n["y"]) for n in second["graph_nodes"]]
+    assert second["metadata"] == {"layout": layout.LAYOUT_VERSION}
@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+import map_service
+from graph_normalizer import get_graph_normalizer
+from map_store import MapStore, VersionConflict
+from schemas import ExpandResponse
+
+MAP = {
+    "topic": "Energy",
+    "core_idea": "Energy",
+    "reasoning_trail": "",
+    "graph_nodes": [{"id": "core", "type": "core", "label": "Energy", "description": "Energy"}],
+    "graph_links": [],
+}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = MapStore(str(tmp_path / "maps.db"))
+    store.save("m1", MAP, "intermediate", "model", "prompt")
+    monkeypatch.setattr(map_service, "get_map_store", lambda: store)
+    return store
+
+
+def _fake_expand(labels_by_call, both_read):
+    calls = []
+
+    async def expand_node(topic, nodes, links, node_id, complexity, bypass_cache):
+        labels = labels_by_call[len(calls)]
+        calls.append(labels)
+        # Both expansions have read the map before either saves
+        both_read.release()
+        await asyncio.sleep(0.01)
+        children, child_links = get_graph_normalizer().expansion(
+            nodes, node_id, [{"label": label, "type": "sub"} for label in labels]
+        )
+        return ExpandResponse(node_id=node_id, graph_nodes=children, graph_links=child_links)
+
+    return expand_node
+
+
+def test_concurrent_expansions_of_one_map_keep_both_sets_of_nodes(store, monkeypatch):
+    both_read = asyncio.Semaphore(0)
+    monkeypatch.setattr(map_service, "expand_node", _fake_expand([["Heat", "Work"], ["Light", "Mass"]], both_read))
+
+    async def scenario():
+        return await asyncio.gather(
+            map_service.expand_stored_map("m1", "core"), map_service.expand_stored_map("m1", "core")
+        )
+
+    first, second = asyncio.run(scenario())
+    saved = store.get_versioned("m1")
+    labels = sorted(node["label"] for node in map_service.fastjson.loads(saved[0])["graph_nodes"])
+    ids = [node["id"] for node in map_service.fastjson.loads(saved[0])["graph_nodes"]]
+
+    assert labels == ["Energy", "Heat", "Light", "Mass", "Work"]
+    assert len(ids) == len(set(ids))
+    assert sorted([first.version, second.version]) == [2, 3] and saved[1] == 3
+
+
+def test_update_with_a_stale_version_is_rejected(store):
+    data = store.get("m1")
+    assert store.update("m1", data, expected_version=1) == 2
+    with pytest.raises(VersionConflict):
+        store.update("m1", data, expected_version=1)
+
+
+class _FakeLLM:
+    model = "fake-model"
+
+    def __init__(self):
+        self.prompts = []
+
+    async def generate_cognitive_map(self, prompt, expected_tokens=None):
+        self.prompts.append(prompt)
+        return {
+            "graph_nodes": [
+                {"id": "core", "type": "core", "label": "Fusion"},
+                {"id": "s1", "type": "sub", "label": "Bridge"},
+            ],
+            "graph_links": [{"source": "core", "target": "s1"}],
+        }
+
+
+@pytest.fixture
+def fusion_env(monkeypatch):
+    from cache import ResponseCache, MemoryCacheTier
+
+    cache = ResponseCache(MemoryCacheTier())
+    llm = _FakeLLM()
+
+    async def save_map(result, complexity, kind):
+        return None
+
+    monkeypatch.setattr(map_service, "get_response_cache", lambda: cache)
+    monkeypatch.setattr(map_service, "get_llm_client", lambda: llm)
+    monkeypatch.setattr(map_service, "save_map", save_map)
+    return cache, llm
+
+
+def test_auto_fusion_serves_a_direct_fusion_cached_before_the_topic_maps(fusion_env):
+    cache, llm = fusion_env
+    asyncio.run(map_service.build_fusion_map("Music", "Physics", fusion="auto"))
+    assert len(llm.prompts) == 1
+
+    for topic in ("Music", "Physics"):
+        cache.set(map_service.topic_cache_key(topic, "intermediate", llm.model), {"topic": topic})
+    lookups = cache.hits + cache.misses
+    result = asyncio.run(map_service.build_fusion_map("Music", "Physics", fusion="auto"))
+
+    assert len(llm.prompts) == 1
+    assert result.graph_nodes[1].label == "Bridge"
+    # Only the fusion lookup itself counts; probing the topic maps does not
+    assert cache.hits + cache.misses == lookups + 1
@@ -0,0 +1,110 @@
+import sqlite3
+
+import pytest
+
+from map_store import MapStore, VersionConflict
+
+
+def _map(topic, labels, descriptions=None):
+    descriptions = descriptions or [""] * len(labels)
+    return {
+        "topic": topic,
+        "graph_nodes": [
+            {"id": f"n{i}", "type": "sub", "label": label, "description": description}
+            for i, (label, description) in enumerate(zip(labels, descriptions))
+        ],
+        "graph_links": [{"source": "n0", "target": f"n{i}"} for i in range(1, len(labels))],
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    return MapStore(str(tmp_path / "maps.db"))
+
+
+def test_search_ranks_topic_matches_above_description_matches(store):
+    store.save("desc", _map("Cooking", ["Bread"], ["Yeast needs photosynthesis-free sugar"]), "beginner", "m", "p")
+    store.save("topic", _map("Photosynthesis", ["Chlorophyll"]), "beginner", "m", "p")
+    store.save("other", _map("Jazz", ["Swing"]), "beginner", "m", "p")
+
+    result = store.search("photosynth")
+
+    assert result["total"] == 2
+    assert [item["id"] for item in result["items"]] == ["topic", "desc"]
+
+
+def test_search_requires_every_term_and_tolerates_query_syntax(store):
+    store.save("a", _map("Rust", ["Ownership", "Traits"]), "expert", "m", "p")
+    store.save("b", _map("Go", ["Ownership"]), "expert", "m", "p")
+
+    assert [item["id"] for item in store.search("owner trait")["items"]] == ["a"]
+    assert store.search('"traits" OR (NEAR') == {"total": 0, "limit": 20, "offset": 0, "items": []}
+
+
+def test_empty_search_lists_newest_first_with_paging(store, monkeypatch):
+    for i, topic in enumerate(["One", "Two", "Three"]):
+        monkeypatch.setattr("map_store.time.time", lambda i=i: 1000.0 + i)
+        store.save(f"m{i}", _map(topic, ["Node"]), "beginner", "m", "p")
+
+    page = store.search("  ", limit=2, offset=1)
+
+    assert page["total"] == 3
+    assert [item["topic"] for item in page["items"]] == ["Two", "One"]
+
+
+def test_update_bumps_the_version_and_reindexes_labels(store):
+    store.save("m", _map("Rust", ["Ownership"]), "expert", "m", "p")
+
+    assert store.update("m", _map("Rust", ["Ownership", "Lifetimes"]), expected_version=1) == 2
+    assert store.get_versioned("m")[1] == 2
+    assert [item["id"] for item in store.search("lifetimes")["items"]] == ["m"]
+    with pytest.raises(VersionConflict):
+        store.update("m", _map("Rust", ["Ownership"]), expected_version=1)
+    assert store.update("missing", _map("Rust", ["Ownership"])) is None
+
+
+def test_saving_again_resets_the_version_and_change_log(store):
+    store.save("m", _map("Rust", ["Ownership"]), "expert", "m", "p")
+    store.update("m", _map("Rust", ["Ownership", "Lifetimes"]))
+
+    store.save("m", _map("Rust", ["Ownership"]), "expert", "m", "p")
+
+    assert store.get_versioned("m")[1] == 1
+    assert store.changes("m", 0, 10) == {"node": [], "link": [], "removed_node": [], "removed_link": []}
+    assert store.search("rust")["total"] == 1
+
+
+def test_changes_report_each_ref_by_its_latest_state(store):
+    store.save("m", _map("Rust", ["Ownership", "Traits"]), "expert", "m", "p")
+    v2 = _map("Rust", ["Ownership", "Traits", "Lifetimes"])
+    store.update("m", v2)
+    assert store.changes("m", 1, 2) == {"node": ["n2"], "link": [["n0", "n2"]], "removed_node": [], "removed_link": []}
+
+    v3 = {**v2, "graph_nodes": [node for node in v2["graph_nodes"] if node["id"] != "n2"],
+          "graph_links": [link for link in v2["graph_links"] if link["target"] != "n2"]}
+    v3["graph_nodes"][1] = {**v3["graph_nodes"][1], "label": "Generic traits"}
+    store.update("m", v3)
+
+    # Only the latest state of each ref is kept, so n2's addition is superseded by its removal
+    assert store.changes("m", 1, 2) == {"node": [], "link": [], "removed_node": [], "removed_link": []}
+    assert store.changes("m", 1, 3) == {
+        "node": ["n1"], "link": [], "removed_node": ["n2"], "removed_link": [["n0", "n2"]]
+    }
+    assert store.changes("m", 3, 3) == {"node": [], "link": [], "removed_node": [], "removed_link": []}
+
+
+def test_stores_created_before_versioning_start_at_version_one(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE maps (id TEXT PRIMARY KEY, topic TEXT NOT NULL, complexity TEXT NOT NULL, "
+        "model TEXT NOT NULL, prompt_hash TEXT NOT NULL, created_at REAL NOT NULL, data TEXT NOT NULL)"
+    )
+    conn.execute("INSERT INTO maps VALUES ('old', 'Rust', 'expert', 'm', 'p', 0, '{\"topic\": \"Rust\"}')")
+    conn.commit()
+    conn.close()
+
+    store = MapStore(path)
+
+    assert store.get_versioned("old") == ('{"topic": "Rust"}', 1)
+    assert store.update("old", {"topic": "Rust"}) == 2
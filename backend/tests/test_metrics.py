@@ -0,0 +1,93 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import metrics
+from main import app as main_app
+from metrics import Counter, Histogram, MetricsMiddleware, Registry, first_byte_since, record_provider_call, timed
+
+
+def test_registry_renders_the_prometheus_text_format():
+    registry = Registry()
+    hits = registry.register(Counter("hits_total", "Hits", ("kind",)))
+    latency = registry.register(Histogram("latency_seconds", "Latency", buckets=(0.1, 1.0)))
+    registry.add_collector(lambda: [("queue_depth", "gauge", "Queued jobs", 3)])
+    hits.inc(kind='say "hi"\n')
+    hits.inc(2, kind="map")
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+
+    assert registry.render().splitlines() == [
+        "# HELP hits_total Hits",
+        "# TYPE hits_total counter",
+        'hits_total{kind="map"} 2',
+        'hits_total{kind="say \\"hi\\"\\n"} 1',
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="1.0"} 2',
+        'latency_seconds_bucket{le="+Inf"} 3',
+        "latency_seconds_sum 5.55",
+        "latency_seconds_count 3",
+        "# HELP queue_depth Queued jobs",
+        "# TYPE queue_depth gauge",
+        "queue_depth 3",
+    ]
+    assert hits.value(kind="map") == 2 and latency.count() == 3
+
+
+def test_provider_calls_are_split_at_the_first_byte(monkeypatch):
+    stages = []
+    monkeypatch.setattr(metrics, "record_stage", lambda stage, seconds: stages.append((stage, seconds)))
+
+    record_provider_call(10.0, 14.0, first_byte=11.5)
+    record_provider_call(10.0, 14.0)
+
+    assert stages == [("provider_ttfb", 1.5), ("generation", 2.5), ("provider_ttfb", 4.0), ("generation", 0.0)]
+
+
+def test_first_byte_only_counts_for_calls_started_before_it():
+    token = metrics._first_byte.set(5.0)
+    try:
+        assert first_byte_since(4.0) == 5.0
+        assert first_byte_since(6.0) is None
+    finally:
+        metrics._first_byte.reset(token)
+
+
+def _timed_app(server_timing):
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, server_timing=server_timing)
+
+    @app.get("/work")
+    async def work():
+        with timed("parse"):
+            pass
+        with timed("parse"):
+            pass
+        return {}
+
+    return app
+
+
+def test_middleware_times_requests_by_handler_and_reports_stages():
+    before = metrics.REQUEST_SECONDS.count(handler="work", method="GET", status="200")
+    parses = metrics.STAGE_SECONDS.count(stage="parse")
+
+    response = TestClient(_timed_app(server_timing=True)).get("/work")
+
+    assert response.headers["server-timing"].startswith("parse;dur=")
+    assert metrics.REQUEST_SECONDS.count(handler="work", method="GET", status="200") == before + 1
+    assert metrics.STAGE_SECONDS.count(stage="parse") == parses + 2
+    assert "server-timing" not in TestClient(_timed_app(server_timing=False)).get("/work").headers
+
+
+def test_metrics_endpoint_can_be_disabled(monkeypatch):
+    client = TestClient(main_app)
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert "# TYPE mindmesh_stage_duration_seconds histogram" in response.text
+
+    monkeypatch.setenv("METRICS_ENABLED", "false")
+    assert client.get("/metrics").status_code == 404
@@ -0,0 +1,89 @@
+import pytest
+
+import tokens
+from graph_normalizer import GraphNormalizer
+from map_service import token_budget
+from prompt import (
+    expected_completion_tokens, get_fusion_prompt, get_output_mode, get_prompt, get_prompt_hash
+)
+
+
+@pytest.fixture
+def heuristic(monkeypatch):
+    """Count tokens with the chars/4 fallback, whether or not tiktoken is installed."""
+    monkeypatch.setattr(tokens, "_encoding", None)
+    monkeypatch.setattr(tokens, "_encoding_loaded", True)
+
+
+def test_output_mode_defaults_to_graph(monkeypatch):
+    monkeypatch.delenv("PROMPT_OUTPUT_MODE", raising=False)
+    assert get_output_mode() == "graph"
+    monkeypatch.setenv("PROMPT_OUTPUT_MODE", "FULL")
+    assert get_output_mode() == "full"
+    monkeypatch.setenv("PROMPT_OUTPUT_MODE", "verbose")
+    assert get_output_mode() == "graph"
+
+
+@pytest.mark.parametrize("complexity", ["beginner", "intermediate", "expert"])
+def test_graph_prompts_are_much_smaller_than_full_ones(heuristic, complexity):
+    graph = get_prompt("Photosynthesis", complexity, output_mode="graph")
+    full = get_prompt("Photosynthesis", complexity, output_mode="full")
+
+    assert "Photosynthesis" in graph and '"sub_ideas"' not in graph
+    assert tokens.estimate_tokens(graph) < tokens.estimate_tokens(full) / 2
+    assert "Photosynthesis" in get_fusion_prompt("Jazz", "Photosynthesis", complexity, output_mode="graph")
+
+
+def test_prompt_hashes_separate_output_modes_but_not_expansions():
+    assert get_prompt_hash("map", "graph") != get_prompt_hash("map", "full")
+    assert get_prompt_hash("fusion", "graph") != get_prompt_hash("fusion", "full")
+    assert get_prompt_hash("map", "graph") != get_prompt_hash("fusion", "graph")
+    assert get_prompt_hash("expand", "graph") == get_prompt_hash("expand", "full")
+
+
+def test_completion_estimates_grow_with_complexity_and_the_full_lists():
+    estimates = [expected_completion_tokens(c, "graph") for c in ("beginner", "intermediate", "expert")]
+
+    assert estimates == sorted(estimates) and len(set(estimates)) == 3
+    assert expected_completion_tokens("expert", "full") > estimates[-1]
+    assert expected_completion_tokens("unknown", "graph") == estimates[1]
+
+
+def test_heuristic_token_count(heuristic):
+    assert tokens.estimate_tokens("") == 0
+    assert tokens.estimate_tokens(None) == 0
+    assert tokens.estimate_tokens("ab") == 1
+    assert tokens.estimate_tokens("x" * 400) == 100
+
+
+def test_token_budget_reports_the_mode_and_both_estimates(heuristic, monkeypatch):
+    monkeypatch.setenv("PROMPT_OUTPUT_MODE", "graph")
+    prompt = get_prompt("Jazz", "beginner")
+
+    assert token_budget(prompt, "beginner") == {
+        "output_mode": "graph",
+        "prompt_estimate": tokens.estimate_tokens(prompt),
+        "completion_estimate": expected_completion_tokens("beginner", "graph"),
+    }
+
+
+def test_graph_only_responses_get_flat_lists_derived_from_node_labels():
+    nodes = [
+        {"id": "core", "type": "core", "label": "Jazz", "description": "Music"},
+        {"id": "sub1", "type": "sub", "label": "Improvisation", "description": ""},
+        {"id": "sub2", "type": "sub", "label": "Swing", "description": ""},
+        {"id": "con1", "type": "contradiction", "label": "Hard to notate", "description": ""},
+        {"id": "ex1", "type": "example", "label": "Kind of Blue", "description": ""},
+    ]
+    links = [{"source": "core", "target": n["id"]} for n in nodes[1:]]
+
+    data = GraphNormalizer().normalize({"graph_nodes": nodes, "graph_links": links}, "Jazz")
+    given = GraphNormalizer().normalize(
+        {"graph_nodes": nodes, "graph_links": links, "sub_ideas": ["Rhythm"]}, "Jazz"
+    )
+
+    assert data["sub_ideas"] == ["Improvisation", "Swing"]
+    assert data["contradictions"] == ["Hard to notate"]
+    assert data["adjacent_fields"] == []
+    assert data["real_world_examples"] == ["Kind of Blue"]
+    assert given["sub_ideas"] == ["Rhythm"] and given["contradictions"] == ["Hard to notate"]
@@ -0,0 +1,57 @@
+import asyncio
+
+import httpx
+import pytest
+from openai import APIStatusError, APITimeoutError
+
+from rate_limiter import ProviderLimiter, AdaptiveConcurrencyLimit, SharedTokenBucket
+from shared_state import MemorySharedState
+
+REQUEST = httpx.Request("POST", "https://provider.test/v1/chat/completions")
+
+
+def _limit_after(error=None, throttled=False) -> float:
+    limiter = ProviderLimiter(concurrency=AdaptiveConcurrencyLimit(initial=8))
+
+    async def call():
+        async with limiter.slot() as outcome:
+            outcome["throttled"] = throttled
+            if error is not None:
+                raise error
+
+    try:
+        asyncio.run(call())
+    except BaseException:
+        pass
+    return limiter.concurrency.limit
+
+
+def test_only_completed_calls_grow_the_limit():
+    assert _limit_after() > 8
+
+
+@pytest.mark.parametrize("error", [
+    APITimeoutError(REQUEST),
+    APIStatusError("bad gateway", response=httpx.Response(502, request=REQUEST), body=None),
+])
+def test_timeouts_and_server_errors_shrink_the_limit(error):
+    assert _limit_after(error) < 8
+
+
+def test_other_failures_leave_the_limit_unchanged():
+    assert _limit_after(ValueError("not JSON")) == 8
+    assert _limit_after(APIStatusError("bad request", response=httpx.Response(400, request=REQUEST), body=None)) == 8
+
+
+def test_throttled_call_shrinks_the_limit():
+    assert _limit_after(throttled=True) < 8
+
+
+def test_shared_budget_fails_open_when_the_state_is_unavailable():
+    class Locked(MemorySharedState):
+        def bucket(self, *args):
+            raise RuntimeError("database is locked")
+
+    bucket = SharedTokenBucket(Locked(), "rpm", 60)
+    bucket.consume(1)
+    assert bucket.wait_time(1) == 0.0
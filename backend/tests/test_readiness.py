@@ -0,0 +1,103 @@
+import time
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import llm_client
+from readiness import Readiness
+from rate_limiter import ProviderLimiter
+
+
+class _Endpoint:
+    def __init__(self, last_ok):
+        self.last_ok = last_ok
+
+
+class _Client:
+    """LLMClient stand-in: one endpoint whose probe succeeds after `probe_delay`."""
+
+    api_key = "mock"
+
+    def __init__(self, last_ok=None, probe_ok=True, probe_delay=0.0):
+        self.pool = type("Pool", (), {"endpoints": [_Endpoint(last_ok)]})()
+        self.limiter = ProviderLimiter(max_queue=10)
+        self.probe_ok = probe_ok
+        self.probe_delay = probe_delay
+        self.probes = 0
+
+    async def warm_up(self):
+        self.probes += 1
+        await asyncio.sleep(self.probe_delay)
+        if self.probe_ok:
+            self.pool.endpoints[0].last_ok = time.monotonic()
+        return int(self.probe_ok)
+
+
+@pytest.fixture
+def setup(monkeypatch):
+    readiness = Readiness(probe_timeout=0.5)
+    client = _Client(last_ok=time.monotonic())
+    monkeypatch.setattr(main, "get_readiness", lambda: readiness)
+    monkeypatch.setattr(llm_client, "get_llm_client", lambda: client)
+    return readiness, client, TestClient(main.app)
+
+
+def test_not_ready_while_warming_up(setup):
+    readiness, _, http = setup
+    response = http.get("/readyz")
+
+    assert response.status_code == 503
+    assert response.json()["checks"]["warm"] is False
+    assert http.get("/livez").status_code == 200
+
+
+def test_ready_once_warm_with_a_reachable_provider(setup):
+    readiness, _, http = setup
+    readiness.warm_seconds = 0.1
+
+    response = http.get("/readyz")
+    assert response.status_code == 200 and response.json()["ready"] is True
+
+
+def test_not_ready_while_draining(setup):
+    readiness, _, http = setup
+    readiness.warm_seconds = 0.1
+    asyncio.run(readiness.stop())
+
+    response = http.get("/readyz")
+    assert response.status_code == 503
+    assert response.json()["checks"]["draining"] is True
+
+
+def test_not_ready_when_the_limiter_queue_is_nearly_full(setup):
+    readiness, client, http = setup
+    readiness.warm_seconds = 0.1
+    client.limiter.waiting = 8
+
+    assert http.get("/readyz").status_code == 503
+
+
+def test_concurrent_checks_share_one_provider_probe(monkeypatch):
+    readiness = Readiness(probe_timeout=1)
+    readiness.warm_seconds = 0.1
+    client = _Client(probe_delay=0.05)
+    monkeypatch.setattr(llm_client, "get_llm_client", lambda: client)
+
+    async def scenario():
+        return await asyncio.gather(*(readiness.check() for _ in range(5)))
+
+    reports = asyncio.run(scenario())
+    assert all(report["ready"] for report in reports)
+    assert client.probes == 1
+
+
+def test_unreachable_provider_is_not_ready(setup):
+    readiness, client, http = setup
+    readiness.warm_seconds = 0.1
+    client.pool.endpoints[0].last_ok = None
+    client.probe_ok = False
+
+    response = http.get("/readyz")
+    assert response.status_code == 503 and response.json()["checks"]["provider"] is False
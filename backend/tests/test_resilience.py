@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from resilience import hedged
+
+
+def _copies(*behaviours):
+    """A `call` whose n-th invocation runs behaviours[n]."""
+    started = iter(behaviours)
+    return lambda: next(started)()
+
+
+def test_cancelled_copy_falls_back_to_the_other_one():
+    async def slow_then_cancelled():
+        await asyncio.sleep(10)
+
+    async def answer():
+        await asyncio.sleep(0.05)
+        return "second"
+
+    async def scenario():
+        call = _copies(slow_then_cancelled, answer)
+        task = asyncio.ensure_future(hedged(call, 0.01))
+        await asyncio.sleep(0.02)
+        # Cancel the first copy from outside while the hedge is in flight
+        first = [t for t in asyncio.all_tasks() if t.get_coro().__name__ == "slow_then_cancelled"][0]
+        first.cancel()
+        return await task
+
+    assert asyncio.run(scenario()) == ("second", True)
+
+
+def test_first_copy_cancelled_before_the_delay_still_hedges():
+    async def cancelled():
+        raise asyncio.CancelledError()
+
+    async def answer():
+        return "second"
+
+    call = _copies(cancelled, answer)
+    assert asyncio.run(hedged(call, 0.05)) == ("second", True)
+
+
+def test_error_is_raised_when_every_copy_fails():
+    async def fails():
+        await asyncio.sleep(0.02)
+        raise ValueError("provider down")
+
+    call = _copies(fails, fails)
+    with pytest.raises(ValueError):
+        asyncio.run(hedged(call, 0.01))
@@ -0,0 +1,65 @@
+import json
+
+from semantic_cache import SemanticCache, load_aliases, ALIASES
+
+PARTITION = ("map", "intermediate", "model", "prompt")
+
+
+def test_unrelated_topic_with_same_initials_is_not_served_an_acronym():
+    cache = SemanticCache()
+    cache.add(PARTITION, "ML", "k1")
+
+    assert cache.lookup(PARTITION, "Music Licensing") is None
+
+
+def test_acronym_is_not_served_an_unrelated_expansion():
+    cache = SemanticCache()
+    cache.add(PARTITION, "Mobile Legends", "k1")
+
+    assert cache.lookup(PARTITION, "ML") is None
+
+
+def test_known_acronym_matches_its_expansion_with_real_similarity():
+    cache = SemanticCache()
+    cache.add(PARTITION, "machine learning", "k1")
+
+    match, key, similarity = cache.lookup(PARTITION, "intro to ML")
+    assert (match, key) == ("machine learning", "k1")
+    assert cache.threshold <= similarity <= 1.0 + 1e-6
+    assert cache.lookup(PARTITION, "Music Licensing") is None
+
+
+def test_unknown_acronym_never_matches_by_initials():
+    cache = SemanticCache()
+    cache.add(PARTITION, "Graph Neural Networks", "k1")
+
+    assert cache.lookup(PARTITION, "GNN") is None
+
+
+def test_alias_file_extends_the_builtin_table(tmp_path):
+    path = tmp_path / "aliases.json"
+    path.write_text(json.dumps({"GNN": "graph neural networks"}))
+    cache = SemanticCache(aliases=load_aliases(str(path)))
+    cache.add(PARTITION, "Graph Neural Networks", "k1")
+
+    assert cache.lookup(PARTITION, "GNN")[1] == "k1"
+    assert set(ALIASES) <= set(cache.aliases)
+
+
+def test_languages_that_differ_only_in_symbols_do_not_match():
+    cache = SemanticCache()
+    cache.add(PARTITION, "C++", "cpp")
+    cache.add(PARTITION, "Node.js", "node")
+
+    assert cache.lookup(PARTITION, "C#") is None
+    assert cache.lookup(PARTITION, "C") is None
+    assert cache.lookup(PARTITION, "intro to C++")[1] == "cpp"
+    assert cache.lookup(PARTITION, "Node") is None
+
+
+def test_fusion_does_not_merge_labels_that_differ_only_in_symbols():
+    from fusion import align_nodes
+
+    nodes_a = [{"id": "a1", "label": "C++"}]
+    nodes_b = [{"id": "b1", "label": "C#"}, {"id": "b2", "label": "C++"}]
+    assert align_nodes(nodes_a, nodes_b, 0.8) == {"b2": "a1"}
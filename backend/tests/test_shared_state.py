@@ -0,0 +1,59 @@
+import time
+import sqlite3
+
+import pytest
+
+from shared_state import SqliteSharedState, MemorySharedState
+
+
+def _expire(state: SqliteSharedState, key: str) -> None:
+    state._connection().execute("UPDATE shared_kv SET expires_at = ? WHERE key = ?", (time.time() - 1, key))
+
+
+def _rows(state: SqliteSharedState) -> int:
+    return state._connection().execute("SELECT COUNT(*) FROM shared_kv").fetchone()[0]
+
+
+def test_sqlite_state_deletes_expired_rows_every_n_writes(tmp_path):
+    state = SqliteSharedState(str(tmp_path / "state.db"), purge_every=3)
+    state.set("old", "x", ttl=60)
+    state.set("kept", "y")
+    _expire(state, "old")
+    assert _rows(state) == 2
+
+    state.set_if_absent("lock", "owner", 60)  # third write
+    assert state.get("old") is None and _rows(state) == 2
+    assert state.get("kept") == "y"
+
+
+def test_sqlite_state_purges_on_open_and_on_demand(tmp_path):
+    path = str(tmp_path / "state.db")
+    state = SqliteSharedState(path)
+    state.set("a", "1", ttl=60)
+    state.set("b", "2", ttl=60)
+    _expire(state, "a")
+
+    assert _rows(SqliteSharedState(path)) == 1
+    _expire(state, "b")
+    assert state.purge_expired() == 1
+
+
+def test_memory_state_purges_expired_keys():
+    state = MemorySharedState()
+    state.set("a", "1", ttl=0.01)
+    state.set("b", "2")
+    time.sleep(0.02)
+    assert state.purge_expired() == 1 and state.get("b") == "2"
+
+
+def test_sqlite_state_gives_up_quickly_on_a_locked_database(tmp_path):
+    path = str(tmp_path / "state.db")
+    state = SqliteSharedState(path, timeout=0.05)
+    state.set("k", "v")
+    writer = sqlite3.connect(path, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    started = time.monotonic()
+    with pytest.raises(sqlite3.OperationalError):
+        state.set("k", "w")
+    assert time.monotonic() - started < 1
+    writer.execute("ROLLBACK")
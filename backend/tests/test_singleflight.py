@@ -0,0 +1,109 @@
+import asyncio
+
+from singleflight import SingleFlight, SharedSingleFlight
+from shared_state import MemorySharedState
+
+
+def _counted(result, delay=0.05, error=None):
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return result
+    return fn, calls
+
+
+def test_concurrent_calls_with_one_key_share_one_execution():
+    flight = SingleFlight()
+    fn, calls = _counted({"topic": "x"})
+
+    async def scenario():
+        return await asyncio.gather(flight.do("k", fn), flight.do("k", fn), flight.do("other", fn))
+
+    assert asyncio.run(scenario()) == [{"topic": "x"}] * 3
+    assert len(calls) == 2
+    assert flight.stats() == {"calls": 2, "coalesced": 1, "in_flight": 0}
+
+
+def test_errors_reach_every_waiter_and_the_key_is_retried_afterwards():
+    flight = SingleFlight()
+    failing, _ = _counted(None, error=ValueError("provider down"))
+
+    async def scenario():
+        return await asyncio.gather(flight.do("k", failing), flight.do("k", failing), return_exceptions=True)
+
+    assert [type(r) for r in asyncio.run(scenario())] == [ValueError, ValueError]
+    fn, calls = _counted("fresh", delay=0)
+    assert asyncio.run(flight.do("k", fn)) == "fresh" and calls == [1]
+
+
+def test_a_cancelled_caller_does_not_cancel_the_call_for_the_others():
+    flight = SingleFlight()
+    fn, calls = _counted("done")
+
+    async def scenario():
+        leaving = asyncio.ensure_future(flight.do("k", fn))
+        staying = asyncio.ensure_future(flight.do("k", fn))
+        await asyncio.sleep(0.01)
+        leaving.cancel()
+        return await staying, leaving
+
+    result, leaving = asyncio.run(scenario())
+    assert result == "done" and leaving.cancelled() and calls == [1]
+
+
+def test_the_call_is_cancelled_once_every_caller_has_gone():
+    flight = SingleFlight()
+    cancelled = []
+
+    async def fn():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def scenario():
+        callers = [asyncio.ensure_future(flight.do("k", fn)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert cancelled == [True] and "k" not in flight
+
+
+def test_workers_sharing_state_make_one_call():
+    state = MemorySharedState()
+    first, second = SharedSingleFlight(state), SharedSingleFlight(state)
+    fn, calls = _counted({"topic": "shared"}, delay=0.1)
+
+    async def scenario():
+        return await asyncio.gather(first.do("k", fn), second.do("k", fn))
+
+    assert asyncio.run(scenario()) == [{"topic": "shared"}] * 2
+    assert calls == [1] and second.remote_coalesced == 1
+
+
+class _LockedAfterClaim(MemorySharedState):
+    """Another worker holds the lock, then the database locks up on reads."""
+
+    def set_if_absent(self, key, value, ttl):
+        return False
+
+    def get(self, key):
+        raise RuntimeError("database is locked")
+
+
+def test_unreadable_shared_state_falls_back_to_calling_directly():
+    flight = SharedSingleFlight(_LockedAfterClaim(), wait_timeout=5)
+
+    async def call():
+        return {"topic": "direct"}
+
+    assert asyncio.run(flight.do("k", call)) == {"topic": "direct"}
@@ -0,0 +1,156 @@
+import asyncio
+
+import pytest
+
+import llm_client
+from llm_client import LLMClient
+from usage import UsageAccountant, UsageStore, QuotaExceeded, current_client, client_id, _api_key
+
+USAGE = {"prompt_tokens": 100, "completion_tokens": 400}
+
+
+@pytest.fixture
+def accountant(tmp_path, monkeypatch):
+    # alice has no requests left; bob and carol are unlimited
+    accountant = UsageAccountant(
+        UsageStore(str(tmp_path / "usage.db")), quotas={"alice": {"requests": 1}, "dave": {"requests": 2}}
+    )
+    token = current_client.set("alice")
+    accountant.record(0, 0, 0.1)
+    current_client.reset(token)
+    monkeypatch.setattr(llm_client, "get_usage_accountant", lambda: accountant)
+    return accountant
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = LLMClient()
+    provider_calls = []
+
+    async def generate(prompt, expected_tokens=None):
+        provider_calls.append(prompt)
+        await asyncio.sleep(0.05)
+        return {"topic": prompt, "metadata": {"usage": USAGE}}
+
+    monkeypatch.setattr(client, "_generate_cognitive_map", generate)
+    client.provider_calls = provider_calls
+    return client
+
+
+async def _as(client_name: str, coroutine_factory):
+    current_client.set(client_name)
+    return await coroutine_factory()
+
+
+def _coalesced(client, callers):
+    async def scenario():
+        return await asyncio.gather(
+            *(_as(name, lambda: client.generate_cognitive_map("same prompt")) for name in callers),
+            return_exceptions=True
+        )
+    return asyncio.run(scenario())
+
+
+def _charged(accountant, name):
+    return accountant._used.get(name, [0, 0])
+
+
+def test_over_quota_leader_does_not_fail_coalesced_callers(accountant, client):
+    alice, bob = _coalesced(client, ["alice", "bob"])
+
+    assert isinstance(alice, QuotaExceeded)
+    assert bob["topic"] == "same prompt"
+    assert client.provider_calls == ["same prompt"]
+    assert _charged(accountant, "bob") == [500, 1]
+    assert _charged(accountant, "alice") == [0, 1]
+
+
+def test_over_quota_caller_gets_no_free_result_from_another_flight(accountant, client):
+    bob, alice = _coalesced(client, ["bob", "alice"])
+
+    assert bob["topic"] == "same prompt"
+    assert isinstance(alice, QuotaExceeded)
+
+
+def test_every_coalesced_caller_is_charged(accountant, client):
+    bob, carol = _coalesced(client, ["bob", "carol"])
+
+    assert bob == carol
+    assert client.provider_calls == ["same prompt"]
+    assert _charged(accountant, "bob") == [500, 1]
+    assert _charged(accountant, "carol") == [500, 1]
+
+
+def test_concurrent_calls_cannot_overrun_the_quota(accountant, client):
+    async def scenario():
+        return await asyncio.gather(
+            *(_as("dave", lambda p=p: client.generate_cognitive_map(p)) for p in ("one", "two", "three")),
+            return_exceptions=True
+        )
+    results = asyncio.run(scenario())
+
+    assert [isinstance(r, QuotaExceeded) for r in results] == [False, False, True]
+    assert sorted(client.provider_calls) == ["one", "two"]
+    assert _charged(accountant, "dave") == [1000, 2]
+    assert accountant._reserved == {}
+
+
+def test_failed_call_releases_its_reservation(accountant, client, monkeypatch):
+    async def fail(prompt, expected_tokens=None):
+        raise ValueError("provider down")
+
+    monkeypatch.setattr(client, "_generate_cognitive_map", fail)
+    with pytest.raises(ValueError):
+        asyncio.run(_as("dave", lambda: client.generate_cognitive_map("x")))
+
+    assert accountant._reserved == {}
+    # The failed call counts once; the reservation does not count again
+    assert _charged(accountant, "dave") == [0, 1]
+    token = current_client.set("dave")
+    assert accountant.check(0) == ("dave", 0)
+    current_client.reset(token)
+
+
+def test_api_key_takes_precedence_over_client_header():
+    keyed = client_id("script-run-1", "sk-secret", "10.0.0.1")
+
+    assert keyed.startswith("key:") and "sk-secret" not in keyed
+    # A new header value does not give a keyed caller a fresh quota
+    assert client_id("script-run-2", "sk-secret", "10.0.0.1") == keyed
+    assert client_id("script-run-1", "sk-other", "10.0.0.1") != keyed
+
+
+def test_client_header_and_address_apply_without_a_key():
+    assert client_id("dashboard", None, "10.0.0.1") == "dashboard"
+    assert client_id(None, None, "10.0.0.1") == "10.0.0.1"
+    assert client_id(None, None, None) == "anonymous"
+
+
+def test_bearer_token_counts_as_api_key():
+    assert _api_key("Bearer sk-secret", None) == "sk-secret"
+    assert _api_key("Basic abc", None) is None
+    assert _api_key("Bearer sk-secret", "sk-header") == "sk-header"
+
+
+def test_configured_keys_are_the_only_way_to_a_separate_quota():
+    keys = {"sk-team"}
+    assert client_id("script", "sk-team", "10.0.0.1", keys).startswith("key:")
+    # Unknown keys and self-chosen headers are accounted to the address
+    assert client_id("script", "sk-random", "10.0.0.1", keys) == "10.0.0.1"
+    assert client_id("script-run-2", None, "10.0.0.1", keys) == "10.0.0.1"
+
+
+def test_usage_report_shows_other_clients_only_to_the_admin_key(accountant, monkeypatch):
+    from fastapi.testclient import TestClient
+    import routes
+    from main import app
+
+    monkeypatch.setattr(routes, "get_usage_accountant", lambda: accountant)
+    monkeypatch.setenv("USAGE_ADMIN_KEY", "sk-admin")
+    http = TestClient(app)
+
+    own = http.get("/usage", headers={"X-Client-Id": "bob"}).json()
+    assert [c["client"] for c in own["clients"]] == []
+    assert http.get("/usage?client=alice", headers={"X-Client-Id": "bob"}).status_code == 403
+    everyone = http.get("/usage", headers={"X-API-Key": "sk-admin"}).json()
+    assert "alice" in [c["client"] for c in everyone["clients"]]
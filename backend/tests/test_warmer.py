@@ -0,0 +1,105 @@
+import pytest
+
+import warmer
+from warmer import CacheWarmer, DecayingCountMinSketch
+
+
+def test_warmer_is_off_unless_enabled(monkeypatch):
+    monkeypatch.setattr(warmer, "cache_warmer", None)
+    monkeypatch.delenv("WARM_ENABLED", raising=False)
+    assert warmer.get_cache_warmer() is None
+
+
+def test_tracked_keys_are_trimmed_in_batches_keeping_the_hottest():
+    cache_warmer = CacheWarmer(top_k=2)
+    for _ in range(5):
+        cache_warmer.record("Popular", "intermediate")
+    for i in range(14):
+        cache_warmer.record(f"Rare {i}", "intermediate")
+    assert len(cache_warmer._tracked) == 15
+
+    cache_warmer.record("Rare 14", "intermediate")  # 8 x top_k: trim
+    assert len(cache_warmer._tracked) == 8
+    assert "intermediate:popular" in cache_warmer._tracked
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def test_sketch_counts_decay_by_half_every_half_life(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(warmer.time, "monotonic", clock.monotonic)
+    sketch = DecayingCountMinSketch(width=256, depth=4, half_life=100)
+    for _ in range(8):
+        sketch.add("intermediate:rust")
+
+    assert sketch.estimate("intermediate:rust") == pytest.approx(8)
+    assert sketch.estimate("intermediate:go") == 0
+    clock.now += 100
+    assert sketch.estimate("intermediate:rust") == pytest.approx(4)
+    # New requests count in full next to the decayed ones
+    assert sketch.add("intermediate:rust") == pytest.approx(5)
+    clock.now += 200
+    assert sketch.estimate("intermediate:rust") == pytest.approx(1.25)
+
+
+def test_sketch_rescales_before_weights_lose_precision(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(warmer.time, "monotonic", clock.monotonic)
+    sketch = DecayingCountMinSketch(width=64, depth=2, half_life=1)
+    sketch.add("k")
+    clock.now += 45  # 2**45 > 1e12
+    sketch.add("k")
+
+    assert sketch._epoch == clock.now
+    assert sketch.estimate("k") == pytest.approx(1 + 2 ** -45)
+
+
+class _Cache:
+    """ResponseCache stand-in with fixed remaining TTLs per topic."""
+
+    def __init__(self, remaining):
+        self.remaining = remaining
+        self.memory = type("Memory", (), {"ttl": 1000})()
+
+    def ttl_remaining(self, key):
+        return self.remaining.get(key)
+
+
+@pytest.fixture
+def cached(monkeypatch):
+    from map_service import topic_cache_key
+
+    llm = type("LLM", (), {"model": "m"})()
+    remaining = {
+        topic_cache_key("Fresh", "intermediate", "m"): 900,
+        topic_cache_key("Expiring", "intermediate", "m"): 100,  # under the 20% margin
+    }
+    monkeypatch.setattr(warmer, "get_response_cache", lambda: _Cache(remaining))
+    monkeypatch.setattr(warmer, "get_llm_client", lambda: llm)
+
+
+def test_schedule_queues_popular_maps_that_are_missing_or_expiring(cached):
+    cache_warmer = CacheWarmer(top_k=10, min_requests=3, seeds=[("Seeded", "beginner")])
+    for topic, requests in (("Fresh", 5), ("Expiring", 4), ("Missing", 9), ("Rare", 1)):
+        for _ in range(requests):
+            cache_warmer.record(topic, "intermediate")
+
+    assert cache_warmer.schedule() == 3
+    assert [topic for _, _, topic, _ in cache_warmer._queue] == ["Missing", "Expiring", "Seeded"]
+    # Already queued keys are not queued twice
+    assert cache_warmer.schedule() == 0
+
+
+def test_candidates_are_ranked_and_capped_at_top_k(cached):
+    cache_warmer = CacheWarmer(top_k=2, min_requests=1)
+    for topic, requests in (("A", 3), ("B", 5), ("C", 1)):
+        for _ in range(requests):
+            cache_warmer.record(topic, "expert")
+
+    assert [topic for _, _, topic, _ in cache_warmer.candidates()] == ["B", "A"]
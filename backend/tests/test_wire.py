@@ -0,0 +1,109 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import routes
+from main import app
+from map_store import MapStore
+from wire import compact_map, compact_delta, negotiate_encoding
+
+MAP = {
+    "topic": "Rust",
+    "core_idea": "A systems language",
+    "graph_nodes": [
+        {"id": "core", "type": "core", "label": "Rust", "description": "Memory safety"},
+        {"id": "sub1", "type": "sub", "label": "Ownership", "description": "One owner"},
+        {"id": "sub2", "type": "sub", "label": "Traits", "description": "Shared behaviour"},
+    ],
+    "graph_links": [{"source": "core", "target": "sub1"}, {"source": "core", "target": "sub2"}],
+}
+
+
+def _version(data, added=(), relabel=None, removed=()):
+    nodes = [dict(node) for node in data["graph_nodes"] if node["id"] not in removed]
+    for node in nodes:
+        if relabel and node["id"] == relabel[0]:
+            node["label"] = relabel[1]
+    links = [link for link in data["graph_links"] if link["target"] not in removed]
+    for node_id, parent in added:
+        nodes.append({"id": node_id, "type": "sub", "label": node_id.title(), "description": ""})
+        links.append({"source": parent, "target": node_id})
+    return {**data, "graph_nodes": nodes, "graph_links": links}
+
+
+def _decode(compact):
+    strings = compact["strings"]
+    nodes = {strings[row[0]]: (strings[row[1]], strings[row[2]]) for row in compact["nodes"]}
+    links = {(strings[s], strings[t]) for s, t in compact["links"]}
+    return nodes, links
+
+
+def _apply(compact, delta):
+    nodes, links = _decode(compact)
+    changed, added = _decode(delta)
+    nodes.update(changed)
+    links |= added
+    for index in delta["removed_nodes"]:
+        nodes.pop(delta["strings"][index], None)
+    links -= {(delta["strings"][s], delta["strings"][t]) for s, t in delta["removed_links"]}
+    return nodes, links
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MapStore(str(tmp_path / "maps.db"))
+    store.save("m1", MAP, "intermediate", "model", "hash")
+    v2 = _version(MAP, added=[("sub1a", "sub1")], relabel=("sub2", "Traits and generics"))
+    store.update("m1", v2)
+    store.update("m1", _version(v2, removed=["sub1"], added=[("sub3", "core")]))
+    return store
+
+
+def test_delta_turns_an_old_version_into_the_current_one(store):
+    history = [MAP, _version(MAP, added=[("sub1a", "sub1")], relabel=("sub2", "Traits and generics"))]
+    current = store.get("m1")
+    for since, old in enumerate(history, 1):
+        delta = compact_delta("m1", 3, since, current, store.changes("m1", since, 3))
+        assert _apply(compact_map("m1", since, old), delta) == _decode(compact_map("m1", 3, current))
+
+
+def test_delta_lists_only_what_changed(store):
+    delta = compact_delta("m1", 3, 2, store.get("m1"), store.changes("m1", 2, 3))
+    strings = delta["strings"]
+
+    assert [strings[row[0]] for row in delta["nodes"]] == ["sub3"]
+    assert [strings[i] for i in delta["removed_nodes"]] == ["sub1"]
+    assert {(strings[s], strings[t]) for s, t in delta["removed_links"]} == {("core", "sub1")}
+
+
+@pytest.fixture
+def http(store, monkeypatch):
+    monkeypatch.setattr(routes, "get_map_store", lambda: store)
+    monkeypatch.setenv("WIRE_COMPRESS_MIN_BYTES", "0")
+    return TestClient(app)
+
+
+def test_matching_etag_gets_a_304_for_every_encoding(http):
+    plain = http.get("/maps/m1", headers={"Accept-Encoding": "identity"})
+    zipped = http.get("/maps/m1", headers={"Accept-Encoding": "gzip"})
+    assert plain.status_code == zipped.status_code == 200
+    assert zipped.headers["Content-Encoding"] == "gzip" and "Content-Encoding" not in plain.headers
+    assert plain.headers["ETag"] == zipped.headers["ETag"] and plain.headers["ETag"].startswith("W/")
+
+    for encoding in ("identity", "gzip"):
+        again = http.get("/maps/m1", headers={"If-None-Match": plain.headers["ETag"], "Accept-Encoding": encoding})
+        assert again.status_code == 304 and again.content == b""
+    assert http.get("/maps/m1", headers={"If-None-Match": 'W/"m1.2"'}).status_code == 200
+
+
+def test_delta_route_sends_changes_since_the_given_version(http):
+    delta = http.get("/maps/m1?since=2").json()
+    assert delta["since"] == 2 and delta["version"] == 3
+    assert http.get("/maps/m1?since=2").headers["ETag"] != http.get("/maps/m1?since=1").headers["ETag"]
+
+
+def test_encoding_negotiation_honours_q_values(monkeypatch):
+    monkeypatch.setattr("wire.brotli", None)
+    assert negotiate_encoding("gzip;q=0.5, br") == "gzip"
+    assert negotiate_encoding("gzip;q=0") is None
+    assert negotiate_encoding("GZIP") == "gzip"
+    assert negotiate_encoding(None) is None
@@ -0,0 +1,34 @@
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    """Load a tiktoken encoding if the package is installed; otherwise fall back to a heuristic."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = None
+    return _encoding
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """
+    Estimate the token count of `text`.
+    Uses tiktoken's cl100k_base when available (close to Llama 3 counts for English),
+    else ~4 characters per token.
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return max(1, round(len(text) / 4))
@@ -0,0 +1,426 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import hmac
+import hashlib
+import logging
+import contextvars
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+from rate_limiter import RateLimitExceeded
+
+logger = logging.getLogger(__name__)
+
+# Who the current request (or background job) is working for; None for the app's own work
+current_client: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("usage_client", default=None)
+
+SYSTEM_CLIENT = "system"
+
+# Counter slots per client
+CALLS, ERRORS, REJECTED, PROMPT_TOKENS, COMPLETION_TOKENS, LATENCY_MS = range(6)
+COUNTERS = ("calls", "errors", "rejected", "prompt_tokens", "completion_tokens", "latency_ms")
+
+
+class QuotaExceeded(RateLimitExceeded):
+    """A client used up its token or request quota for the current window. Maps to 429 + Retry-After."""
+
+
+def _fingerprint(api_key: str) -> str:
+    return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+
+
+def client_id(client_header: Optional[str], api_key: Optional[str], address: Optional[str],
+              api_keys: Optional[Set[str]] = None) -> str:
+    """
+    Who a request is accounted to: a fingerprint of its API key (the key itself
+    is never stored), else the X-Client-Id header, else the caller's address.
+
+    Without `api_keys` nothing is validated: a caller can claim any key or header,
+    so quotas are advisory and only hold for well-behaved clients. With `api_keys`
+    (USAGE_API_KEYS) only those keys are accounted to; every other request is
+    accounted to its address, so a new key or header value does not get a fresh quota.
+    """
+    if api_keys is None:
+        if api_key:
+            return _fingerprint(api_key)
+        if client_header:
+            return client_header[:128]
+        return address or "anonymous"
+    if api_key and any(hmac.compare_digest(api_key, known) for known in api_keys):
+        return _fingerprint(api_key)
+    return address or "anonymous"
+
+
+def load_api_keys() -> Optional[Set[str]]:
+    """The keys in USAGE_API_KEYS (comma separated); None when unset, i.e. keys are not validated."""
+    keys = {key.strip() for key in os.getenv("USAGE_API_KEYS", "").split(",") if key.strip()}
+    return keys or None
+
+
+def is_admin(authorization: Optional[str], x_api_key: Optional[str]) -> bool:
+    """Whether the request carries USAGE_ADMIN_KEY, which may read every client's usage."""
+    admin_key = os.getenv("USAGE_ADMIN_KEY", "")
+    api_key = _api_key(authorization, x_api_key)
+    return bool(admin_key and api_key and hmac.compare_digest(api_key, admin_key))
+
+
+def _api_key(authorization: Optional[str], x_api_key: Optional[str]) -> Optional[str]:
+    if x_api_key:
+        return x_api_key
+    if authorization and authorization[:7].lower() == "bearer ":
+        return authorization[7:].strip()
+    return None
+
+
+class UsageMiddleware:
+    """ASGI middleware that sets `current_client` for the duration of each HTTP request."""
+
+    def __init__(self, app, api_keys: Optional[Set[str]] = None):
+        self.app = app
+        self.api_keys = api_keys if api_keys is not None else load_api_keys()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = {}
+        for name, value in scope["headers"]:
+            if name in (b"x-client-id", b"x-api-key", b"authorization"):
+                headers[name] = value.decode("latin-1")
+        address = scope["client"][0] if scope.get("client") else None
+        client = client_id(
+            headers.get(b"x-client-id"), _api_key(headers.get(b"authorization"), headers.get(b"x-api-key")), address,
+            self.api_keys
+        )
+        token = current_client.set(client)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_client.reset(token)
+
+
+class UsageStore:
+    """SQLite table of usage counters per client and time bucket."""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS usage (
+                client TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                calls INTEGER NOT NULL DEFAULT 0,
+                errors INTEGER NOT NULL DEFAULT 0,
+                rejected INTEGER NOT NULL DEFAULT 0,
+                prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                completion_tokens INTEGER NOT NULL DEFAULT 0,
+                latency_ms REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (client, bucket)
+            );
+            CREATE INDEX IF NOT EXISTS usage_bucket ON usage (bucket);
+            """
+        )
+        self._conn.commit()
+
+    def add(self, rows: List[Tuple]) -> None:
+        """Add (client, bucket, *COUNTERS) rows onto the stored totals in one transaction."""
+        with self._conn:
+            self._conn.executemany(
+                f"INSERT INTO usage (client, bucket, {', '.join(COUNTERS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (client, bucket) DO UPDATE SET "
+                + ", ".join(f"{name} = {name} + excluded.{name}" for name in COUNTERS),
+                rows
+            )
+
+    def totals(self, since: float, until: Optional[float] = None, client: Optional[str] = None) -> Dict[str, List[float]]:
+        """Summed counters per client over the buckets starting in [since, until)."""
+        query = f"SELECT client, {', '.join(f'SUM({name})' for name in COUNTERS)} FROM usage WHERE bucket >= ?"
+        params: List[Any] = [since]
+        if until is not None:
+            query += " AND bucket < ?"
+            params.append(until)
+        if client is not None:
+            query += " AND client = ?"
+            params.append(client)
+        rows = self._conn.execute(query + " GROUP BY client", params).fetchall()
+        return {row[0]: list(row[1:]) for row in rows}
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class UsageAccountant:
+    """
+    Per-client accounting of provider calls, tokens and latency, with token and
+    request (provider call) quotas per fixed window.
+
+    The hot path (check before a provider call, record after it) only touches
+    in-memory counters. `check` reserves the call's estimate until it is released,
+    so concurrent calls from one client cannot all pass against the same balance. They are used from the event loop alone, so no locks are
+    needed. Every `flush_interval` seconds the counters are swapped out and added
+    to SQLite in one batch, and the quota totals are re-read from it, so with
+    several workers sharing the file each sees the others' usage within one
+    interval.
+    """
+
+    def __init__(self, store: UsageStore, bucket_seconds: int = 3600, window_seconds: int = 86400,
+                 token_quota: int = 0, request_quota: int = 0,
+                 quotas: Optional[Dict[str, Dict[str, int]]] = None, flush_interval: float = 5):
+        self.store = store
+        self.bucket_seconds = bucket_seconds
+        self.window_seconds = window_seconds
+        self.default_quota = (token_quota, request_quota)
+        self.quotas = {client: (q.get("tokens", token_quota), q.get("requests", request_quota)) for client, q in (quotas or {}).items()}
+        self.flush_interval = flush_interval
+        # Counters not yet flushed, per bucket: {bucket start: {client: [COUNTERS]}}
+        self._pending: Dict[int, Dict[str, list]] = {}
+        self._current: Dict[str, list] = {}
+        self._bucket_end = 0.0
+        # Quota usage in the current window per client, [tokens, calls]: the totals in
+        # SQLite as of the last flush plus what this process recorded since
+        self._window_end = 0.0
+        self._used: Dict[str, list] = {}
+        # Calls checked but not finished yet per client, [tokens, calls]
+        self._reserved: Dict[str, list] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.rejections = 0
+
+    def _counters(self, client: str, now: float) -> list:
+        if now >= self._bucket_end:
+            bucket = int(now - now % self.bucket_seconds)
+            self._bucket_end = bucket + self.bucket_seconds
+            self._current = self._pending.setdefault(bucket, {})
+        counters = self._current.get(client)
+        if counters is None:
+            counters = self._current[client] = [0, 0, 0, 0, 0, 0.0]
+        return counters
+
+    def _roll_window(self, now: float) -> None:
+        if now >= self._window_end:
+            # A new window starts from zero; the next flush reloads it from SQLite
+            self._window_end = now - now % self.window_seconds + self.window_seconds
+            self._used = {}
+
+    def check(self, estimated_tokens: float = 0) -> Optional[Tuple[str, float]]:
+        """
+        Raise QuotaExceeded if the current client cannot afford one more provider
+        call of `estimated_tokens` in this window, counting its calls still in
+        flight. Otherwise reserve the estimate and return the reservation, which
+        the caller must `release` once the call is recorded or has failed.
+        The app's own work is never limited (returns None).
+        """
+        client = current_client.get()
+        if client is None:
+            return None
+        token_quota, request_quota = self.quotas.get(client, self.default_quota)
+        if not token_quota and not request_quota:
+            return None
+        now = time.time()
+        if now >= self._window_end:
+            self._roll_window(now)
+        used = self._used.get(client, (0, 0))
+        reserved = self._reserved.setdefault(client, [0, 0])
+        over_tokens = token_quota and used[0] + reserved[0] + estimated_tokens > token_quota
+        if over_tokens or (request_quota and used[1] + reserved[1] >= request_quota):
+            self._counters(client, now)[REJECTED] += 1
+            self.rejections += 1
+            if not reserved[1]:
+                del self._reserved[client]
+            kind = "token" if over_tokens else "request"
+            raise QuotaExceeded(f"Client {client} has used its {kind} quota for this window", self._window_end - now)
+        reserved[0] += estimated_tokens
+        reserved[1] += 1
+        return client, estimated_tokens
+
+    def release(self, reservation: Optional[Tuple[str, float]]) -> None:
+        """Drop a reservation made by `check`; the call's actual usage is charged by `record`."""
+        if reservation is None:
+            return
+        client, tokens = reservation
+        reserved = self._reserved.get(client)
+        if reserved is None:
+            return
+        reserved[0] -= tokens
+        reserved[1] -= 1
+        if reserved[1] <= 0:
+            del self._reserved[client]
+
+    def record(self, prompt_tokens: int, completion_tokens: int, latency: float, ok: bool = True) -> None:
+        """
+        Charge the current client for one model call: its own provider call, or
+        one it shared with identical concurrent requests.
+        """
+        client = current_client.get() or SYSTEM_CLIENT
+        now = time.time()
+        counters = self._counters(client, now)
+        counters[CALLS] += 1
+        if not ok:
+            counters[ERRORS] += 1
+        counters[PROMPT_TOKENS] += prompt_tokens
+        counters[COMPLETION_TOKENS] += completion_tokens
+        counters[LATENCY_MS] += latency * 1000
+        if now >= self._window_end:
+            self._roll_window(now)
+        used = self._used.get(client)
+        if used is None:
+            used = self._used[client] = [0, 0]
+        used[0] += prompt_tokens + completion_tokens
+        used[1] += 1
+
+    async def flush(self) -> int:
+        """Write the pending counters to SQLite and reload the window totals. Returns rows written."""
+        pending, self._pending, self._bucket_end = self._pending, {}, 0.0
+        rows = [
+            (client, bucket, *counters)
+            for bucket, clients in pending.items() for client, counters in clients.items()
+        ]
+        self._roll_window(time.time())
+        window_start = self._window_end - self.window_seconds
+        try:
+            totals = await asyncio.to_thread(self._write, rows, window_start)
+        except Exception:
+            # Keep the counters for the next attempt
+            for bucket, clients in pending.items():
+                for client, counters in clients.items():
+                    merged = self._pending.setdefault(bucket, {}).setdefault(client, [0, 0, 0, 0, 0, 0.0])
+                    for i, value in enumerate(counters):
+                        merged[i] += value
+            self._bucket_end = 0.0
+            raise
+        # Recorded while the batch was being written: not in SQLite yet
+        for bucket, clients in self._pending.items():
+            if bucket < window_start:
+                continue
+            for client, counters in clients.items():
+                merged = totals.setdefault(client, [0] * len(COUNTERS))
+                for i in (CALLS, PROMPT_TOKENS, COMPLETION_TOKENS):
+                    merged[i] += counters[i]
+        if window_start == self._window_end - self.window_seconds:
+            self._used = {
+                client: [values[PROMPT_TOKENS] + values[COMPLETION_TOKENS], values[CALLS]]
+                for client, values in totals.items()
+            }
+        self.flushes += 1
+        return len(rows)
+
+    def _write(self, rows: List[Tuple], window_start: float) -> Dict[str, List[float]]:
+        if rows:
+            self.store.add(rows)
+        return self.store.totals(window_start)
+
+    async def start(self) -> None:
+        # Load this window's totals so quotas hold across restarts from the first call
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.warning(f"Could not load usage totals: {str(e)}")
+        self._task = asyncio.ensure_future(self._flusher())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.warning(f"Could not flush usage counters on shutdown: {str(e)}")
+
+    async def _flusher(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning(f"Could not flush usage counters: {str(e)}")
+
+    def quota(self, client: str) -> Dict[str, Any]:
+        token_quota, request_quota = self.quotas.get(client, self.default_quota)
+        self._roll_window(time.time())
+        tokens, calls = self._used.get(client, (0, 0))
+        return {
+            "tokens": token_quota or None,
+            "requests": request_quota or None,
+            "tokens_used": tokens,
+            "requests_used": calls,
+            "resets_at": int(self._window_end)
+        }
+
+    async def report(self, hours: float = 24, client: Optional[str] = None) -> Dict[str, Any]:
+        """Usage per client over the last `hours`, including counters not flushed yet, plus quota state."""
+        now = time.time()
+        since = now - hours * 3600
+        since -= since % self.bucket_seconds
+        totals = await asyncio.to_thread(self.store.totals, since, None, client)
+        for bucket, clients in self._pending.items():
+            if bucket < since:
+                continue
+            for name, counters in clients.items():
+                if client is not None and name != client:
+                    continue
+                merged = totals.setdefault(name, [0] * len(COUNTERS))
+                for i, value in enumerate(counters):
+                    merged[i] = (merged[i] or 0) + value
+        clients = []
+        for name, values in sorted(totals.items(), key=lambda item: -(item[1][PROMPT_TOKENS] + item[1][COMPLETION_TOKENS])):
+            entry = dict(zip(COUNTERS, values))
+            entry["latency_ms"] = round(entry["latency_ms"] or 0, 1)
+            entry["avg_latency_ms"] = round(entry["latency_ms"] / entry["calls"], 1) if entry["calls"] else None
+            clients.append({"client": name, **entry, "quota": self.quota(name)})
+        return {"since": since, "window_seconds": self.window_seconds, "clients": clients}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending_clients": sum(len(clients) for clients in self._pending.values()),
+            "reserved_calls": sum(reserved[1] for reserved in self._reserved.values()),
+            "flushes": self.flushes,
+            "rejections": self.rejections
+        }
+
+
+def load_quotas(path: str) -> Dict[str, Dict[str, int]]:
+    """Per-client quota overrides: a JSON object of {"client": {"tokens": N, "requests": M}}."""
+    quotas = json.loads(Path(path).read_text(encoding="utf-8"))
+    if not isinstance(quotas, dict) or not all(isinstance(q, dict) for q in quotas.values()):
+        raise ValueError("expected an object of client -> {tokens, requests}")
+    return quotas
+
+
+# Global instance - will be initialized lazily
+usage_accountant = None
+
+def get_usage_accountant() -> Optional[UsageAccountant]:
+    """Get or create the global usage accountant. Returns None when disabled or unavailable."""
+    global usage_accountant
+    if usage_accountant is None:
+        if os.getenv("USAGE_ENABLED", "true").lower() in ("0", "false", "no"):
+            return None
+        path = os.getenv("USAGE_DB_PATH", str(Path(__file__).parent / "usage.db"))
+        quotas = {}
+        quota_file = os.getenv("USAGE_QUOTA_FILE", "")
+        if quota_file:
+            try:
+                quotas = load_quotas(quota_file)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not read usage quota file {quota_file}: {str(e)}")
+        try:
+            store = UsageStore(path)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not open usage store at {path}: {str(e)}")
+            return None
+        usage_accountant = UsageAccountant(
+            store,
+            bucket_seconds=int(os.getenv("USAGE_BUCKET_SECONDS", "3600")),
+            window_seconds=int(os.getenv("USAGE_QUOTA_WINDOW_SECONDS", "86400")),
+            token_quota=int(os.getenv("USAGE_TOKEN_QUOTA", "0")),
+            request_quota=int(os.getenv("USAGE_REQUEST_QUOTA", "0")),
+            quotas=quotas,
+            flush_interval=float(os.getenv("USAGE_FLUSH_INTERVAL", "5"))
+        )
+    return usage_accountant
@@ -0,0 +1,282 @@
+import os
+import time
+import asyncio
+import heapq
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+from cache import get_response_cache, normalize_topic
+from llm_client import get_llm_client
+from rate_limiter import RateLimitExceeded
+from shared_state import get_shared_state
+
+logger = logging.getLogger(__name__)
+
+COMPLEXITIES = ("beginner", "intermediate", "expert")
+
+
+class DecayingCountMinSketch:
+    """
+    Count-min sketch of request counts with exponential time decay: a count is
+    worth half as much every `half_life` seconds. Instead of rescaling every
+    counter, new increments grow by the same factor and estimates divide it out.
+    Memory is fixed at depth x width counters however many distinct keys arrive.
+    """
+
+    def __init__(self, width: int = 4096, depth: int = 4, half_life: float = 3600):
+        self.width = width
+        self.depth = depth
+        self.half_life = half_life
+        self._rows = [[0.0] * width for _ in range(depth)]
+        self._epoch = time.monotonic()
+
+    def _columns(self, key: str) -> List[int]:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8 * self.depth).digest()
+        return [int.from_bytes(digest[8 * i:8 * i + 8], "little") % self.width for i in range(self.depth)]
+
+    def _weight(self) -> float:
+        weight = 2.0 ** ((time.monotonic() - self._epoch) / self.half_life)
+        if weight > 1e12:
+            # Fold the accumulated growth back into the counters before floats lose precision
+            for row in self._rows:
+                for i, value in enumerate(row):
+                    row[i] = value / weight
+            self._epoch = time.monotonic()
+            weight = 1.0
+        return weight
+
+    def add(self, key: str) -> float:
+        """Count one request for `key`; returns its new decayed estimate."""
+        weight = self._weight()
+        raw = float("inf")
+        for row, column in zip(self._rows, self._columns(key)):
+            row[column] += weight
+            raw = min(raw, row[column])
+        return raw / weight
+
+    def estimate(self, key: str) -> float:
+        return min(row[column] for row, column in zip(self._rows, self._columns(key))) / self._weight()
+
+
+def load_seeds(path: str) -> List[Tuple[str, str]]:
+    """
+    Read a seed list: one topic per line, optionally followed by a tab and a
+    complexity (default intermediate). Blank lines and # comments are skipped.
+    """
+    seeds = []
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        topic, _, complexity = line.partition("\t")
+        complexity = complexity.strip().lower() or "intermediate"
+        if topic.strip() and complexity in COMPLEXITIES:
+            seeds.append((topic.strip(), complexity))
+        else:
+            logger.warning(f"Skipping invalid seed line: {line!r}")
+    return seeds
+
+
+class CacheWarmer:
+    """
+    Keeps popular maps in the response cache. Every request is counted in a
+    decaying count-min sketch; the most requested (topic, complexity) pairs plus
+    the seed list are checked every `interval` seconds, and those missing from the
+    cache or within `refresh_margin` (a fraction of the TTL) of expiring are
+    regenerated in the background, only while the provider limiter has at least
+    `min_headroom` of its capacity idle.
+    """
+
+    def __init__(self, top_k: int = 100, interval: float = 60, refresh_margin: float = 0.2,
+                 min_requests: float = 3, min_headroom: float = 0.5, concurrency: int = 2,
+                 half_life: float = 3600, seeds: Optional[List[Tuple[str, str]]] = None):
+        self.top_k = top_k
+        self.interval = interval
+        self.refresh_margin = refresh_margin
+        self.min_requests = min_requests
+        self.min_headroom = min_headroom
+        self.concurrency = concurrency
+        self.sketch = DecayingCountMinSketch(half_life=half_life)
+        # Candidate keys: key -> [topic as first requested, complexity, decayed count when last seen].
+        # Trimmed to the hottest 4 x top_k on each schedule, or in one pass once it reaches 8 x top_k
+        self._tracked: Dict[str, list] = {}
+        self.seeds = {self._key(topic, complexity): (topic, complexity) for topic, complexity in seeds or []}
+        self._queue: List[Tuple[float, str, str, str]] = []
+        self._queued = set()
+        self._wake: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self.refreshing = 0
+        self.refreshed = 0
+        self.failed = 0
+        self.deferred = 0
+        self.ticks = 0
+
+    @staticmethod
+    def _key(topic: str, complexity: str) -> str:
+        return f"{complexity}:{normalize_topic(topic)}"
+
+    def record(self, topic: str, complexity: str) -> None:
+        """Count one request for a map."""
+        key = self._key(topic, complexity)
+        count = self.sketch.add(key)
+        entry = self._tracked.get(key)
+        if entry is not None:
+            entry[2] = count
+            return
+        self._tracked[key] = [topic, complexity, count]
+        if len(self._tracked) >= self.top_k * 8:
+            # One sort per 4 x top_k new keys keeps eviction off the per-request cost
+            self._trim()
+
+    def _trim(self) -> None:
+        """Keep the 4 x top_k tracked keys with the highest current estimates."""
+        limit = self.top_k * 4
+        if len(self._tracked) <= limit:
+            return
+        hottest = heapq.nlargest(limit, self._tracked, key=self.sketch.estimate)
+        self._tracked = {key: self._tracked[key] for key in hottest}
+
+    def candidates(self) -> List[Tuple[float, str, str, str]]:
+        """(estimated requests, key, topic, complexity) for the top-K keys and the seeds, most requested first."""
+        ranked = sorted(
+            ((self.sketch.estimate(key), key, topic, complexity) for key, (topic, complexity, _) in self._tracked.items()),
+            reverse=True
+        )
+        chosen = [item for item in ranked[:self.top_k] if item[0] >= self.min_requests]
+        keys = {item[1] for item in chosen}
+        chosen += [
+            (max(self.sketch.estimate(key), self.min_requests), key, topic, complexity)
+            for key, (topic, complexity) in self.seeds.items() if key not in keys
+        ]
+        return sorted(chosen, reverse=True)
+
+    def _stale(self, topic: str, complexity: str) -> bool:
+        from map_service import topic_cache_key
+        cache = get_response_cache()
+        remaining = cache.ttl_remaining(topic_cache_key(topic, complexity, get_llm_client().model))
+        return remaining is None or remaining < cache.memory.ttl * self.refresh_margin
+
+    def schedule(self) -> int:
+        """Queue every candidate that is missing or about to expire; returns how many were added."""
+        self._trim()
+        added = 0
+        for score, key, topic, complexity in self.candidates():
+            if key not in self._queued and self._stale(topic, complexity):
+                self._queue.append((score, key, topic, complexity))
+                self._queued.add(key)
+                added += 1
+        self._queue.sort(reverse=True)
+        self.ticks += 1
+        if added and self._wake is not None:
+            self._wake.set()
+        return added
+
+    async def start(self) -> None:
+        self._wake = asyncio.Event()
+        self._tasks = [asyncio.ensure_future(self._scheduler())]
+        self._tasks += [asyncio.ensure_future(self._worker()) for _ in range(self.concurrency)]
+        if self.seeds:
+            logger.info(f"Cache warmer loaded {len(self.seeds)} seed topics")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _scheduler(self) -> None:
+        while True:
+            try:
+                self.schedule()
+            except Exception as e:
+                logger.warning(f"Cache warmer could not schedule refreshes: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    async def _worker(self) -> None:
+        while True:
+            if not self._queue:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            if get_llm_client().limiter.headroom() < self.min_headroom:
+                # Interactive traffic comes first; look again shortly
+                self.deferred += 1
+                await asyncio.sleep(1.0)
+                continue
+            score, key, topic, complexity = self._queue.pop(0)
+            try:
+                await self._refresh(key, topic, complexity)
+            except RateLimitExceeded as e:
+                self._queue.insert(0, (score, key, topic, complexity))
+                await asyncio.sleep(e.retry_after)
+                continue
+            except Exception as e:
+                self.failed += 1
+                logger.warning(f"Cache warmer could not refresh {topic} ({complexity}): {str(e)}")
+            self._queued.discard(key)
+
+    async def _refresh(self, key: str, topic: str, complexity: str) -> None:
+        from map_service import build_topic_map
+        state = get_shared_state()
+        lock = f"warm:{key}"
+        # With several workers only one refreshes a given map per interval
+        if state is not None:
+            try:
+                if not await asyncio.to_thread(state.set_if_absent, lock, str(os.getpid()), self.interval):
+                    return
+            except Exception as e:
+                logger.warning(f"Cache warmer could not take the refresh lock for {topic}, skipping: {str(e)}")
+                return
+        if not self._stale(topic, complexity):
+            return
+        self.refreshing += 1
+        try:
+            await build_topic_map(topic, complexity, bypass_cache=True, track=False)
+            self.refreshed += 1
+        finally:
+            self.refreshing -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tracked": len(self._tracked),
+            "seeds": len(self.seeds),
+            "queued": len(self._queue),
+            "refreshing": self.refreshing,
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+            "deferred": self.deferred,
+            "ticks": self.ticks
+        }
+
+
+# Global instance - will be initialized lazily
+cache_warmer = None
+
+def get_cache_warmer() -> Optional[CacheWarmer]:
+    """
+    Get or create the global cache warmer, or None unless WARM_ENABLED is on and
+    the cache is enabled. Off by default: every refresh spends provider tokens.
+    """
+    global cache_warmer
+    if cache_warmer is None:
+        if os.getenv("WARM_ENABLED", "false").lower() not in ("1", "true", "yes") or not get_response_cache().enabled:
+            return None
+        seeds = []
+        seed_file = os.getenv("WARM_SEED_FILE", "")
+        if seed_file:
+            try:
+                seeds = load_seeds(seed_file)
+            except OSError as e:
+                logger.warning(f"Could not read warm seed file {seed_file}: {str(e)}")
+        cache_warmer = CacheWarmer(
+            top_k=int(os.getenv("WARM_TOP_K", "100")),
+            interval=float(os.getenv("WARM_INTERVAL_SECONDS", "60")),
+            refresh_margin=float(os.getenv("WARM_REFRESH_MARGIN", "0.2")),
+            min_requests=float(os.getenv("WARM_MIN_REQUESTS", "3")),
+            min_headroom=float(os.getenv("WARM_MIN_HEADROOM", "0.5")),
+            concurrency=int(os.getenv("WARM_CONCURRENCY", "2")),
+            half_life=float(os.getenv("WARM_HALF_LIFE_SECONDS", "3600")),
+            seeds=seeds
+        )
+    return cache_warmer
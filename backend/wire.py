@@ -0,0 +1,119 @@
+import os
+import gzip
+from typing import Dict, Any, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional, gzip is used without it
+    brotli = None
+
+# Bump when the compact layout changes; clients check it before decoding
+COMPACT_FORMAT = "compact/1"
+
+
+class StringTable:
+    """Interns strings: each distinct value is sent once and referenced by index."""
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def ref(self, value: str) -> int:
+        index = self._index.get(value)
+        if index is None:
+            index = self._index[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+
+def _node_row(table: StringTable, node: Dict[str, Any], descriptions: bool) -> List[Any]:
+    # Descriptions are long and nearly always unique, so they stay inline
+    row = [table.ref(node["id"]), table.ref(node["type"]), table.ref(node["label"])]
+    if descriptions:
+        row.append(node.get("description") or "")
+    return row
+
+
+def compact_map(map_id: str, version: int, data: Dict[str, Any], descriptions: bool = False) -> Dict[str, Any]:
+    """
+    A stored map in the compact wire format: ids, types and labels interned in
+    `strings`, nodes as [id, type, label] index rows (plus the description text
+    when `descriptions`), links as [source, target] index pairs. The flat label
+    lists are left out: they follow from the node types.
+    """
+    table = StringTable()
+    nodes = [_node_row(table, node, descriptions) for node in data.get("graph_nodes") or []]
+    links = [[table.ref(link["source"]), table.ref(link["target"])] for link in data.get("graph_links") or []]
+    return {
+        "format": COMPACT_FORMAT,
+        "map_id": map_id,
+        "version": version,
+        "topic": data.get("topic", ""),
+        "core_idea": data.get("core_idea", ""),
+        "reasoning_trail": data.get("reasoning_trail", ""),
+        "metadata": data.get("metadata"),
+        "strings": table.strings,
+        "nodes": nodes,
+        "links": links
+    }
+
+
+def compact_delta(map_id: str, version: int, since: int, data: Dict[str, Any],
+                  changes: Dict[str, List[Any]], descriptions: bool = False) -> Dict[str, Any]:
+    """
+    What changed in a map after version `since`, in the compact format: the
+    current rows of added or changed nodes, added links, and the ids and links
+    that were removed. `changes` comes from MapStore.changes.
+    """
+    table = StringTable()
+    changed = set(changes["node"])
+    nodes = [_node_row(table, node, descriptions) for node in data.get("graph_nodes") or [] if node["id"] in changed]
+    return {
+        "format": COMPACT_FORMAT,
+        "map_id": map_id,
+        "version": version,
+        "since": since,
+        "strings": table.strings,
+        "nodes": nodes,
+        "links": [[table.ref(source), table.ref(target)] for source, target in changes["link"]],
+        "removed_nodes": [table.ref(node_id) for node_id in changes["removed_node"]],
+        "removed_links": [[table.ref(source), table.ref(target)] for source, target in changes["removed_link"]]
+    }
+
+
+def _accepts(accept_encoding: str, coding: str) -> bool:
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip() == coding:
+            params = params.replace(" ", "")
+            try:
+                return not params.startswith("q=") or float(params[2:]) > 0
+            except ValueError:
+                return True
+    return False
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """"br" (when the brotli package is installed) or "gzip" if the client accepts it, else None."""
+    if not accept_encoding or os.getenv("WIRE_COMPRESSION", "true").lower() in ("0", "false", "no"):
+        return None
+    if brotli is not None and _accepts(accept_encoding, "br"):
+        return "br"
+    if _accepts(accept_encoding, "gzip"):
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """
+    Compress a response body with the best encoding the client accepts.
+    Bodies under WIRE_COMPRESS_MIN_BYTES are sent as-is; returns (body, encoding).
+    """
+    if len(body) < int(os.getenv("WIRE_COMPRESS_MIN_BYTES", "1024")):
+        return body, None
+    encoding = negotiate_encoding(accept_encoding)
+    if encoding == "br":
+        return brotli.compress(body, quality=5), encoding
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6), encoding
+    return body, None
@@ -1,11 +1,11 @@
 const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 
-export async function generateMap(topic, complexity = 'intermediate') {
+export async function generateMap(topic, complexity = 'intermediate', { layout = false } = {}) {
   try {
     const response = await fetch(`${API_BASE_URL}/generate-map`, {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify({ topic, complexity }),
+      body: JSON.stringify({ topic, complexity, layout }),
     });
     if (!response.ok) {
       const errorData = await response.json().catch(() => ({}));
@@ -20,12 +20,12 @@ export async function generateMap(topic, complexity = 'intermediate') {
   }
 }
 
-export async function generateFusionMap(topicA, topicB, complexity = 'intermediate') {
+export async function generateFusionMap(topicA, topicB, complexity = 'intermediate', { layout = false } = {}) {
   try {
     const response = await fetch(`${API_BASE_URL}/fusion-map`, {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify({ topic_a: topicA, topic_b: topicB, complexity }),
+      body: JSON.stringify({ topic_a: topicA, topic_b: topicB, complexity, layout }),
     });
     if (!response.ok) {
       const errorData = await response.json().catch(() => ({}));
@@ -39,3 +39,102 @@ export async function generateFusionMap(topicA, topicB, complexity = 'intermedia
     throw error;
   }
 }
+
+export async function streamMap(topic, complexity = 'intermediate', { onNode, onLink } = {}) {
+  try {
+    const response = await fetch(`${API_BASE_URL}/generate-map/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ topic, complexity }),
+    });
+    if (!response.ok) {
+      const errorData = await response.json().catch(() => ({}));
+      throw new Error(errorData.detail || errorData.message || 'Failed to generate cognitive map');
+    }
+
+    // Parse server-sent events: node/link events arrive early, result arrives last
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const raw = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        const event = raw.match(/^event: (.*)$/m)?.[1];
+        const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || '{}');
+        if (event === 'node' && onNode) onNode(data);
+        else if (event === 'link' && onLink) onLink(data);
+        else if (event === 'error') throw new Error(data.detail || 'Failed to generate cognitive map');
+        else if (event === 'result') return data;
+      }
+    }
+    throw new Error('Stream ended before the map was complete');
+  } catch (error) {
+    if (error instanceof TypeError && error.message.includes('fetch')) {
+      throw new Error(`Failed to connect to the server at ${API_BASE_URL}`);
+    }
+    throw error;
+  }
+}
+
+// Expand one node into new children. Uses the stored map when it has a map_id,
+// otherwise sends the current graph. Returns only the new nodes and links.
+export async function expandNode(map, nodeId, complexity = 'intermediate') {
+  const url = map.map_id
+    ? `${API_BASE_URL}/maps/${map.map_id}/expand`
+    : `${API_BASE_URL}/maps/expand`;
+  const body = map.map_id
+    ? { node_id: nodeId, complexity }
+    : { node_id: nodeId, complexity, topic: map.topic, graph_nodes: map.graph_nodes, graph_links: map.graph_links };
+  try {
+    const response = await fetch(url, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(body),
+    });
+    if (!response.ok) {
+      const errorData = await response.json().catch(() => ({}));
+      throw new Error(errorData.detail || errorData.message || 'Failed to expand node');
+    }
+    return await response.json();
+  } catch (error) {
+    if (error instanceof TypeError && error.message.includes('fetch')) {
+      throw new Error(`Failed to connect to the server at ${API_BASE_URL}`);
+    }
+    throw error;
+  }
+}
+
+// Render a map as svg, pdf or png on the server. Node positions from the graph view
+// are kept, so the file matches what is on screen. Returns a Blob.
+export async function exportMap(map, format = 'pdf') {
+  const body = {
+    ...map,
+    graph_nodes: map.graph_nodes.map(({ id, type, label, description, x, y }) => ({ id, type, label, description, x, y })),
+    graph_links: map.graph_links.map((l) => ({
+      source: String(l.source?.id ?? l.source),
+      target: String(l.target?.id ?? l.target),
+    })),
+  };
+  try {
+    const response = await fetch(`${API_BASE_URL}/export/${format}`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(body),
+    });
+    if (!response.ok) {
+      const errorData = await response.json().catch(() => ({}));
+      throw new Error(errorData.detail || errorData.message || 'Failed to export map');
+    }
+    return await response.blob();
+  } catch (error) {
+    if (error instanceof TypeError && error.message.includes('fetch')) {
+      throw new Error(`Failed to connect to the server at ${API_BASE_URL}`);
+    }
+    throw error;
+  }
+}
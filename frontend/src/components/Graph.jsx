@@ -35,11 +35,24 @@ const Graph = ({ data, onNodeClick, darkMode, selectedNodeId }) => {
     const width = svgRef.current.clientWidth || 1100;
     const height = 700;
 
+    // Maps requested with layout=true arrive with x/y already computed by the server:
+    // centre them in this view and skip the simulation until the user drags a node
+    const positioned = nodes.every((n) => Number.isFinite(n.x) && Number.isFinite(n.y));
+    if (positioned) {
+      const dx = width / 2 - d3.mean(nodes, (n) => n.x);
+      const dy = height / 2 - d3.mean(nodes, (n) => n.y);
+      nodes.forEach((n) => {
+        n.x += dx;
+        n.y += dy;
+      });
+    }
+
     const simulation = d3
       .forceSimulation(nodes)
       .force("link", d3.forceLink(links).id((d) => d.id).distance(140))
       .force("charge", d3.forceManyBody().strength(-400))
       .force("center", d3.forceCenter(width / 2, height / 2));
+    if (positioned) simulation.stop();
 
     // Links
     const link = svg
@@ -105,7 +118,7 @@ const Graph = ({ data, onNodeClick, darkMode, selectedNodeId }) => {
       .attr("fill", darkMode ? "#e5e7eb" : "#111")
       .style("pointer-events", "none");
 
-    simulation.on("tick", () => {
+    const ticked = () => {
       link
         .attr("x1", (d) => d.source.x)
         .attr("y1", (d) => d.source.y)
@@ -114,7 +127,11 @@ const Graph = ({ data, onNodeClick, darkMode, selectedNodeId }) => {
 
       node.attr("cx", (d) => d.x).attr("cy", (d) => d.y);
       label.attr("x", (d) => d.x + 18).attr("y", (d) => d.y + 4);
-    });
+    };
+    simulation.on("tick", ticked);
+    if (positioned) ticked();
+
+    return () => simulation.stop();
   }, [data, darkMode, selectedNodeId]);
 
   return <svg ref={svgRef} width="100%" height="700" style={{ borderRadius: "12px" }} />;
@@ -1,7 +1,7 @@
 import { useState, useRef } from 'react';
 import Graph from '../components/Graph';
-import { generateFusionMap } from '../api/generateMap';
-import { exportAsPNG, exportAsPDF } from '../utils/export';
+import { generateFusionMap, exportMap } from '../api/generateMap';
+import { exportAsPNG, exportAsPDF, downloadBlob } from '../utils/export';
 
 const Fusion = ({ darkMode }) => {
   const [topicA, setTopicA] = useState('');
@@ -31,7 +31,7 @@ const Fusion = ({ darkMode }) => {
     setShowReasoningTrail(false);
 
     try {
-      const data = await generateFusionMap(topicA.trim(), topicB.trim(), complexity);
+      const data = await generateFusionMap(topicA.trim(), topicB.trim(), complexity, { layout: true });
 
       if (!data?.graph_nodes?.length || !Array.isArray(data.graph_links)) {
         throw new Error('Invalid data received from server');
@@ -67,8 +67,14 @@ const Fusion = ({ darkMode }) => {
     }
   };
 
-  const handleExportPDF = () => {
-    if (mapData) exportAsPDF(mapData, mapData.reasoning_trail);
+  const handleExportPDF = async () => {
+    if (!mapData) return;
+    try {
+      downloadBlob(await exportMap(mapData, 'pdf'), `fusion-map-${topicA.replace(/\s+/g, '-')}-${topicB.replace(/\s+/g, '-')}.pdf`);
+    } catch (err) {
+      console.warn('Server PDF export failed, falling back to print:', err);
+      exportAsPDF(mapData, mapData.reasoning_trail);
+    }
   };
 
   return (
@@ -1,7 +1,7 @@
 import { useState, useRef } from 'react';
 import Graph from '../components/Graph';
-import { generateMap } from '../api/generateMap';
-import { exportAsPNG, exportAsPDF } from '../utils/export';
+import { generateMap, exportMap } from '../api/generateMap';
+import { exportAsPNG, exportAsPDF, downloadBlob } from '../utils/export';
 
 const Home = ({ darkMode }) => {
   const [topic, setTopic] = useState('');
@@ -30,7 +30,7 @@ const Home = ({ darkMode }) => {
     setShowReasoningTrail(false);
 
     try {
-      const data = await generateMap(topic.trim(), complexity);
+      const data = await generateMap(topic.trim(), complexity, { layout: true });
 
       if (!data?.graph_nodes?.length || !Array.isArray(data.graph_links)) {
         throw new Error('Invalid data received from server');
@@ -69,8 +69,14 @@ const Home = ({ darkMode }) => {
     }
   };
 
-  const handleExportPDF = () => {
-    if (mapData) exportAsPDF(mapData, mapData.reasoning_trail);
+  const handleExportPDF = async () => {
+    if (!mapData) return;
+    try {
+      downloadBlob(await exportMap(mapData, 'pdf'), `cognitive-map-${mapData.topic?.replace(/\s+/g, '-') || 'map'}.pdf`);
+    } catch (err) {
+      console.warn('Server PDF export failed, falling back to print:', err);
+      exportAsPDF(mapData, mapData.reasoning_trail);
+    }
   };
 
   return (
@@ -81,3 +81,11 @@ export const exportAsPDF = (mapData, reasoningTrail, filename = 'cognitive-map.p
   printWindow.print();
 };
 
+
+export const downloadBlob = (blob, filename) => {
+  const link = document.createElement('a');
+  link.download = filename;
+  link.href = URL.createObjectURL(blob);
+  link.click();
+  URL.revokeObjectURL(link.href);
+};